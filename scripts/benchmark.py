@@ -0,0 +1,380 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Benchmarks of the addon's file parsers and writers.
+The addon depends on Blender python modules, so run the script with Blender:
+
+    blender --background --python scripts/benchmark.py -- <benchmark> [args...]
+
+Benchmarks:
+    batch [files] [faces] - Load time of 16 synthetic 3DO files with 20k faces loaded one by one
+                          vs. by `loadBatch` with 1..N worker processes, ordered and unordered.
+    writer [faces] [meshes] - Save time of synthetic 3DO with 300k faces (150k vertices) in 10 meshes
+                          from `Mesh3do` and `Mesh3doArrays` meshes for each 3DO version.
+    tokenizer [file...] - Tokens/sec of `Tokenizer` vs `BufferTokenizer`.
+                          If no file is given synthetic 3DO text is used and
+                          also read with typed getters (getVector3f etc.).
+    cache [faces]       - Load time of synthetic 3DO with 100k faces and KEY from file
+                          vs. from `DiskCache`.
+    memory [faces] [nodes] - Memory of loaded synthetic 3DO with 100k faces and KEY with 200 nodes,
+                          and bytes saved by the `__slots__` records.
+    parallel [faces] [meshes] - Load and save time of synthetic 3DO with 32 meshes when meshes are
+                          parsed/formatted by 1..N worker processes, and speedup vs number of workers.
+    positions [file...] - Tokens/sec of `BufferTokenizer` with tokens resolving line and
+                          column when made vs. lazily, and position lookup counters.
+"""
+
+import io, os, random, sys, tempfile, time, tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sith.batchLoader import loadBatch
+from sith.cache import DiskCache
+from sith.key.key import Key, Keyframe, KeyMarker, KeyNode
+from sith.key.keyLoader import loadKey
+from sith.key.keyWriter import saveKey
+from sith.model.model3do import Mesh3do, Mesh3doArrays, Mesh3doFace, Mesh3doNode, Model3do, Model3doGeoSet
+from sith.model.model3doLoader import load3do, Model3doFileVersion
+from sith.model.model3doWriter import save3do
+from sith.text.tokenizer import BufferTokenizer, Token, Tokenizer, TokenType
+from sith.types import Vector2f, Vector3f, Vector4f
+from typing import Tuple
+
+def _make_synthetic_3do_text(numVertices: int = 20000, numFaces: int = 20000, seed: int = 0) -> str:
+    r = random.Random(seed)
+    lines = ['# synthetic 3DO', 'SECTION: GEOMETRYDEF', f'VERTICES {numVertices}']
+    for i in range(numVertices):
+        lines.append('{:>5}: {:>10.6f} {:>10.6f} {:>10.6f} {:>10.6f} {:>10.6f} {:>10.6f} {:>10.6f}'.format(i, *(r.uniform(-10, 10) for _ in range(3)), *(r.random() for _ in range(4))))
+    lines.append(f'FACES {numFaces}')
+    for i in range(numFaces):
+        vidx = ' '.join('{:>3}, {:>2}'.format(r.randrange(numVertices), r.randrange(numVertices)) for _ in range(3))
+        lines.append('{:>6}: {:>9} 0x{:04x} 4 3 3 ({:.6f}/{:.6f}/{:.6f}/{:.6f}) 3 {}'.format(i, r.randrange(10), 0, *(r.random() for _ in range(4)), vidx))
+    return '\n'.join(lines) + '\n'
+
+def _count_tokens(tok: Tokenizer) -> int:
+    num = 0
+    while tok.getToken().type != TokenType.EOF:
+        num += 1
+    return num
+
+def _read_synthetic_3do(tok: Tokenizer) -> int:
+    """ Reads synthetic 3DO text with typed getters as loaders do and returns the number of read tokens """
+    tok.assertIdentifier('SECTION')
+    tok.assertPunctuator(':')
+    tok.assertIdentifier('GEOMETRYDEF')
+
+    tok.assertIdentifier('VERTICES')
+    numVertices = tok.getIntNumber()
+    for _ in range(numVertices):
+        tok.getIntNumber()
+        tok.assertPunctuator(':')
+        tok.getVector3f()
+        tok.getVector4f()
+
+    tok.assertIdentifier('FACES')
+    numFaces = tok.getIntNumber()
+    for _ in range(numFaces):
+        tok.getIntNumber()
+        tok.assertPunctuator(':')
+        for _ in range(5):
+            tok.getIntNumber()
+        tok.getVector4f()
+        for _ in range(tok.getIntNumber()):
+            tok.getPairOfInts()
+    return 7 + numVertices * 9 + numFaces * 26
+
+def _print_result(label: str, num: int, t: float, t_ref: float):
+    print(f'  {label:<24} {t:8.3f} sec {num / t:12.0f} tokens/sec ({t_ref / t:.1f}x)')
+
+def _measure(fn, *args):
+    start = time.perf_counter()
+    res   = fn(*args)
+    return res, time.perf_counter() - start
+
+def benchmark_tokenizer(files):
+    inputs = [(f, open(f, 'r', encoding='utf-8').read()) for f in files]
+    if not inputs:
+        inputs = [('<synthetic 3DO>', _make_synthetic_3do_text())]
+
+    for name, text in inputs:
+        num_old, t_old = _measure(_count_tokens, Tokenizer(io.StringIO(text)))
+        num_new, t_new = _measure(_count_tokens, BufferTokenizer(text))
+        num_raw, t_raw = _measure(_count_tokens, BufferTokenizer(text.encode('utf-8')))
+        assert num_old == num_new == num_raw, f'token count mismatch {num_old} != {num_new} != {num_raw}'
+
+        print(f'{name}: {num_new} tokens, {len(text)} chars')
+        _print_result('Tokenizer', num_old, t_old, t_old)
+        _print_result('BufferTokenizer', num_new, t_new, t_old)
+        _print_result('BufferTokenizer (bytes)', num_raw, t_raw, t_old)
+
+    if not files:
+        name, text = inputs[0]
+        num_old, t_old = _measure(_read_synthetic_3do, Tokenizer(io.StringIO(text)))
+        num_new, t_new = _measure(_read_synthetic_3do, BufferTokenizer(text))
+        num_raw, t_raw = _measure(_read_synthetic_3do, BufferTokenizer(text.encode('utf-8')))
+        print(f'{name} read with typed getters:')
+        _print_result('Tokenizer', num_old, t_old, t_old)
+        _print_result('BufferTokenizer', num_new, t_new, t_old)
+        _print_result('BufferTokenizer (bytes)', num_raw, t_raw, t_old)
+
+def benchmark_positions(files):
+    inputs = [(f, open(f, 'rb').read()) for f in files]
+    if not inputs:
+        inputs = [('<synthetic 3DO>', _make_synthetic_3do_text().encode('utf-8'))]
+
+    for name, buf in inputs:
+        eager = BufferTokenizer(buf, lazyPositions=False)
+        lazy  = BufferTokenizer(buf, lazyPositions=True)
+        num_eager, t_eager = _measure(_count_tokens, eager)
+        num_lazy, t_lazy   = _measure(_count_tokens, lazy)
+
+        print(f'{name}: {num_lazy} tokens, {len(buf)} bytes')
+        _print_result('eager positions', num_eager, t_eager, t_eager)
+        print(f'    {eager.counters}')
+        _print_result('lazy positions', num_lazy, t_lazy, t_eager)
+        print(f'    {lazy.counters}')
+
+def _make_synthetic_model(numFaces: int = 100000, numMeshes: int = 10, seed: int = 0) -> Model3do:
+    r = random.Random(seed)
+    model = Model3do('synthetic.3do')
+    model.materials = [f'mat{i}.mat' for i in range(8)]
+    geoset = Model3doGeoSet()
+    numMeshFaces = numFaces // numMeshes
+    for i in range(numMeshes):
+        mesh = Mesh3do(i, f'mesh{i}')
+        mesh.vertices     = [Vector3f(r.uniform(-1, 1), r.uniform(-1, 1), r.uniform(-1, 1)) for _ in range(numMeshFaces // 2)]
+        mesh.vertexColors = [Vector4f(1.0, 1.0, 1.0, 1.0)] * len(mesh.vertices)
+        mesh.normals      = [Vector3f(0.0, 0.0, 1.0)] * len(mesh.vertices)
+        mesh.uvs          = [Vector2f(r.random(), r.random()) for _ in range(numMeshFaces // 2)]
+        for _ in range(numMeshFaces):
+            face = Mesh3doFace()
+            face.materialIdx = r.randrange(len(model.materials))
+            face.vertexIdxs  = [r.randrange(len(mesh.vertices)) for _ in range(3)]
+            face.uvIdxs      = [r.randrange(len(mesh.uvs)) for _ in range(3)]
+            face.color       = Vector4f(0.0, 0.0, 0.0, 1.0)
+            face.normal      = Vector3f(0.0, 0.0, 1.0)
+            mesh.faces.append(face)
+        geoset.meshes.append(mesh)
+
+        node = Mesh3doNode(f'node{i}')
+        node.idx           = i
+        node.meshIdx       = i
+        node.parentIdx     = i - 1
+        node.firstChildIdx = i + 1 if i + 1 < numMeshes else -1
+        node.numChildren   = 1 if i + 1 < numMeshes else 0
+        model.meshHierarchy.append(node)
+    model.geosets.append(geoset)
+    return model
+
+def _make_synthetic_key(numNodes: int = 200, numKeyframes: int = 50, seed: int = 0) -> Key:
+    r = random.Random(seed)
+    key = Key('synthetic.key')
+    key.numFrames = numKeyframes
+    key.fps       = 30.0
+    key.numJoints = numNodes
+    for i in range(4):
+        marker = KeyMarker()
+        marker.frame = float(i * 10)
+        key.markers.append(marker)
+    for i in range(numNodes):
+        node = KeyNode()
+        node.idx      = i
+        node.meshName = f'node{i}'
+        for j in range(numKeyframes):
+            kf = Keyframe()
+            kf.frame       = j
+            kf.position    = Vector3f(r.uniform(-1, 1), r.uniform(-1, 1), r.uniform(-1, 1))
+            kf.orientation = Vector3f(r.uniform(-180, 180), r.uniform(-180, 180), r.uniform(-180, 180))
+            node.keyframes.append(kf)
+        key.nodes.append(node)
+    return key
+
+def _record_size(obj, num: int = 1000) -> Tuple[int, int]:
+    """
+    Returns the measured memory of slotted `obj` record and of the same
+    record when attributes are stored in instance `__dict__`.
+    """
+    cls    = type(obj)
+    names  = [n for c in cls.__mro__ for n in getattr(c, '__slots__', ()) if hasattr(obj, n)]
+    values = [getattr(obj, n) for n in names]
+    plain  = type('Plain' + cls.__name__, (), {})
+
+    def make(rcls):
+        objs = []
+        for _ in range(num):
+            o = rcls.__new__(rcls)
+            for n, v in zip(names, values):
+                setattr(o, n, v)
+            objs.append(o)
+        return objs
+
+    _, size       = _measure_memory(make, cls)
+    _, plain_size = _measure_memory(make, plain)
+    return size // num, plain_size // num
+
+def _measure_memory(fn, *args):
+    tracemalloc.start()
+    res = fn(*args)
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return res, mem
+
+def benchmark_memory(args):
+    numFaces = int(args[0]) if len(args) > 0 else 100000
+    numNodes = int(args[1]) if len(args) > 1 else 200
+    with tempfile.TemporaryDirectory() as dir:
+        modelPath = os.path.join(dir, 'synthetic.3do')
+        keyPath   = os.path.join(dir, 'synthetic.key')
+        save3do(_make_synthetic_model(numFaces), modelPath, Model3doFileVersion.Version2_3, 'synthetic model')
+        saveKey(_make_synthetic_key(numNodes), keyPath, 'synthetic key')
+
+        (model, _), mem_model = _measure_memory(load3do, modelPath)
+        (cmodel, _), mem_cmodel = _measure_memory(load3do, modelPath, True)
+        key, mem_key = _measure_memory(loadKey, keyPath)
+
+    records = [
+        ('Mesh3doFace', [f for g in model.geosets for m in g.meshes for f in m.faces]),
+        ('Mesh3doNode', model.meshHierarchy),
+        ('KeyNode', key.nodes),
+        ('Keyframe', [kf for n in key.nodes for kf in n.keyframes]),
+        ('KeyMarker', key.markers),
+        ('Token', [Token(TokenType.Float)]),
+    ]
+
+    print(f'3DO with {numFaces} faces: {mem_model / 1e6:.2f} MB loaded, {mem_cmodel / 1e6:.2f} MB as Mesh3doArrays')
+    print(f'KEY with {numNodes} nodes: {mem_key / 1e6:.2f} MB loaded')
+    total = 0
+    for name, objs in records:
+        size, plain_size = _record_size(objs[0])
+        saved = (plain_size - size) * len(objs)
+        if name != 'Token': # tokens aren't kept by the loaded model
+            total += saved
+        print(f'  {name:<12} {len(objs):>8} x {size:>4} bytes (w/o __slots__ {plain_size:>4} bytes) saved {saved / 1e6:8.2f} MB')
+    print(f'  total saved {total / 1e6:.2f} MB')
+
+def benchmark_parallel(args):
+    numFaces  = int(args[0]) if len(args) > 0 else 200000
+    numMeshes = int(args[1]) if len(args) > 1 else 32
+    maxWorkers = os.cpu_count() or 1
+    workers = sorted({ 1, maxWorkers } | { 2**i for i in range(1, maxWorkers.bit_length()) })
+    with tempfile.TemporaryDirectory() as dir:
+        modelPath = os.path.join(dir, 'synthetic.3do')
+        save3do(_make_synthetic_model(numFaces, numMeshes), modelPath, Model3doFileVersion.Version2_3, 'synthetic model')
+
+        print(f'3DO with {numMeshes} meshes and {numFaces} faces, {maxWorkers} cores:')
+        print('load3do:')
+        for columnar in (False, True):
+            t_ref = None
+            for n in workers:
+                _, t = _measure(load3do, modelPath, columnar, False, None, n)
+                t_ref = t_ref or t
+                print(f'  {"Mesh3doArrays" if columnar else "Mesh3do":<14} workers: {n:>3} {t:8.3f} sec ({t_ref / t:.1f}x)')
+
+        print('save3do:')
+        model, _ = load3do(modelPath)
+        savePath = os.path.join(dir, 'saved.3do')
+        for columnar in (False, True):
+            if columnar:
+                for geoset in model.geosets:
+                    geoset.meshes = [Mesh3doArrays.fromMesh3do(m) for m in geoset.meshes]
+            t_ref = None
+            for n in workers:
+                _, t = _measure(save3do, model, savePath, Model3doFileVersion.Version2_3, 'synthetic model', n)
+                t_ref = t_ref or t
+                print(f'  {"Mesh3doArrays" if columnar else "Mesh3do":<14} workers: {n:>3} {t:8.3f} sec ({t_ref / t:.1f}x)')
+
+def benchmark_batch(args):
+    numFiles = int(args[0]) if len(args) > 0 else 16
+    numFaces = int(args[1]) if len(args) > 1 else 20000
+    maxWorkers = os.cpu_count() or 1
+    workers = sorted({ 1, maxWorkers } | { 2**i for i in range(1, maxWorkers.bit_length()) })
+    with tempfile.TemporaryDirectory() as dir:
+        paths = []
+        for i in range(numFiles):
+            paths.append(os.path.join(dir, f'synthetic{i}.3do'))
+            save3do(_make_synthetic_model(numFaces, 4, seed=i), paths[-1], Model3doFileVersion.Version2_3, 'synthetic model')
+
+        print(f'{numFiles} 3DO files with {numFaces} faces, {maxWorkers} cores:')
+        _, t_ref = _measure(lambda: [load3do(p, columnar=True) for p in paths])
+        print(f'  {"load3do":<24} {t_ref:8.3f} sec')
+        for ordered in (True, False):
+            for n in workers:
+                res, t = _measure(lambda: list(loadBatch(paths, n, ordered)))
+                assert all(r.error is None for r in res)
+                print(f'  {"loadBatch " + ("ordered" if ordered else "unordered"):<24} workers: {n:>3} {t:8.3f} sec ({t_ref / t:.1f}x)')
+
+def benchmark_cache(args):
+    numFaces = int(args[0]) if len(args) > 0 else 100000
+    with tempfile.TemporaryDirectory() as dir:
+        modelPath = os.path.join(dir, 'synthetic.3do')
+        keyPath   = os.path.join(dir, 'synthetic.key')
+        save3do(_make_synthetic_model(numFaces), modelPath, Model3doFileVersion.Version2_3, 'synthetic model')
+        saveKey(_make_synthetic_key(), keyPath, 'synthetic key')
+
+        cache = DiskCache(os.path.join(dir, 'cache'))
+        print(f'3DO with {numFaces} faces and KEY:')
+        for label, load, fn in (
+                ('3DO Mesh3do',       lambda: load3do(modelPath),                lambda: cache.load3do(modelPath, columnar=False)),
+                ('3DO Mesh3doArrays', lambda: load3do(modelPath, columnar=True), lambda: cache.load3do(modelPath, columnar=True)),
+                ('KEY',               lambda: loadKey(keyPath),                  lambda: cache.loadKey(keyPath))):
+            _, t_ref  = _measure(load)
+            _, t_miss = _measure(fn)
+            _, t_hit  = _measure(fn)
+            print(f'  {label:<18} file: {t_ref:8.3f} sec cache miss: {t_miss:8.3f} sec cache hit: {t_hit:8.3f} sec ({t_ref / t_hit:.1f}x)')
+        print(f'  cache size: {cache.size()} bytes, {cache.stats}')
+
+def benchmark_writer(args):
+    numFaces  = int(args[0]) if len(args) > 0 else 300000
+    numMeshes = int(args[1]) if len(args) > 1 else 10
+    model = _make_synthetic_model(numFaces, numMeshes)
+    numVertices = sum(len(m.vertices) for m in model.geosets[0].meshes)
+    with tempfile.TemporaryDirectory() as dir:
+        modelPath = os.path.join(dir, 'synthetic.3do')
+        print(f'3DO with {numMeshes} meshes, {numVertices} vertices and {numFaces} faces:')
+        for columnar in (False, True):
+            if columnar:
+                for geoset in model.geosets:
+                    geoset.meshes = [Mesh3doArrays.fromMesh3do(m) for m in geoset.meshes]
+            for version in Model3doFileVersion:
+                _, t = _measure(save3do, model, modelPath, version, 'synthetic model')
+                size = os.path.getsize(modelPath)
+                print(f'  {"Mesh3doArrays" if columnar else "Mesh3do":<14} version: {version.value} {t:8.3f} sec {size / t / 2**20:8.1f} MB/sec')
+
+_benchmarks = {
+    'batch': benchmark_batch,
+    'cache': benchmark_cache,
+    'memory': benchmark_memory,
+    'parallel': benchmark_parallel,
+    'positions': benchmark_positions,
+    'tokenizer': benchmark_tokenizer,
+    'writer': benchmark_writer
+}
+
+def main(argv):
+    if not argv or argv[0] not in _benchmarks:
+        print(__doc__)
+        return 1
+    _benchmarks[argv[0]](argv[1:])
+    return 0
+
+if __name__ == '__main__':
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    sys.exit(main(argv))
@@ -37,6 +37,8 @@ bl_info = {
 # Reload imported submodules if script is reloaded
 if "bpy" in locals():
     import importlib
+    if "sith.cache" in locals():
+        importlib.reload(sith.cache)
     if "sith.key" in locals():
         importlib.reload(sith.key)
     if "sith.material" in locals():
@@ -57,6 +59,7 @@ from bpy_extras.io_utils import ImportHelper
 from bpy_extras.io_utils import ExportHelper
 from pathlib import Path
 
+from sith.cache import clearAssetCaches, getAssetCache
 from sith.key import (
     exportKey,
     importKey,
@@ -68,6 +71,7 @@ from sith.material import importMat
 from sith.model import (
     export3do,
     import3do,
+    setModel3doGeoset,
     FaceType,
     GeometryMode,
     LightMode,
@@ -76,18 +80,12 @@ from sith.model import (
 
 from sith.model.model3doLoader import Model3doFileVersion
 from sith.model.utils import (
-    bmFaceGetExtraLight,
-    bmFaceGetGeometryMode,
-    bmFaceGetLightMode,
-    bmFaceGetTextureMode,
-    bmFaceGetType,
-    bmFaceSetExtraLight,
-    bmFaceSetGeometryMode,
-    bmFaceSetLightMode,
-    bmFaceSetTextureMode,
-    bmFaceSetType,
     bmMeshInit3doLayers,
+    getModel3doBaseObj,
     kGModel3do,
+    kModelGeoset,
+    kModelNumGeosets,
+    meshMigrate3doFaceLayers,
     kNameOrderPrefix
 )
 
@@ -143,6 +141,13 @@ def _get_model3do_texture_mode_list():
         l.append((f.name, _make_readable(f.name), ''))
     return l
 
+def _get_mat_mip_level_enum_list():
+    return [('0'   , 'Largest' , 'Import the largest mip level of MAT textures'),
+            ('512' , '≤ 512px' , 'Import the largest mip level of MAT textures not greater than 512 pixels'),
+            ('256' , '≤ 256px' , 'Import the largest mip level of MAT textures not greater than 256 pixels'),
+            ('128' , '≤ 128px' , 'Import the largest mip level of MAT textures not greater than 128 pixels'),
+            ('1'   , 'Smallest', 'Import the smallest mip level of MAT textures')]
+
 def _get_export_obj(context, report, data_type: str):
     """ Returns obj by searching for top object which represents 3DO model """
     eobj = None
@@ -203,15 +208,31 @@ class ImportMat(bpy.types.Operator, ImportHelper):
         description = "Path to the ColorMap file (.cmp) used by mat textures of the imported 3DO model (JKDF2 & MOTS only).\n\nBy default file is searched in specified path, in the directory of the imported 3DO model and it's parent directory.\nIf no file is specified 'dflt.cmp' file is loaded",
     )
 
+    mip_level = bpy.props.EnumProperty(
+        name        = 'Mip Level',
+        description = 'Mip level of MAT textures to import. Lower mip levels use less memory and are decoded faster',
+        items       = _get_mat_mip_level_enum_list(),
+        default     = '0'
+    )
+
+    use_cache = bpy.props.BoolProperty(
+        name        = 'Use Disk Cache',
+        description = 'Load parsed files from the on-disk cache and store newly parsed files to the cache, so re-importing unchanged files is faster',
+        default     = False,
+    )
+
     def draw(self, context):
         layout = self.layout
         cmp_file_layout = layout.box().column()
         cmp_file_layout.label(text='ColorMap File (JKDF2 & MOTS)')
         cmp_file_layout.prop(self, 'cmp_file', text='')
+        layout.prop(self, 'mip_level')
+        layout.prop(self, 'use_cache')
 
     def execute(self, context):
-        cmp = getCmpFileOrDefault(self.cmp_file, self.filepath)
-        importMat(self.filepath, cmp)
+        cache = getAssetCache(self.use_cache)
+        cmp = getCmpFileOrDefault(self.cmp_file, self.filepath, cache)
+        importMat(self.filepath, cmp, cache, int(self.mip_level))
         return {'FINISHED'}
 
 
@@ -272,6 +293,25 @@ class ImportModel3do(bpy.types.Operator, ImportHelper):
         description = "Path to the ColorMap file (.cmp) used by mat textures of the imported 3DO model (JKDF2 & MOTS only).\n\nBy default, file is searched in specified path, in the directory of the imported 3DO model and its parent directory.\nIf no file is specified 'dflt.cmp' file is loaded",
     )
 
+    mip_level = bpy.props.EnumProperty(
+        name        = 'Mip Level',
+        description = 'Mip level of MAT textures to import. Lower mip levels use less memory and are decoded faster',
+        items       = _get_mat_mip_level_enum_list(),
+        default     = '0'
+    )
+
+    use_cache = bpy.props.BoolProperty(
+        name        = 'Use Disk Cache',
+        description = 'Load parsed files from the on-disk cache and store newly parsed files to the cache, so re-importing unchanged files is faster',
+        default     = False,
+    )
+
+    instance_meshes = bpy.props.BoolProperty(
+        name        = 'Share Identical Meshes',
+        description = 'Mesh objects with identical geometry and materials share one mesh data-block, also with the meshes of previously imported models which were not edited since import.\n\nNote: editing shared mesh changes all objects which use it',
+        default     = True,
+    )
+
     def draw(self, context):
         layout = self.layout
         layout.prop(self, 'set_3d_view')
@@ -280,6 +320,8 @@ class ImportModel3do(bpy.types.Operator, ImportHelper):
         layout.prop(self, 'vertex_colors')
         layout.prop(self, 'import_radius_objects')
         layout.prop(self, 'preserve_order')
+        layout.prop(self, 'instance_meshes')
+        layout.prop(self, 'use_cache')
 
         mat_layout = layout.box().column()
         mat_layout.label(text='Texture(s)')
@@ -289,9 +331,11 @@ class ImportModel3do(bpy.types.Operator, ImportHelper):
         cmp_file_layout = mat_layout.box().column()
         cmp_file_layout.label(text='ColorMap File (JKDF2 & MOTS)')
         cmp_file_layout.prop(self, 'cmp_file', text='')
+        mat_layout.prop(self, 'mip_level')
 
     def execute(self, context):
-        obj = import3do(self.filepath, [self.mat_dir], self.cmp_file, self.uv_absolute_3do_2_1, self.vertex_colors, self.import_radius_objects, self.preserve_order, self.clear_scene)
+        cache = getAssetCache(self.use_cache)
+        obj = import3do(self.filepath, [self.mat_dir], self.cmp_file, self.uv_absolute_3do_2_1, self.vertex_colors, self.import_radius_objects, self.preserve_order, self.clear_scene, cache=cache, instanceMeshes=self.instance_meshes, maxTexSize=int(self.mip_level))
 
         if self.set_3d_view:
             area   = next(area   for area   in context.screen.areas if area.type == 'VIEW_3D')
@@ -323,6 +367,33 @@ class ImportModel3do(bpy.types.Operator, ImportHelper):
 
         return {'FINISHED'}
 
+class SetModel3doGeoset(bpy.types.Operator):
+    """Switch meshes of imported 3DO model to the meshes of geoset (LOD)"""
+    bl_idname  = 'object.sith_3do_set_geoset'
+    bl_label   = 'Set 3DO Geoset'
+    bl_options = {'REGISTER', 'UNDO'}
+
+    geoset = bpy.props.IntProperty(
+        name        = 'Geoset',
+        description = 'Geoset (LOD) number',
+        min         = 0,
+        default     = 0,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return getModel3doBaseObj(context.object) is not None
+
+    def execute(self, context):
+        obj = getModel3doBaseObj(context.object)
+        try:
+            setModel3doGeoset(obj, self.geoset, getAssetCache())
+        except (IndexError, OSError, ValueError) as e:
+            print(f"\nError: Failed to switch 3DO model '{obj.name}' to geoset {self.geoset}!\nError: {e}")
+            self.report({'ERROR'}, f'Error: {e}')
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
 class ExportModel3do(bpy.types.Operator, ExportHelper):
     """Export object(s) to Sith game engine 3DO file format (.3do)"""
     bl_idname    = 'export_scene.sith_3do'
@@ -363,6 +434,28 @@ class ExportModel3do(bpy.types.Operator, ExportHelper):
         default     = True,
     )
 
+    low_memory = bpy.props.BoolProperty(
+        name        = 'Low Memory Export',
+        description = 'Write each mesh to the 3DO file as soon as its geometry is extracted instead of building the whole model in memory first.\n\nUse when exporting models with many heavy meshes',
+        default     = False,
+    )
+
+    weld_distance = bpy.props.FloatProperty(
+        name        = 'Weld Distance',
+        description = 'Maximum distance between positions of mesh vertices to be welded into one vertex. Only vertices with identical color and normal are welded.\n\n0 welds only identical vertices',
+        default     = 0.0,
+        min         = 0.0,
+        precision   = 6,
+    )
+
+    uv_weld_distance = bpy.props.FloatProperty(
+        name        = 'UV Weld Distance',
+        description = 'Maximum distance between UV coordinates to be merged into one UV coordinate.\n\n0 merges only identical UV coordinates',
+        default     = 0.0,
+        min         = 0.0,
+        precision   = 6,
+    )
+
     obj = None
 
     def draw(self, context):
@@ -372,6 +465,9 @@ class ExportModel3do(bpy.types.Operator, ExportHelper):
             layout.prop(self, 'absolute_uv')
         layout.prop(self, 'export_vert_colors')
         layout.prop(self, 'sync_mesh_list')
+        layout.prop(self, 'weld_distance')
+        layout.prop(self, 'uv_weld_distance')
+        layout.prop(self, 'low_memory')
 
     def invoke(self, context, event):
         self.obj = _get_export_obj(context, self.report, 'mesh')
@@ -385,7 +481,7 @@ class ExportModel3do(bpy.types.Operator, ExportHelper):
             version = Model3doFileVersion[self.version]
             if version != Model3doFileVersion.Version2_1:
                 self.absolute_uv = False
-            export3do(self.obj, self.filepath, version, self.absolute_uv, self.export_vert_colors, self.sync_mesh_list)
+            export3do(self.obj, self.filepath, version, self.absolute_uv, self.export_vert_colors, self.sync_mesh_list, streaming=self.low_memory, weldDistance=self.weld_distance, uvWeldDistance=self.uv_weld_distance)
         except (AssertionError, ValueError) as e:
             print(f"\nAn exception was encountered while exporting object '{self.obj.name}' to 3DO format!\nError: {e}")
             self.report({'ERROR'}, f'Error: {e}')
@@ -425,10 +521,17 @@ class ImportKey(bpy.types.Operator, ImportHelper):
         default     = False,
     )
 
+    use_cache = bpy.props.BoolProperty(
+        name        = 'Use Disk Cache',
+        description = 'Load parsed files from the on-disk cache and store newly parsed files to the cache, so re-importing unchanged files is faster',
+        default     = False,
+    )
+
     def execute(self, context):
         try:
             scene = context.scene
-            importKey(self.filepath, scene, self.clear_scene, self.validate_active_object, self.named_markers)
+            cache = getAssetCache(self.use_cache)
+            importKey(self.filepath, scene, self.clear_scene, self.validate_active_object, self.named_markers, cache)
         except Exception as e:
             print(f"\nError: An exception was encountered while importing keyframe '{os.path.basename(self.filepath)}'!\nError: {e}")
             self.report({'ERROR'}, f'Error: {e}')
@@ -557,6 +660,15 @@ class Model3doPanel(bpy.types.Panel):
         node_properties.prop(obj, 'sith_model3do_hnode_flags', text='Flags')
         node_properties.prop(obj, 'sith_model3do_hnode_type' , text='Type')
 
+        base_obj = getModel3doBaseObj(obj)
+        if base_obj is not None:
+            geoset_properties = layout.box()
+            geoset_properties.label(text='Geoset (LOD)')
+            row = geoset_properties.row(align=True)
+            cur_geoset = base_obj.get(kModelGeoset, 0)
+            for i in range(base_obj.get(kModelNumGeosets, 1)):
+                row.operator(SetModel3doGeoset.bl_idname, text=str(i), depress=(i == cur_geoset)).geoset = i
+
 
 class Mesh3doFaceLayer(bpy.types.PropertyGroup):
     """
@@ -634,8 +746,8 @@ class Mesh3doFacePanel(bpy.types.Panel):
     def draw(self, context):
         wm_fl = context.window_manager.sith_mesh3do_face_layer
 
-        bm = bmesh.from_edit_mesh(context.edit_object.data)
-        bmMeshInit3doLayers(bm)
+        bm     = bmesh.from_edit_mesh(context.edit_object.data)
+        layers = bmMeshInit3doLayers(bm)
 
         aface   = bm.faces.active
         enabled = aface is not None
@@ -643,18 +755,18 @@ class Mesh3doFacePanel(bpy.types.Panel):
             fid = self._get_face_id(aface)
             if wm_fl.face_id != fid: # init Mesh3doFaceLayer properties aka hack to draw BMFace custom properties
                 wm_fl.face_id      = fid
-                wm_fl.type         = bmFaceGetType(aface, bm).toSet()
-                wm_fl.geo_mode     = bmFaceGetGeometryMode(aface, bm).name
-                wm_fl.light_mode   = bmFaceGetLightMode(aface, bm).name
-                wm_fl.texture_mode = bmFaceGetTextureMode(aface, bm).name
-                wm_fl.extra_light  = bmFaceGetExtraLight(aface, bm)
+                wm_fl.type         = layers.getType(aface).toSet()
+                wm_fl.geo_mode     = layers.getGeometryMode(aface).name
+                wm_fl.light_mode   = layers.getLightMode(aface).name
+                wm_fl.texture_mode = layers.getTextureMode(aface).name
+                wm_fl.extra_light  = layers.getExtraLight(aface)
 
             # Copy 3DO properties of BMFace from Mesh3doFaceLayer properties
-            bmFaceSetType(aface, bm, FaceType.fromSet(wm_fl.type))
-            bmFaceSetGeometryMode(aface, bm, GeometryMode[wm_fl.geo_mode])
-            bmFaceSetLightMode(aface, bm, LightMode[wm_fl.light_mode])
-            bmFaceSetTextureMode(aface, bm, TextureMode[wm_fl.texture_mode])
-            bmFaceSetExtraLight(aface, bm, Vector4f(*wm_fl.extra_light))
+            layers.setType(aface, FaceType.fromSet(wm_fl.type))
+            layers.setGeometryMode(aface, GeometryMode[wm_fl.geo_mode])
+            layers.setLightMode(aface, LightMode[wm_fl.light_mode])
+            layers.setTextureMode(aface, TextureMode[wm_fl.texture_mode])
+            layers.setExtraLight(aface, Vector4f(*wm_fl.extra_light))
         else:
             wm_fl.face_id = -1
 
@@ -675,6 +787,7 @@ classes = (
     Model3doPanel,
     ImportMat,
     ImportModel3do,
+    SetModel3doGeoset,
     ExportModel3do,
     ImportKey,
     ExportKey
@@ -690,6 +803,13 @@ def menu_func_import(self, context):
     self.layout.operator(ImportMat.bl_idname, text='Sith Game Engine Texture (.mat)')
     self.layout.operator(ImportModel3do.bl_idname, text='Sith Game Engine 3D Model (.3do)')
 
+@bpy.app.handlers.persistent
+def _migrate_3do_face_layers(dummy):
+    """ Converts 3DO face string layers of meshes in loaded .blend file to typed layers. """
+    for mesh in bpy.data.meshes:
+        if mesh.library is None:
+            meshMigrate3doFaceLayers(mesh)
+
 def register():
     # Register classes
     for cls in classes:
@@ -752,6 +872,7 @@ def register():
 
     # 3DO Mesh Face custom properties
     bpy.types.WindowManager.sith_mesh3do_face_layer = bpy.props.PointerProperty(type=Mesh3doFaceLayer)
+    bpy.app.handlers.load_post.append(_migrate_3do_face_layers)
 
     # KEY custom properties
     bpy.types.Scene.sith_key_flags = bpy.props.EnumProperty(
@@ -775,6 +896,7 @@ def unregister():
     del bpy.types.Scene.sith_key_flags
     del bpy.types.Scene.sith_key_types
 
+    bpy.app.handlers.load_post.remove(_migrate_3do_face_layers)
     del bpy.types.WindowManager.sith_mesh3do_face_layer
 
     del bpy.types.Object.sith_model3do_hnode_flags
@@ -790,6 +912,7 @@ def unregister():
     for cls in classes:
         bpy.utils.unregister_class(cls)
 
+    clearAssetCaches()
 
 if __name__ == '__main__':
     try:
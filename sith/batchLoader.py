@@ -0,0 +1,175 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import glob, os
+import numpy as np
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from itertools import islice
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from sith.key.keyLoader import loadKey
+from sith.model.model3do import Mesh3doArrays, Model3do
+from sith.model.model3doLoader import load3do
+from sith.types import LazyProcessPool
+
+try:
+    from multiprocessing import resource_tracker
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError: # Python < 3.8
+    SharedMemory = None
+
+kSharedMemoryMinSize = 1 << 20 # Min. size in bytes of model's arrays to be returned via shared memory
+
+_mesh_array_props = (
+    'vertices', 'vertexColors', 'normals', 'uvs',
+    'faceOffsets', 'faceVertexIdxs', 'faceUvIdxs', 'faceMaterialIdxs', 'faceTypes',
+    'faceGeometryModes', 'faceLightModes', 'faceTextureModes', 'faceColors', 'faceNormals'
+)
+
+class BatchResult(NamedTuple):
+    """
+    Result of loading a single file in batch.
+    For .3do file `result` is tuple of (Model3do, Model3doFileVersion), for .key file `result` is Key.
+    If file failed to load `result` is None and `error` is the raised exception.
+    """
+    path: str
+    result: Any
+    error: Optional[BaseException]
+
+def loadBatch(paths: Union[str, Path, Iterable[Union[str, Path]]], workers: Optional[int] = None, ordered: bool = True, columnar: bool = True) -> Iterator[BatchResult]:
+    """
+    Loads .3do and .key files in parallel by the pool of `workers` processes
+    and yields `BatchResult` for each file as it is loaded.
+    `paths` is either list of file paths or glob pattern, e.g.: 'res/3do/**/*.3do'.
+    If `ordered` is True results are yielded in the order of `paths`, otherwise in the order of completion.
+    If `columnar` is True model meshes are loaded as `Mesh3doArrays` and their arrays
+    are returned from worker process via shared memory when larger than `kSharedMemoryMinSize`.
+    A file which fails to load doesn't stop the batch, its exception is returned in `BatchResult.error`.
+    At most 2 * `workers` files are submitted to the pool at once, so unconsumed results don't pile up
+    while the caller processes yielded results.
+    """
+    if isinstance(paths, (str, Path)):
+        paths = sorted(glob.glob(str(paths), recursive=True))
+    paths = (str(p) for p in paths)
+
+    workers    = workers or os.cpu_count() or 1
+    maxPending = 2 * workers
+    pool       = LazyProcessPool(workers)
+    pending: Dict[Future, str] = {} # submitted futures which results were not yielded yet
+    queue: Deque[Future] = deque()  # pending futures in submit order, if `ordered`
+    try:
+        while True:
+            for p in islice(paths, maxPending - len(pending)):
+                f = pool.submit(_load_file, p, columnar)
+                pending[f] = p
+                if ordered:
+                    queue.append(f)
+            if not pending:
+                break
+
+            if ordered:
+                f = queue.popleft()
+            else:
+                f = next(iter(wait(pending, return_when=FIRST_COMPLETED).done))
+            yield _make_result(pending.pop(f), f)
+    finally:
+        for f in pending:
+            f.cancel()
+        pool.shutdown()
+        for f in pending: # release shared memory of results which were not consumed
+            if not f.cancelled() and f.exception() is None:
+                _release_shared_arrays(f.result()[1])
+
+def _load_file(path: str, columnar: bool) -> Tuple[Any, Optional[Tuple[str, List[Tuple]]]]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.3do':
+        model, fileVersion = load3do(path, columnar=columnar)
+        return ((model, fileVersion), _export_shared_arrays(model))
+    elif ext == '.key':
+        return (loadKey(path), None)
+    raise ValueError(f"Unsupported file type '{ext}'")
+
+def _make_result(path: str, future: Future) -> BatchResult:
+    try:
+        result, shared = future.result()
+        if shared is not None:
+            _import_shared_arrays(result[0], shared)
+        return BatchResult(path, result, None)
+    except Exception as e:
+        return BatchResult(path, None, e)
+
+def _export_shared_arrays(model: Model3do) -> Optional[Tuple[str, List[Tuple]]]:
+    """
+    Moves `Mesh3doArrays` arrays of `model` to new shared memory block and returns the block's name and layout.
+    The arrays are replaced by empty arrays so they're not pickled with the model.
+    Returns None if shared memory is not available or arrays are smaller than `kSharedMemoryMinSize`.
+    """
+    if SharedMemory is None:
+        return None
+
+    arrays: List[Tuple[int, int, str, np.ndarray]] = []
+    size = 0
+    for gi, geoset in enumerate(model.geosets):
+        for mi, mesh in enumerate(geoset.meshes):
+            if isinstance(mesh, Mesh3doArrays):
+                for prop in _mesh_array_props:
+                    a = getattr(mesh, prop)
+                    arrays.append((gi, mi, prop, a))
+                    size += (a.nbytes + 7) & ~7 # 8 byte aligned
+    if size < kSharedMemoryMinSize:
+        return None
+
+    shm = SharedMemory(create=True, size=size)
+    if os.name == 'posix':
+        # Block is unlinked by the receiving process, so don't let worker's resource tracker unlink it at exit
+        resource_tracker.unregister(shm._name, 'shared_memory')
+
+    layout: List[Tuple] = []
+    offset = 0
+    for gi, mi, prop, a in arrays:
+        np.ndarray(a.shape, a.dtype, buffer=shm.buf, offset=offset)[...] = a
+        layout.append((gi, mi, prop, offset, a.dtype.str, a.shape))
+        mesh = model.geosets[gi].meshes[mi]
+        setattr(mesh, prop, np.empty((0,) + a.shape[1:], dtype=a.dtype))
+        offset += (a.nbytes + 7) & ~7
+    shm.close()
+    return (shm.name, layout)
+
+def _import_shared_arrays(model: Model3do, shared: Tuple[str, List[Tuple]]):
+    """ Copies arrays from shared memory block back to `model` meshes and frees the block """
+    name, layout = shared
+    shm = SharedMemory(name=name)
+    try:
+        for gi, mi, prop, offset, dtype, shape in layout:
+            mesh = model.geosets[gi].meshes[mi]
+            setattr(mesh, prop, np.ndarray(shape, dtype, buffer=shm.buf, offset=offset).copy())
+    finally:
+        shm.close()
+        shm.unlink()
+
+def _release_shared_arrays(shared: Optional[Tuple[str, List[Tuple]]]):
+    if shared is not None:
+        shm = SharedMemory(name=shared[0])
+        shm.close()
+        shm.unlink()
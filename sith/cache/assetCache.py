@@ -0,0 +1,190 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, sys
+import numpy as np
+
+from collections import OrderedDict
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from sith.key.key import Key
+from sith.key.keyLoader import loadKey
+from sith.material import ColorMap, loadMat, Mat
+from sith.model.model3do import Model3do
+from sith.model.model3doLoader import load3do, Model3doFileVersion
+
+from .diskCache import _option_key, CacheStats, DiskCache
+
+kDefaultAssetCacheSize = 256 << 20
+_size_sample_len       = 32 # lists longer than this have their size estimated from the 1st element
+
+class AssetCache:
+    """
+    In-process LRU cache of loaded 3DO models, KEY animations, decoded MAT mipmaps and ColorMaps.
+    Cached object is reloaded when its file's mtime or size changes, and the least
+    recently used objects are dropped when the estimated size of cached objects exceeds `maxSize`.
+    If `backing` `DiskCache` is set, objects not in memory are loaded through it.
+    The backing cache is fixed for the lifetime of cache, since objects loaded with and without it are shared.
+    Note, cached objects are shared between callers and shouldn't be modified.
+    """
+    def __init__(self, maxSize: int = kDefaultAssetCacheSize, backing: Optional[DiskCache] = None):
+        self._maxSize = maxSize
+        self._backing = backing
+        self._size    = 0
+        self._stats   = CacheStats()
+        self._entries: 'OrderedDict[Tuple, Tuple[int, int, Any, int]]' = OrderedDict() # key: (mtime, file size, obj, obj size)
+
+    @property
+    def maxSize(self) -> int:
+        return self._maxSize
+
+    @maxSize.setter
+    def maxSize(self, size: int):
+        self._maxSize = size
+        self._evict()
+
+    @property
+    def backing(self) -> Optional[DiskCache]:
+        return self._backing
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._stats
+
+    def size(self) -> int:
+        """ Returns the estimated size of cached objects in bytes """
+        return self._size
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def get(self, kind: str, filePath: Union[Path, str], loader: Callable[[], Any], **options) -> Any:
+        """
+        Returns cached object of `kind` for file at `filePath` and `options`.
+        If object is not cached or file has changed, it's loaded by `loader` and cached.
+        """
+        filePath = os.path.abspath(filePath)
+        st  = os.stat(filePath)
+        key = (kind, filePath) + tuple(f'{k}={_option_key(options[k])}' for k in sorted(options))
+        e   = self._entries.get(key)
+        if e is not None:
+            if e[0] == st.st_mtime_ns and e[1] == st.st_size:
+                self._entries.move_to_end(key)
+                self._stats.hits += 1
+                return e[2]
+            self._drop(key) # file has changed
+
+        self._stats.misses += 1
+        obj  = loader()
+        size = _estimate_size(obj)
+        if size <= self._maxSize:
+            self._entries[key] = (st.st_mtime_ns, st.st_size, obj, size)
+            self._size += size
+            self._stats.writes += 1
+            self._evict()
+        return obj
+
+    def load3do(self, filePath: Union[Path, str], columnar: bool = False) -> Tuple[Model3do, Model3doFileVersion]:
+        """ Loads 3DO model with all geosets from cache or file """
+        loader = (lambda: self._backing.load3do(filePath, columnar)) if self._backing else (lambda: load3do(filePath, columnar=columnar))
+        return self.get('3do', filePath, loader, columnar=columnar)
+
+    def loadKey(self, filePath: Union[Path, str]) -> Key:
+        loader = (lambda: self._backing.loadKey(filePath)) if self._backing else (lambda: loadKey(filePath))
+        return self.get('key', filePath, loader)
+
+    def loadMat(self, filePath: Union[Path, str], cmp: Optional[ColorMap] = None, maxTexSize: int = 0) -> Mat:
+        """ Loads MAT with textures' mip level selected by `maxTexSize` decoded by `cmp` from cache or file """
+        loader = (lambda: self._backing.loadMat(filePath, cmp, maxTexSize)) if self._backing else (lambda: loadMat(filePath, cmp, maxTexSize))
+        return self.get('mat', filePath, loader, cmp=cmp, maxTexSize=maxTexSize)
+
+    def loadCmp(self, filePath: Union[Path, str]) -> ColorMap:
+        loader = (lambda: self._backing.loadCmp(filePath)) if self._backing else (lambda: ColorMap.load(filePath))
+        return self.get('cmp', filePath, loader)
+
+    def _drop(self, key: Tuple):
+        self._size -= self._entries.pop(key)[3]
+
+    def _evict(self):
+        while self._size > self._maxSize and self._entries:
+            self._drop(next(iter(self._entries)))
+            self._stats.evictions += 1
+
+_asset_caches: Dict[bool, AssetCache] = {} # use disk cache -> session's asset cache
+
+def getAssetCache(useDiskCache: bool = False) -> AssetCache:
+    """
+    Returns the session's asset cache.
+    If `useDiskCache` is True the returned cache is backed by the default `DiskCache`.
+    Each is separate `AssetCache` instance, so the callers of one don't change the backing of the other.
+    """
+    cache = _asset_caches.get(useDiskCache)
+    if cache is None:
+        backing = None
+        if useDiskCache:
+            try:
+                backing = DiskCache()
+            except OSError as e:
+                print(f"Warning: Disk cache is disabled: {e}")
+        cache = _asset_caches[useDiskCache] = AssetCache(backing=backing)
+    return cache
+
+def clearAssetCaches():
+    """ Clears all session's asset caches """
+    for cache in _asset_caches.values():
+        cache.clear()
+
+def _estimate_size(obj: Any, seen: Optional[Dict[int, None]] = None) -> int:
+    """
+    Returns estimated memory size of object graph in bytes.
+    The size of long lists is estimated from the size of their first element.
+    """
+    if seen is None:
+        seen = {}
+    if id(obj) in seen or isinstance(obj, (Enum, type)) or obj is None:
+        return 0
+    seen[id(obj)] = None
+
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)):
+        return size
+
+    if isinstance(obj, (list, tuple)):
+        if len(obj) > _size_sample_len:
+            return size + _estimate_size(obj[0], seen) * len(obj)
+        return size + sum(_estimate_size(o, seen) for o in obj)
+
+    if isinstance(obj, dict):
+        return size + sum(_estimate_size(k, seen) + _estimate_size(v, seen) for k, v in obj.items())
+
+    for cls in type(obj).__mro__:
+        for s in getattr(cls, '__slots__', ()):
+            if not s.startswith('__'):
+                size += _estimate_size(getattr(obj, s, None), seen)
+    if hasattr(obj, '__dict__'):
+        size += _estimate_size(obj.__dict__, seen)
+    return size
@@ -0,0 +1,318 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import hashlib, io, os, pickle
+import numpy as np
+
+from pathlib import Path
+from struct import Struct
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from sith import bl_info
+from sith.key.key import Key
+from sith.key.keyLoader import loadKey
+from sith.material import ColorMap, loadMat, Mat
+from sith.model.model3do import Model3do
+from sith.model.model3doLoader import load3do, Model3doFileVersion
+
+kCacheVersion   = 4 # Increment when format of cached objects changes
+kDefaultMaxSize = 1 << 30
+
+_entry_magic     = b'SITHCACH'
+_entry_header    = Struct('<8s32sQQq16s') # magic, version stamp, pickle size, source file size, source file mtime_ns, source file content hash
+_entry_ext       = '.cache'
+_blob_alignment  = 64
+_min_array_size  = 64 # min. array size in bytes to be stored in entry blob
+_version_file    = 'version'
+_hash_chunk_size = 1 << 20
+_miss            = object()
+
+# Classes which cached objects are made of. Entries can reference only these and the numpy array
+# reconstructors, so unpickling an entry can't call arbitrary functions.
+_entry_modules = frozenset((
+    'sith.key.key',
+    'sith.material.cmp',
+    'sith.material.mat',
+    'sith.model.model3do',
+    'sith.model.model3doLoader',
+    'sith.types.vector',
+))
+_numpy_modules = frozenset(('numpy', 'numpy.core.multiarray', 'numpy._core.multiarray', 'numpy.core.numeric', 'numpy._core.numeric'))
+_numpy_globals = frozenset(('dtype', 'ndarray', 'scalar', '_frombuffer', '_reconstruct'))
+
+def _default_cache_dir() -> Path:
+    base = os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA') or os.path.join(Path.home(), '.cache')
+    return Path(base) / 'blender-sith'
+
+def _align(n: int) -> int:
+    return (n + _blob_alignment - 1) & ~(_blob_alignment - 1)
+
+def _file_hash(filePath: str) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    with open(filePath, 'rb') as f:
+        for chunk in iter(lambda: f.read(_hash_chunk_size), b''):
+            h.update(chunk)
+    return h.digest()
+
+def _make_private_dir(path: Path):
+    """
+    Makes directory `path` accessible only by the current user.
+    Raises `PermissionError` if existing directory is owned by another user.
+    """
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not hasattr(os, 'getuid'): # Windows, user's cache dir is private by default
+        return
+    st = os.stat(path)
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"Cache directory '{path}' is owned by another user")
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+
+class CacheStats:
+    """ Hit and miss statistics of `DiskCache` """
+    def __init__(self):
+        self.hits      = 0 # number of objects loaded from cache
+        self.misses    = 0 # number of objects loaded from file
+        self.writes    = 0 # number of written cache entries
+        self.evictions = 0 # number of entries removed to keep cache size in limit
+        self.errors    = 0 # number of entries which failed to read or write
+
+    def __repr__(self):
+        return f'hits: {self.hits} misses: {self.misses} writes: {self.writes} evictions: {self.evictions} errors: {self.errors}'
+
+class _EntryPickler(pickle.Pickler):
+    """ Pickler which writes numpy arrays to separate blob instead of pickle stream """
+    def __init__(self, file, blob: io.BytesIO):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.blob = blob
+
+    def persistent_id(self, obj):
+        if type(obj) is np.ndarray and obj.dtype != object and obj.nbytes >= _min_array_size:
+            offset = _align(self.blob.tell())
+            self.blob.seek(offset)
+            self.blob.write(np.ascontiguousarray(obj).data)
+            return ('ndarray', offset, obj.dtype.str, obj.shape)
+        return None
+
+class _EntryUnpickler(pickle.Unpickler):
+    """ Unpickler which maps numpy arrays from entry blob and loads only the classes of cached objects """
+    def __init__(self, file, buffer: np.memmap, blobOffset: int):
+        super().__init__(file)
+        self.buffer     = buffer
+        self.blobOffset = blobOffset
+
+    def find_class(self, module: str, name: str):
+        if module in _numpy_modules and name in _numpy_globals:
+            return super().find_class(module, name)
+        if module in _entry_modules:
+            cls = super().find_class(module, name)
+            if isinstance(cls, type):
+                return cls
+        raise pickle.UnpicklingError(f"'{module}.{name}' is not allowed in cache entry")
+
+    def persistent_load(self, pid):
+        _, offset, dtype, shape = pid
+        return np.ndarray(shape, dtype, buffer=self.buffer, offset=self.blobOffset + offset)
+
+class DiskCache:
+    """
+    Persistent cache of parsed 3DO, KEY, CMP and decoded MAT files.
+    Cache entries are keyed by file path, the type of the cached object and the load options,
+    e.g. the ColorMap used to decode MAT. Entry header stores the size, mtime and content hash of the file
+    the object was loaded from. Entry is valid while the file's size and mtime are unchanged,
+    the file content is hashed only when its mtime changes, e.g. the file was touched, or entry is written.
+    Numpy arrays of cached objects (`Mesh3doArrays` arrays, MAT pixel data) are stored
+    as raw buffers which are memory mapped when entry is loaded.
+    When the size of cache exceeds `maxSize` the least recently used entries are removed,
+    and when cache version stamp changes all entries are removed.
+
+    Entries are pickled objects, so the cache directory is made accessible only by the current user,
+    i.e. entries can be written only by the user who reads them. In addition entries can reference only
+    the classes of cached objects, so unpickling a corrupted entry fails instead of calling arbitrary functions.
+    """
+    def __init__(self, cacheDir: Optional[Union[Path, str]] = None, maxSize: int = kDefaultMaxSize):
+        self._dir     = Path(cacheDir) if cacheDir is not None else _default_cache_dir()
+        self._maxSize = maxSize
+        self._stats   = CacheStats()
+        self._stamp   = f'{kCacheVersion}:{".".join(map(str, bl_info["version"]))}:{bl_info.get("pre_release", "")}'
+        _make_private_dir(self._dir)
+        self._check_version()
+
+    @property
+    def dir(self) -> Path:
+        return self._dir
+
+    @property
+    def maxSize(self) -> int:
+        return self._maxSize
+
+    @maxSize.setter
+    def maxSize(self, size: int):
+        self._maxSize = size
+        self._evict()
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._stats
+
+    def size(self) -> int:
+        """ Returns the size of all cache entries in bytes """
+        return sum(s for _, s, _ in self._entries())
+
+    def clear(self):
+        """ Removes all cache entries """
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    def get(self, kind: str, filePath: Union[Path, str], loader: Callable[[], Any], **options) -> Any:
+        """
+        Returns cached object of `kind` for file at `filePath` and `options`.
+        If object is not cached, it's loaded by `loader` and stored to cache.
+        """
+        filePath = os.path.abspath(filePath)
+        st   = os.stat(filePath)
+        path = self._entry_path(kind, filePath, options)
+        obj  = self._read_entry(path, filePath, st)
+        if obj is not _miss:
+            self._stats.hits += 1
+            return obj
+
+        self._stats.misses += 1
+        content = _file_hash(filePath) # hashed before loading, so file change during loading invalidates entry
+        obj = loader()
+        self._write_entry(path, obj, st, content)
+        return obj
+
+    def load3do(self, filePath: Union[Path, str], columnar: bool = True) -> Tuple[Model3do, Model3doFileVersion]:
+        """
+        Loads 3DO model with all geosets from cache or file.
+        Note, arrays of columnar model are memory mapped copy-on-write, so modifying them doesn't change the cache entry.
+        """
+        return self.get('3do', filePath, lambda: load3do(filePath, columnar=columnar), columnar=columnar)
+
+    def loadKey(self, filePath: Union[Path, str]) -> Key:
+        return self.get('key', filePath, lambda: loadKey(filePath))
+
+    def loadMat(self, filePath: Union[Path, str], cmp: Optional[ColorMap] = None, maxTexSize: int = 0) -> Mat:
+        """ Loads MAT with textures' mip level selected by `maxTexSize` decoded by `cmp` from cache or file """
+        return self.get('mat', filePath, lambda: loadMat(filePath, cmp, maxTexSize), cmp=cmp, maxTexSize=maxTexSize)
+
+    def loadCmp(self, filePath: Union[Path, str]) -> ColorMap:
+        return self.get('cmp', filePath, lambda: ColorMap.load(filePath))
+
+    def _check_version(self):
+        vpath = self._dir / _version_file
+        try:
+            stamp = vpath.read_text()
+        except OSError:
+            stamp = None
+        if stamp != self._stamp:
+            self.clear()
+            vpath.write_text(self._stamp)
+
+    def _entry_path(self, kind: str, filePath: str, options: Dict[str, Any]) -> Path:
+        key  = [self._stamp, kind, filePath]
+        key += [f'{k}={_option_key(options[k])}' for k in sorted(options)]
+        name = hashlib.blake2b('\n'.join(key).encode('utf-8'), digest_size=20).hexdigest()
+        return self._dir / (name + _entry_ext)
+
+    def _read_entry(self, path: Path, filePath: str, st: os.stat_result) -> Any:
+        if not path.exists():
+            return _miss
+        try:
+            buf = np.memmap(path, dtype=np.uint8, mode='c')
+            magic, stamp, size, fileSize, fileMtime, content = _entry_header.unpack(buf[:_entry_header.size].tobytes())
+            if magic != _entry_magic or stamp.rstrip(b'\0').decode('utf-8') != self._stamp:
+                raise ValueError('invalid cache entry header')
+
+            if fileSize != st.st_size:
+                return _miss # file has changed, entry is replaced
+            if fileMtime != st.st_mtime_ns:
+                if _file_hash(filePath) != content:
+                    return _miss
+                with open(path, 'r+b') as f: # file was touched but not changed
+                    f.write(_entry_header.pack(magic, stamp, size, st.st_size, st.st_mtime_ns, content))
+
+            start = _entry_header.size
+            obj = _EntryUnpickler(io.BytesIO(buf[start:start + size].tobytes()), buf, _align(start + size)).load()
+            os.utime(path) # mark entry as recently used
+            return obj
+        except Exception as e:
+            print(f"Warning: Failed to read cache entry '{path}': {e}")
+            self._stats.errors += 1
+            self._remove(path)
+            return _miss
+
+    def _write_entry(self, path: Path, obj: Any, st: os.stat_result, content: bytes):
+        tmpPath = path.with_suffix(f'.{os.getpid()}.tmp')
+        try:
+            data = io.BytesIO()
+            blob = io.BytesIO()
+            _EntryPickler(data, blob).dump(obj)
+            with open(tmpPath, 'wb') as f:
+                f.write(_entry_header.pack(_entry_magic, self._stamp.encode('utf-8'), data.tell(), st.st_size, st.st_mtime_ns, content))
+                f.write(data.getbuffer())
+                f.write(b'\0' * (_align(f.tell()) - f.tell()))
+                f.write(blob.getbuffer())
+            os.replace(tmpPath, path)
+            self._stats.writes += 1
+        except Exception as e:
+            print(f"Warning: Failed to write cache entry '{path}': {e}")
+            self._stats.errors += 1
+            self._remove(tmpPath)
+            return
+        self._evict()
+
+    def _entries(self):
+        """ Returns list of (mtime, size, path) of cache entries """
+        entries = []
+        for e in os.scandir(self._dir):
+            if e.name.endswith(_entry_ext):
+                try:
+                    st = e.stat()
+                    entries.append((st.st_mtime, st.st_size, Path(e.path)))
+                except OSError:
+                    pass
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        size    = sum(s for _, s, _ in entries)
+        for _, s, path in sorted(entries, key=lambda e: e[0]):
+            if size <= self._maxSize:
+                break
+            if self._remove(path):
+                size -= s
+                self._stats.evictions += 1
+
+    def _remove(self, path: Path) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError: # e.g. entry is memory mapped on Windows
+            return False
+
+def _option_key(value: Any) -> str:
+    if isinstance(value, ColorMap):
+        return 'cmp:' + hashlib.blake2b(np.asarray(value.palette, dtype=np.uint8).tobytes(), digest_size=16).hexdigest()
+    if isinstance(value, Path):
+        return str(value)
+    return repr(value)
@@ -82,6 +82,8 @@ class KeyframeFlag(IntEnum):
     AllChange         = 3
 
 class KeyMarker:
+    __slots__ = ('_frame', '_type')
+
     def __init__(self):
         self._frame : float = 0.0
         self._type : KeyMarkerType = KeyMarkerType.Finished
@@ -103,6 +105,8 @@ class KeyMarker:
         self._type = type
 
 class Keyframe:
+    __slots__ = ('_flags', '_frame', '_pos', '_orient', '_dpos', '_drot')
+
     def __init__(self):
         self._flags: KeyframeFlag = KeyframeFlag.NoChange
         self._frame : int      = 0
@@ -160,6 +164,8 @@ class Keyframe:
         self._drot = drot
 
 class KeyNode:
+    __slots__ = ('_idx', '_meshName', '_kfs')
+
     def __init__(self):
         self._idx : int = 0
         self._meshName : str = ""
@@ -26,16 +26,19 @@ from sith.model.utils import *
 from sith.types import BenchmarkMeter
 from sith.utils import *
 
-from typing import Optional
+from typing import Optional, Union, TYPE_CHECKING
 
 from .key import *
 from . import keyLoader
 
-def importKey(keyPath: str, scene: bpy.types.Scene, clearScene: bool, validateActiveObject: bool, namedMarkers: bool):
+if TYPE_CHECKING:
+    from sith.cache import AssetCache, DiskCache
+
+def importKey(keyPath: str, scene: bpy.types.Scene, clearScene: bool, validateActiveObject: bool, namedMarkers: bool, cache: Optional[Union['AssetCache', 'DiskCache']] = None):
     with BenchmarkMeter(' done in {:.4f} sec.'):
         print("importing KEY: %r..." % (keyPath), end="")
 
-        key = keyLoader.loadKey(keyPath)
+        key = cache.loadKey(keyPath) if cache else keyLoader.loadKey(keyPath)
 
         # Check selected object or find anim object in the scene
         obj = scene.objects.active
@@ -22,16 +22,51 @@
 import os
 from .key import *
 from pathlib import Path
-from sith.text.tokenizer import TokenType, Tokenizer
+from sith.text.sections import LazySections, lazySectionProperty
+from sith.text.tokenizer import makeTokenizer, TokenType, Tokenizer
 from sith.model import Mesh3doNodeType
 from typing import Union
 
-def loadKey(filePath: Union[Path, str]) -> Key:
-    """ Loads Key from .key file """
-    f = open(filePath, 'r', encoding='utf-8')
-    tok = Tokenizer(f)
-    key = Key(os.path.basename(filePath))
-
+class LazyKey(LazySections, Key):
+    """
+    Key which parses .key file sections on first access of the section's data.
+    e.g.: accessing `markers` parses only MARKERS section.
+    """
+    def __init__(self, filePath: Union[Path, str]):
+        Key.__init__(self, os.path.basename(filePath))
+        self._init_lazy_sections(filePath)
+
+    flags     = lazySectionProperty(Key.flags, "HEADER")
+    nodeTypes = lazySectionProperty(Key.nodeTypes, "HEADER")
+    numFrames = lazySectionProperty(Key.numFrames, "HEADER")
+    numJoints = lazySectionProperty(Key.numJoints, "HEADER")
+    fps       = lazySectionProperty(Key.fps, "HEADER")
+    markers   = lazySectionProperty(Key.markers, "MARKERS")
+    nodes     = lazySectionProperty(Key.nodes, "KEYFRAME NODES")
+
+    def _parse_lazy_section(self, tok: Tokenizer, section: str):
+        if section == "HEADER":
+            _parse_key_section_header(tok, self)
+
+        elif section == "MARKERS":
+            _parse_key_section_markers(tok, self)
+
+        elif section == "KEYFRAME NODES":
+            _parse_key_section_keyframe_nodes(tok, self)
+
+def loadKey(filePath: Union[Path, str], lazy: bool = False) -> Key:
+    """
+    Loads Key from .key file.
+    If `lazy` is True returned key is `LazyKey` which parses file sections on first access.
+    """
+    if lazy:
+        return LazyKey(filePath)
+
+    with open(filePath, 'rb') as f, makeTokenizer(f) as tok:
+        return _parse_key(tok, os.path.basename(filePath))
+
+def _parse_key(tok: Tokenizer, name: str) -> Key:
+    key = Key(name)
     while True:
         _skip_to_next_key_section(tok)
         t = tok.getToken()
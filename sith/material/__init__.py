@@ -24,10 +24,18 @@ from .cmp import (
     ColorMap
 )
 
-from .mat import importMat
+from .mat import (
+    getImageTextureSize,
+    importMat,
+    loadMat,
+    Mat
+)
 
 __all__ = [
     "CmpPaletteRGB",
     "ColorMap",
-    "importMat"
+    "getImageTextureSize",
+    "importMat",
+    "loadMat",
+    "Mat"
 ]
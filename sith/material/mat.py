@@ -26,14 +26,18 @@ from collections import namedtuple
 from enum import IntEnum
 from pathlib import Path
 from struct import Struct
-from typing import BinaryIO, List, NamedTuple, Optional, Union
+from typing import BinaryIO, List, NamedTuple, Optional, Tuple, Union, TYPE_CHECKING
 from .cmp import ColorMap
 
+if TYPE_CHECKING:
+    from sith.cache import AssetCache, DiskCache
+
 file_magic        = b'MAT '
 required_version  = 0x32
 color_tex_width   = 32
 color_tex_height  = 32
 max_texture_slots = 18 # blender 2.79 limitation
+tex_size_prop     = 'sith_mat_texture_size' # image property storing the size of largest mip level
 
 class MatType(IntEnum):
     Color   = 0
@@ -112,13 +116,27 @@ class Pixel(NamedTuple):
     blue: float
     alpha: float
 
-Pixels = List[Pixel]
+Pixels = np.ndarray # flat array of RGBA8 pixels
 
 class Mipmap(NamedTuple):
-    width: int
-    height: int
+    width: int  # width of largest mip level
+    height: int # height of largest mip level
     color_info: ColorFormat
-    pixel_data_array: Optional[List[Pixels]]
+    pixel_data_array: Optional[List[Pixels]] # pixel data of mip level mip_level
+    mip_level: int = 0
+
+    @property
+    def level_width(self) -> int:
+        return max(self.width >> self.mip_level, 1)
+
+    @property
+    def level_height(self) -> int:
+        return max(self.height >> self.mip_level, 1)
+
+class Mat(NamedTuple):
+    header: MatHeader
+    records: List[Union[MatColorRecord, MatTextureRecord]]
+    textures: List[Mipmap] # empty for MatType.Color
 
 _linear_coef = 1.0 / 255.0
 
@@ -168,7 +186,7 @@ def _decode_indexed_pixel_data(pd, width: int, height: int, cmp: ColorMap, trans
 
     raw_img = np.flip(
         raw_img.view(np.uint8).reshape((height, width, 4)), axis=0
-    ).flatten() * _linear_coef # get byte array and convert to linear
+    ).flatten() # get byte array
     return raw_img
 
 def _get_pixel_data_size(width: int, height: int, bpp: int) -> int:
@@ -203,10 +221,10 @@ def _decode_rgba_pixel_data(pd, width: int, height: int, ci: ColorFormat) -> Pix
               ((raw_img >> ci.blue_shl)  & bm)  << ci.blue_shr  << 16 | \
               decode_alpha(raw_img) << 24
 
-    # Flip image over Y-axis (height) and convert to linear
+    # Flip image over Y-axis (height)
     raw_img = np.flip(
         raw_img.view(np.uint8).reshape((height, width, 4)), axis=[0]
-    ).flatten() * _linear_coef # get byte array and convert to linear
+    ).flatten() # get byte array
     return raw_img
 
 def _read_pixel_data(f: BinaryIO, width: int, height: int, ci: ColorFormat, cmp: Optional[ColorMap] = None, transparent_color: Optional[int] = None) -> Pixels:
@@ -221,28 +239,48 @@ def _read_pixel_data(f: BinaryIO, width: int, height: int, ci: ColorFormat, cmp:
     # RGB(A)
     return _decode_rgba_pixel_data(pd, width, height, ci)
 
-def _read_mipmap(f: BinaryIO, ci: ColorFormat, cmp: Optional[ColorMap] = None) -> Mipmap:
+def _select_mip_level(width: int, height: int, levels: int, maxTexSize: int) -> int:
+    """
+    Returns the largest mip level which width and height are not greater than `maxTexSize`.
+    If `maxTexSize` is 0 the largest level is returned, if no level fits the smallest level is returned.
+    """
+    if maxTexSize <= 0:
+        return 0
+    for i in range(0, levels):
+        if (width >> i) <= maxTexSize and (height >> i) <= maxTexSize:
+            return i
+    return max(levels - 1, 0)
+
+def _read_mipmap(f: BinaryIO, ci: ColorFormat, cmp: Optional[ColorMap] = None, maxTexSize: int = 0) -> Mipmap:
     """
-    Reads MipMap textures and returns List of mipmap pixel data.
+    Reads MipMap texture and returns pixel data of the mip level selected by `maxTexSize`.
+    The pixel data of other mip levels is skipped without decoding.
     If cmp is required and is None then no pixel data is set
     """
     # Read texture header
     mmh_raw = mmm_serf.unpack(bytearray(f.read(mmm_serf.size)))
     mmh     = MatMipmapHeader._make(mmh_raw)
+    level   = _select_mip_level(mmh.width, mmh.height, mmh.levels, maxTexSize)
+
+    # Get offsets of pixel data of mip levels
+    offset    = f.tell()
+    pd_offset = offset
+    for i in range(0, mmh.levels):
+        if i == level:
+            pd_offset = offset
+        offset += _get_pixel_data_size(mmh.width >> i, mmh.height >> i, ci.bpp)
 
     pd: Optional[List[Pixels]] = None
     if (ci.color_mode != ColorMode.Indexed and ci.bpp != 8) or cmp:
         # Read MipMap pixel data
         transparent_color =  mmh.transparent_color_num if ci.bpp == 8 and mmh.transparent else None
-        pd = []
-        for i in range(0, mmh.levels):
-            w: int = mmh.width >> i
-            h: int = mmh.height >> i
-            pd += [_read_pixel_data(f, w, h, ci, cmp, transparent_color)]
+        f.seek(pd_offset)
+        pd = [_read_pixel_data(f, mmh.width >> level, mmh.height >> level, ci, cmp, transparent_color)]
     else:
         print("  Missing ColorMap, only texture size will be loaded!")
 
-    return Mipmap(mmh.width, mmh.height, ci, pd)
+    f.seek(offset) # skip to the next texture
+    return Mipmap(mmh.width, mmh.height, ci, pd, level)
 
 def _get_tex_name(idx: int, mat_name: str) -> str:
     name = os.path.splitext(mat_name)[0]
@@ -250,7 +288,16 @@ def _get_tex_name(idx: int, mat_name: str) -> str:
         name += '_cel_' + str(idx)
     return name
 
-def _mat_add_new_texture(mat: bpy.types.Material, width: int, height: int, texIdx: int, pixdata: Optional[Pixels], hasTransparency: bool):
+def getImageTextureSize(img: bpy.types.Image) -> Tuple[int, int]:
+    """
+    Returns the texture size of image, i.e. the size of the largest mip level of MAT texture.
+    Note, image of imported MAT can be smaller when lower mip level was imported.
+    """
+    if tex_size_prop in img:
+        return tuple(img[tex_size_prop])
+    return tuple(img.size)
+
+def _mat_add_new_texture(mat: bpy.types.Material, width: int, height: int, texIdx: int, pixdata: Optional[Pixels], hasTransparency: bool, texSize: Optional[Tuple[int, int]] = None):
     img_name = _get_tex_name(texIdx, mat.name)
     if not img_name in bpy.data.images:
         img = bpy.data.images.new(
@@ -264,13 +311,14 @@ def _mat_add_new_texture(mat: bpy.types.Material, width: int, height: int, texId
             img.scale(width, height)
 
     if pixdata is not None:
-        img.pixels[:] = pixdata
+        img.pixels[:] = pixdata * _linear_coef # convert to linear
         img.pack(as_png=True)
         img.update()
     else:
         img.generated_type   = 'UV_GRID'
         img.generated_width  = width
         img.generated_height = height
+    img[tex_size_prop] = texSize if texSize is not None else (width, height)
 
     tex                   = bpy.data.textures.new(img_name, 'IMAGE')
     tex.image             = img
@@ -292,18 +340,38 @@ def _make_color_textures(mat: bpy.types.Material, records: List[MatColorRecord],
         pixmap: Optional[Pixels] = None
         if cmp:
             rgba   = (cmp.palette[r.color_index]) + (255,)
-            pixmap = np.full((color_tex_height, color_tex_width, 4), rgba) \
-                .flatten() * _linear_coef # flatten and convert to linear
+            pixmap = np.full((color_tex_height, color_tex_width, 4), rgba, dtype=np.uint8) \
+                .flatten()
         else:
             print("  Missing ColorMap, only texture size will be loaded!")
 
         # Make new texture from Pixels
         _mat_add_new_texture(mat, color_tex_width, color_tex_height, idx, pixmap, hasTransparency=False)
 
-def importMat(filePath: Union[Path, str], cmp: Optional[ColorMap] = None) -> bpy.types.Material:
-    f = open(filePath, 'rb')
-    h = _read_header(f)
-    records = _read_records(f, h)
+def loadMat(filePath: Union[Path, str], cmp: Optional[ColorMap] = None, maxTexSize: int = 0) -> Mat:
+    """
+    Loads MAT file and decodes one mip level of textures to RGBA8 pixel data.
+    The decoded mip level is the largest level which size is not greater than `maxTexSize`,
+    if `maxTexSize` is 0 the largest level is decoded, if no level fits the smallest level is decoded.
+    If MAT is indexed and cmp is None then only texture sizes are loaded.
+    """
+    with open(filePath, 'rb') as f:
+        h = _read_header(f)
+        records = _read_records(f, h)
+        textures: List[Mipmap] = []
+        if h.type == MatType.Texture:
+            for _ in range(0, _max_cels(h.texture_count)):
+                textures.append(_read_mipmap(f, h.color_info, cmp, maxTexSize))
+        return Mat(h, records, textures)
+
+def importMat(filePath: Union[Path, str], cmp: Optional[ColorMap] = None, cache: Optional[Union['AssetCache', 'DiskCache']] = None, maxTexSize: int = 0) -> bpy.types.Material:
+    """
+    Imports MAT file as material.
+    If `cache` is set, decoded MAT is loaded through the `sith.cache.AssetCache` or `sith.cache.DiskCache`.
+    Textures are imported from the mip level selected by `maxTexSize` (see `loadMat`).
+    The size of largest mip level is kept on image and can be retrieved by `getImageTextureSize`.
+    """
+    h, records, textures = cache.loadMat(filePath, cmp, maxTexSize) if cache else loadMat(filePath, cmp, maxTexSize)
 
     mat_name = os.path.basename(filePath)
     if mat_name in bpy.data.materials:
@@ -327,9 +395,8 @@ def importMat(filePath: Union[Path, str], cmp: Optional[ColorMap] = None) -> bpy
         mat.use_transparency    = use_transparency
         mat.transparency_method = 'Z_TRANSPARENCY'
         mat.alpha               = 0.0
-        for i in range(0, _max_cels(h.texture_count)):
-            mm = _read_mipmap(f, h.color_info, cmp)
-            _mat_add_new_texture(mat, mm.width, mm.height, i, mm.pixel_data_array[0] if mm.pixel_data_array else None, hasTransparency=use_transparency)
+        for i, mm in enumerate(textures):
+            _mat_add_new_texture(mat, mm.level_width, mm.level_height, i, mm.pixel_data_array[0] if mm.pixel_data_array else None, hasTransparency=use_transparency, texSize=(mm.width, mm.height))
 
     mat.use_textures[0] = True # Enable only 1st slot
     return mat
@@ -24,6 +24,7 @@ from .model3do import (
     GeometryMode,
     LightMode,
     Mesh3do,
+    Mesh3doArrays,
     Mesh3doFace,
     Mesh3doNodeFlags,
     Mesh3doNodeType,
@@ -37,7 +38,10 @@ from .model3doExporter import (
     makeModel3doFromObj
 )
 
-from .model3doImporter import import3do
+from .model3doImporter import (
+    import3do,
+    setModel3doGeoset
+)
 
 __all__ = [
     "export3do",
@@ -47,10 +51,12 @@ __all__ = [
     "import3do",
     "makeModel3doFromObj",
     "Mesh3do",
+    "Mesh3doArrays",
     "Mesh3doFace",
     "Mesh3doNodeFlags",
     "Mesh3doNodeType",
     "Model3do",
     "Model3doGeoSet",
+    "setModel3doGeoset",
     "TextureMode"
 ]
@@ -19,6 +19,9 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import hashlib
+import numpy as np
+
 from enum import IntEnum, unique
 from collections import defaultdict
 from sith.types import (
@@ -27,7 +30,7 @@ from sith.types import (
     Vector3f,
     Vector4f
 )
-from typing import Dict, List
+from typing import Dict, List, Union
 
 @unique
 class FaceType(Flag):
@@ -128,6 +131,8 @@ class Mesh3doNodeType(Flag):
     # Unknown14 = 0x098F    #in_attack_pull_fists.key
 
 class Mesh3doFace:
+    __slots__ = ('material_idx', 't', 'geo_mode', 'light_mode', 'tex_mode', 'c', 'vi', 'tvi', 'n')
+
     def __init__(self):
         self.material_idx: int      = -1
         self.t: FaceType            = FaceType.Normal
@@ -316,19 +321,311 @@ class Mesh3do:
     def faces(self, faces: List[Mesh3doFace]):
         self.face_list = faces
 
+class Mesh3doArrays:
+    """
+    Structure of arrays representation of `Mesh3do`.
+    Vertex attributes are stored in float64 arrays, faces are stored in CSR format where
+    face `i` vertex and uv indices are in range `faceOffsets[i]:faceOffsets[i + 1]` of the
+    flat `faceVertexIdxs` and `faceUvIdxs` arrays, and per face attributes in arrays of length `numFaces`.
+    Note, float arrays are float64 so the values read from 3DO file are written back unchanged.
+    """
+    def __init__(self, idx: int = 0, name: str =""):
+        self.i: int                 = idx
+        self.mesh_name: str         = name
+        self.mesh_radius: float     = 0.0
+        self.geo_mode: GeometryMode = GeometryMode.NotDrawn
+        self.light_mode: LightMode  = LightMode.FullyLit
+        self.tex_mode: TextureMode  = TextureMode.Affine
+
+        self.v: np.ndarray  = np.empty((0, 3), dtype=np.float64) # vertices
+        self.vc: np.ndarray = np.empty((0, 4), dtype=np.float64) # vertex colors
+        self.vn: np.ndarray = np.empty((0, 3), dtype=np.float64) # vertex normals
+        self.tv: np.ndarray = np.empty((0, 2), dtype=np.float64) # texture vertices
+
+        self.face_offsets: np.ndarray = np.zeros(1, dtype=np.int64)
+        self.face_vi: np.ndarray      = np.empty(0, dtype=np.int32) # flat list of face vertex idxs
+        self.face_tvi: np.ndarray     = np.empty(0, dtype=np.int32) # flat list of face texture vertex idxs
+        self.face_mat: np.ndarray     = np.empty(0, dtype=np.int32)
+        self.face_type: np.ndarray    = np.empty(0, dtype=np.int32)
+        self.face_geo: np.ndarray     = np.empty(0, dtype=np.int8)
+        self.face_light: np.ndarray   = np.empty(0, dtype=np.int8)
+        self.face_tex: np.ndarray     = np.empty(0, dtype=np.int8)
+        self.face_color: np.ndarray   = np.empty((0, 4), dtype=np.float64)
+        self.face_n: np.ndarray       = np.empty((0, 3), dtype=np.float64)
+
+    @property
+    def idx(self) -> int:
+        return self.i
+
+    @idx.setter
+    def idx(self, idx: int):
+        self.i = idx
+
+    @property
+    def name(self) -> str:
+        return self.mesh_name
+
+    @name.setter
+    def name(self, name: str):
+        self.mesh_name = name
+
+    @property
+    def radius(self) -> float:
+        return self.mesh_radius
+
+    @radius.setter
+    def radius(self, radius: float):
+        self.mesh_radius = radius
+
+    @property
+    def geometryMode(self) -> GeometryMode:
+        return self.geo_mode
+
+    @geometryMode.setter
+    def geometryMode(self, mode: GeometryMode):
+        self.geo_mode = mode
+
+    @property
+    def lightMode(self) -> LightMode:
+        return self.light_mode
+
+    @lightMode.setter
+    def lightMode(self, mode: LightMode):
+        self.light_mode = mode
+
+    @property
+    def textureMode(self) -> TextureMode:
+        return self.tex_mode
+
+    @textureMode.setter
+    def textureMode(self, mode: TextureMode):
+        self.tex_mode = mode
+
+    @property
+    def vertices(self) -> np.ndarray:
+        """ Vertex positions, array of shape (numVertices, 3) """
+        return self.v
+
+    @vertices.setter
+    def vertices(self, vertices: np.ndarray):
+        self.v = np.asarray(vertices, dtype=np.float64).reshape((-1, 3))
+
+    @property
+    def vertexColors(self) -> np.ndarray:
+        """ Vertex RGBA colors, array of shape (numVertices, 4) """
+        return self.vc
+
+    @vertexColors.setter
+    def vertexColors(self, colors: np.ndarray):
+        self.vc = np.asarray(colors, dtype=np.float64).reshape((-1, 4))
+
+    @property
+    def normals(self) -> np.ndarray:
+        """ Vertex normals, array of shape (numVertices, 3) """
+        return self.vn
+
+    @normals.setter
+    def normals(self, normals: np.ndarray):
+        self.vn = np.asarray(normals, dtype=np.float64).reshape((-1, 3))
+
+    @property
+    def uvs(self) -> np.ndarray:
+        """ Texture vertices, array of shape (numUVs, 2) """
+        return self.tv
+
+    @uvs.setter
+    def uvs(self, texVert: np.ndarray):
+        self.tv = np.asarray(texVert, dtype=np.float64).reshape((-1, 2))
+
+    @property
+    def numFaces(self) -> int:
+        return len(self.face_offsets) - 1
+
+    @property
+    def faceOffsets(self) -> np.ndarray:
+        """ Offsets of face vertices in `faceVertexIdxs` and `faceUvIdxs`, array of length numFaces + 1 """
+        return self.face_offsets
+
+    @faceOffsets.setter
+    def faceOffsets(self, offsets: np.ndarray):
+        self.face_offsets = np.asarray(offsets, dtype=np.int64)
+
+    @property
+    def faceVertexIdxs(self) -> np.ndarray:
+        return self.face_vi
+
+    @faceVertexIdxs.setter
+    def faceVertexIdxs(self, idxs: np.ndarray):
+        self.face_vi = np.asarray(idxs, dtype=np.int32)
+
+    @property
+    def faceUvIdxs(self) -> np.ndarray:
+        return self.face_tvi
+
+    @faceUvIdxs.setter
+    def faceUvIdxs(self, idxs: np.ndarray):
+        self.face_tvi = np.asarray(idxs, dtype=np.int32)
+
+    @property
+    def faceMaterialIdxs(self) -> np.ndarray:
+        return self.face_mat
+
+    @faceMaterialIdxs.setter
+    def faceMaterialIdxs(self, idxs: np.ndarray):
+        self.face_mat = np.asarray(idxs, dtype=np.int32)
+
+    @property
+    def faceTypes(self) -> np.ndarray:
+        """ Face types as `FaceType` flag values """
+        return self.face_type
+
+    @faceTypes.setter
+    def faceTypes(self, types: np.ndarray):
+        self.face_type = np.asarray(types, dtype=np.int32)
+
+    @property
+    def faceGeometryModes(self) -> np.ndarray:
+        return self.face_geo
+
+    @faceGeometryModes.setter
+    def faceGeometryModes(self, modes: np.ndarray):
+        self.face_geo = np.asarray(modes, dtype=np.int8)
+
+    @property
+    def faceLightModes(self) -> np.ndarray:
+        return self.face_light
+
+    @faceLightModes.setter
+    def faceLightModes(self, modes: np.ndarray):
+        self.face_light = np.asarray(modes, dtype=np.int8)
+
+    @property
+    def faceTextureModes(self) -> np.ndarray:
+        return self.face_tex
+
+    @faceTextureModes.setter
+    def faceTextureModes(self, modes: np.ndarray):
+        self.face_tex = np.asarray(modes, dtype=np.int8)
+
+    @property
+    def faceColors(self) -> np.ndarray:
+        """ Face RGBA colors, array of shape (numFaces, 4) """
+        return self.face_color
+
+    @faceColors.setter
+    def faceColors(self, colors: np.ndarray):
+        self.face_color = np.asarray(colors, dtype=np.float64).reshape((-1, 4))
+
+    @property
+    def faceNormals(self) -> np.ndarray:
+        """ Face normals, array of shape (numFaces, 3) """
+        return self.face_n
+
+    @faceNormals.setter
+    def faceNormals(self, normals: np.ndarray):
+        self.face_n = np.asarray(normals, dtype=np.float64).reshape((-1, 3))
+
+    def faceVertexCounts(self) -> np.ndarray:
+        """ Returns number of vertices of each face """
+        return np.diff(self.face_offsets)
+
+    def contentHash(self, vertexColors: bool = True) -> bytes:
+        """
+        Returns hash of mesh geometry: vertices, normals, uvs, faces and per face attributes.
+        Vertex colors are hashed only if `vertexColors` is True.
+        Mesh name, radius and modes are not part of hash, so meshes with identical geometry have the same hash.
+        """
+        arrays = [
+            (self.v, np.float64), (self.vn, np.float64), (self.tv, np.float64),
+            (self.face_offsets, np.int64), (self.face_vi, np.int32), (self.face_tvi, np.int32),
+            (self.face_mat, np.int32), (self.face_type, np.int32), (self.face_geo, np.int8),
+            (self.face_light, np.int8), (self.face_tex, np.int8), (self.face_color, np.float64)
+        ]
+        if vertexColors:
+            arrays.append((self.vc, np.float64))
+
+        h = hashlib.blake2b(digest_size=16)
+        for a, dtype in arrays:
+            a = np.ascontiguousarray(a, dtype=dtype)
+            h.update(np.array(a.shape, dtype=np.int64).tobytes())
+            h.update(a.tobytes())
+        return h.digest()
+
+    @staticmethod
+    def fromMesh3do(mesh: Mesh3do) -> 'Mesh3doArrays':
+        """ Converts `mesh` to `Mesh3doArrays` """
+        m = Mesh3doArrays(mesh.idx, mesh.name)
+        m.radius       = mesh.radius
+        m.geometryMode = mesh.geometryMode
+        m.lightMode    = mesh.lightMode
+        m.textureMode  = mesh.textureMode
+
+        m.vertices     = mesh.vertices
+        m.vertexColors = mesh.vertexColors
+        m.normals      = mesh.normals
+        m.uvs          = mesh.uvs
+
+        faces = mesh.faces
+        m.faceOffsets       = np.cumsum([0] + [len(f.vertexIdxs) for f in faces])
+        m.faceVertexIdxs    = [i for f in faces for i in f.vertexIdxs]
+        m.faceUvIdxs        = [i for f in faces for i in f.uvIdxs]
+        m.faceMaterialIdxs  = [f.materialIdx for f in faces]
+        m.faceTypes         = [int(f.type) for f in faces]
+        m.faceGeometryModes = [int(f.geometryMode) for f in faces]
+        m.faceLightModes    = [int(f.lightMode) for f in faces]
+        m.faceTextureModes  = [int(f.textureMode) for f in faces]
+        m.faceColors        = [f.color for f in faces]
+        m.faceNormals       = [f.normal for f in faces]
+        return m
+
+    def toMesh3do(self) -> Mesh3do:
+        """ Converts mesh to `Mesh3do` """
+        mesh = Mesh3do(self.idx, self.name)
+        mesh.radius       = self.radius
+        mesh.geometryMode = self.geometryMode
+        mesh.lightMode    = self.lightMode
+        mesh.textureMode  = self.textureMode
+
+        mesh.vertices     = list(map(Vector3f._make, self.vertices.tolist()))
+        mesh.vertexColors = list(map(Vector4f._make, self.vertexColors.tolist()))
+        mesh.normals      = list(map(Vector3f._make, self.normals.tolist()))
+        mesh.uvs          = list(map(Vector2f._make, self.uvs.tolist()))
+
+        offsets  = self.faceOffsets.tolist()
+        vertIdxs = self.faceVertexIdxs.tolist()
+        uvIdxs   = self.faceUvIdxs.tolist()
+        colors   = map(Vector4f._make, self.faceColors.tolist())
+        normals  = map(Vector3f._make, self.faceNormals.tolist())
+        props    = zip(self.faceMaterialIdxs.tolist(), self.faceTypes.tolist(), self.faceGeometryModes.tolist(), self.faceLightModes.tolist(), self.faceTextureModes.tolist())
+        for k, (mat, ftype, geo, light, tex), color, normal in zip(range(self.numFaces), props, colors, normals):
+            face = Mesh3doFace()
+            face.materialIdx  = mat
+            face.type         = FaceType(ftype)
+            face.geometryMode = GeometryMode(geo)
+            face.lightMode    = LightMode(light)
+            face.textureMode  = TextureMode(tex)
+            face.color        = color
+            face.normal       = normal
+            face.vertexIdxs   = vertIdxs[offsets[k]:offsets[k + 1]]
+            face.uvIdxs       = uvIdxs[offsets[k]:offsets[k + 1]]
+            mesh.faces.append(face)
+        return mesh
+
 class Model3doGeoSet:
     def __init__(self):
-        self.mesh_list: List[Mesh3do] = []
+        self.mesh_list: List[Union[Mesh3do, Mesh3doArrays]] = []
 
     @property
-    def meshes(self) -> List[Mesh3do]:
+    def meshes(self) -> List[Union[Mesh3do, Mesh3doArrays]]:
         return self.mesh_list
 
     @meshes.setter
-    def meshes(self, meshes: List[Mesh3do]):
+    def meshes(self, meshes: List[Union[Mesh3do, Mesh3doArrays]]):
         self.mesh_list = meshes
 
 class Mesh3doNode:
+    __slots__ = ('_idx', 'f', 't', 'n', 'mesh_i', 'parent_i', 'first_child_i', 'sibling_i', 'num_children', '_o', 'pos', 'rot', 'piv')
+
     def __init__(self, name: str = ""):
         self._idx: int           = -1
         self.f: Mesh3doNodeFlags = Mesh3doNodeFlags.Nothing
@@ -22,9 +22,10 @@
 import bpy, bmesh, mathutils, os
 import numpy as np
 
+from itertools import product
 from sith.types import BenchmarkMeter
 from sith.utils import *
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 
 from .model3do import *
 from .model3doLoader import Model3doFileVersion
@@ -37,7 +38,16 @@ kDefaultVertexColor = Vector4f(0.0, 0.0, 0.0, 1.0)
 kHNDefaultFlags     = 0
 kHNDefaultType      = 0
 
-def export3do(obj: bpy.types.Object, path: str, version: Model3doFileVersion, uvAbsolute: bool, exportVertexColors: bool, sync_mesh_list: bool):
+def export3do(obj: bpy.types.Object, path: str, version: Model3doFileVersion, uvAbsolute: bool, exportVertexColors: bool, sync_mesh_list: bool, columnar: bool = False, workers: int = 1, streaming: bool = False, weldDistance: float = 0.0, uvWeldDistance: float = 0.0):
+    """
+    Exports `obj` to 3DO file.
+    Mesh vertices with the same position, color and normal are welded into one vertex.
+    If `weldDistance` > 0 also vertices with the same color and normal which positions are within `weldDistance` are welded.
+    Similarly if `uvWeldDistance` > 0 UV coordinates which are within `uvWeldDistance` are merged.
+    If `streaming` is True the model is first made without mesh geometry, and each mesh's geometry
+    is extracted right before its block is written and released after, so peak memory
+    grows with the largest mesh instead of the whole model.
+    """
     with BenchmarkMeter(' done in {:.4f} sec.'):
         print("exporting 3DO: %r..." % (path), end="")
 
@@ -46,9 +56,25 @@ def export3do(obj: bpy.types.Object, path: str, version: Model3doFileVersion, uv
         if not isValidNameLen(model_name):
             raise ValueError(f"Export file name '{model_name}' is longer then {kMaxNameLen} chars!")
 
-        model3do = makeModel3doFromObj(model_name, obj, uvAbsolute=uvAbsolute, exportVertexColors=exportVertexColors, sync_mesh_list=sync_mesh_list)
-        header   = getExportFileHeader(f"3DO model '{os.path.basename(path)}'")
-        model3doWriter.save3do(model3do, path, version, header)
+        header = getExportFileHeader(f"3DO model '{os.path.basename(path)}'")
+        if not streaming:
+            model3do = makeModel3doFromObj(model_name, obj, uvAbsolute=uvAbsolute, exportVertexColors=exportVertexColors, sync_mesh_list=sync_mesh_list, columnar=columnar, weldDistance=weldDistance, uvWeldDistance=uvWeldDistance)
+            model3doWriter.save3do(model3do, path, version, header, workers)
+            return
+
+        # Meshes of model are empty and their geometry is made by make_mesh when the mesh block is written
+        sources: Dict[int, Tuple[bpy.types.Mesh, mathutils.Vector]] = {}
+        model3do = _make_model3do(model_name, obj, uvAbsolute, exportVertexColors, sync_mesh_list, columnar, weldDistance, uvWeldDistance, sources)
+        def make_mesh(mesh: Mesh3do) -> Union[Mesh3do, Mesh3doArrays]:
+            data, scale = sources[id(mesh)]
+            mesh3do = Mesh3do(mesh.idx, mesh.name)
+            mesh3do.radius       = mesh.radius
+            mesh3do.geometryMode = mesh.geometryMode
+            mesh3do.lightMode    = mesh.lightMode
+            mesh3do.textureMode  = mesh.textureMode
+            _mesh3do_add_geometry(mesh3do, model3do, data, scale, uvAbsolute, exportVertexColors, weldDistance, uvWeldDistance)
+            return Mesh3doArrays.fromMesh3do(mesh3do) if columnar else mesh3do
+        model3doWriter.save3do(model3do, path, version, header, workers, makeMesh=make_mesh)
 
 def _set_hnode_pose(node: Mesh3doNode, scale: mathutils.Vector):
     scaledLocation = vectorMultiply(node.obj.location, scale)
@@ -81,21 +107,68 @@ def _get_mat_name(mat: bpy.types.Material) -> str:
 def _is_aux_obj(obj: bpy.types.Object) -> bool:
     return (kModelRadius in obj.name) or (kMeshRadius in obj.name)
 
-def _uv_add_image_size(uv: mathutils.Vector, mat) -> mathutils.Vector:
+def _get_mat_image_size(mat: bpy.types.Material) -> Optional[Tuple[int, int]]:
     for s in mat.texture_slots:
         if s and s.texture_coords == 'UV' and s.texture and s.texture.type == 'IMAGE':
-            return vectorMultiply(uv, mathutils.Vector(s.texture.image.size))
-    return uv
-
-def _find_vertex(vlist: List[Vector3f], v: Vector3f, vcolors: List[Vector4f], vcolor: Vector4f) -> int:
-    def np_array(o):
-        return np.array(o, dtype="f,f,f")
-    for vidx in np.where(np_array(vlist) == np_array(v))[0]:
-        if vidx < len(vcolors) and vcolors[vidx] == vcolor:
-            return vidx
-    return -1
-
-def _model3do_add_mesh(model: Model3do, mesh: bpy.types.Mesh, scale: mathutils.Vector, uvAbsolute: bool, exportVertexColors: bool) -> int:
+            return getImageTextureSize(s.texture.image)
+    return None
+
+def _index_unique_rows(rows: np.ndarray, weldDistance: float = 0.0, posColumns: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds unique rows of 2D array `rows` in order of their first occurrence.
+    Rows are compared bitwise. If `weldDistance` > 0 the first `posColumns` columns (all if None) are treated as row position,
+    and row is welded into the nearest earlier unique row which position is within `weldDistance` and has identical remaining columns.
+    Returns the indices of the first occurrence of unique rows and index to unique rows for every row of `rows`.
+    """
+    keys = np.ascontiguousarray(rows + rows.dtype.type(0)) # + 0 converts -0.0 to 0.0
+    keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * keys.shape[1]))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    order = np.argsort(first, kind='stable')
+    rank  = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    first, index = first[order], rank[inverse.ravel()]
+    if weldDistance > 0.0 and len(first) > 1:
+        welded, weld_index = _weld_rows(rows[first], weldDistance, rows.shape[1] if posColumns is None else posColumns)
+        first, index = first[welded], weld_index[index]
+    return first, index
+
+def _weld_rows(rows: np.ndarray, weldDistance: float, posColumns: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Welds unique `rows` which positions, i.e. the first `posColumns` columns, are within `weldDistance`
+    and remaining columns are identical. Rows are looked up in the grid of `weldDistance` sized cells,
+    so only rows in the same and neighbouring cells are compared.
+    Returns the indices of welded rows and index to welded rows for every row of `rows`.
+    """
+    positions = rows[:, :posColumns].astype(np.float64)
+    cells     = np.floor(positions / weldDistance).astype(np.int64).tolist()
+    attrs     = np.ascontiguousarray(rows[:, posColumns:] + rows.dtype.type(0))
+    attrs     = [a.tobytes() for a in attrs]
+    positions = positions.tolist()
+    offsets   = list(product((-1, 0, 1), repeat=posColumns))
+
+    maxDist2 = weldDistance * weldDistance
+    grid: Dict[Tuple[int, ...], List[int]] = {}
+    welded: List[int] = []
+    index = np.empty(len(rows), dtype=np.int64)
+    for i, (pos, cell, attr) in enumerate(zip(positions, cells, attrs)):
+        nearestDist2, nearest = maxDist2, len(rows) # prefers the earliest of equally near rows
+        for offset in offsets:
+            for w in grid.get(tuple(c + o for c, o in zip(cell, offset)), ()):
+                j = welded[w]
+                if attrs[j] == attr:
+                    dist2 = sum((a - b) * (a - b) for a, b in zip(positions[j], pos))
+                    if (dist2, w) <= (nearestDist2, nearest):
+                        nearestDist2, nearest = dist2, w
+        if nearest == len(rows):
+            nearest = len(welded)
+            welded.append(i)
+            grid.setdefault(tuple(cell), []).append(nearest)
+        index[i] = nearest
+    return np.array(welded, dtype=np.int64), index
+
+def _model3do_add_mesh(model: Model3do, mesh: bpy.types.Mesh, scale: mathutils.Vector, uvAbsolute: bool, exportVertexColors: bool, geometry: bool = True, weldDistance: float = 0.0, uvWeldDistance: float = 0.0) -> int:
+    """ Adds mesh to model's 1st geoset and returns its index. If `geometry` is False added mesh is empty. """
     if mesh is None:
         return -1
 
@@ -120,69 +193,130 @@ def _model3do_add_mesh(model: Model3do, mesh: bpy.types.Mesh, scale: mathutils.V
                 assertName(name)
                 model.materials.append(name)
 
-    # Set mesh faces
-    bm = bmesh.new()
-    bm.from_mesh(mesh)
-    bm.verts.ensure_lookup_table()
-    bm.faces.ensure_lookup_table()
-    vcolor_layer = bm.loops.layers.color.verify()
-    uv_layer     = bm.loops.layers.uv.verify()
+    if geometry:
+        _mesh3do_add_geometry(mesh3do, model, mesh, scale, uvAbsolute, exportVertexColors, weldDistance, uvWeldDistance)
+    model.geosets[0].meshes.append(mesh3do)
+    return mesh_idx
+
+def _mesh3do_add_geometry(mesh3do: Mesh3do, model: Model3do, mesh: bpy.types.Mesh, scale: mathutils.Vector, uvAbsolute: bool, exportVertexColors: bool, weldDistance: float = 0.0, uvWeldDistance: float = 0.0):
+    """
+    Adds vertices, uvs and faces of `mesh` to `mesh3do`. Mesh materials must be already added to `model`.
+    Mesh data is read in bulk with `foreach_get`, per loop data is processed as arrays.
+    """
+    num_verts = len(mesh.vertices)
+    num_loops = len(mesh.loops)
+    num_faces = len(mesh.polygons)
+
+    vert_cos   = np.empty(num_verts * 3, dtype=np.float32)
+    vert_norms = np.empty(num_verts * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', vert_cos)
+    mesh.vertices.foreach_get('normal', vert_norms)
+
+    loop_vidxs = np.empty(num_loops, dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_vidxs)
+
+    face_starts = np.empty(num_faces, dtype=np.int32)
+    face_totals = np.empty(num_faces, dtype=np.int32)
+    face_slots  = np.empty(num_faces, dtype=np.int32)
+    face_norms  = np.empty(num_faces * 3, dtype=np.float32)
+    mesh.polygons.foreach_get('loop_start', face_starts)
+    mesh.polygons.foreach_get('loop_total', face_totals)
+    mesh.polygons.foreach_get('material_index', face_slots)
+    mesh.polygons.foreach_get('normal', face_norms)
+
+    loop_uvs = np.zeros(num_loops * 2, dtype=np.float32)
+    if mesh.uv_layers.active:
+        mesh.uv_layers.active.data.foreach_get('uv', loop_uvs)
+    loop_uvs = loop_uvs.reshape(-1, 2)
+
+    # Order loops by face
+    face_offsets = np.cumsum(face_totals) - face_totals
+    loop_order   = np.repeat(face_starts - face_offsets, face_totals) + np.arange(num_loops)
+    loop_faces   = np.repeat(np.arange(num_faces), face_totals)
+    loop_vidxs   = loop_vidxs[loop_order]
+    loop_uvs     = loop_uvs[loop_order]
+
+    # Make loop vertices. The vertex position is scaled in double precision and rounded to float
+    vertices = (vert_cos.reshape(-1, 3) * np.array(scale[:3], dtype=np.float32).astype(np.float64)).astype(np.float32)
+    vertices = vertices[loop_vidxs]
+    normals  = vert_norms.reshape(-1, 3)[loop_vidxs]
+    if exportVertexColors:
+        vcolors = np.ones(num_loops * 4, dtype=np.float32)
+        if mesh.vertex_colors.active:
+            mesh.vertex_colors.active.data.foreach_get('color', vcolors)
+        vcolors = vcolors.reshape(-1, 4)[loop_order]
+    else:
+        vcolors = np.broadcast_to(np.array(kDefaultVertexColor, dtype=np.float32), (num_loops, 4))
 
-    for face in bm.faces:
+    # Weld vertices with the same position, color and normal
+    vert_first, loop_vert_idxs = _index_unique_rows(np.hstack((vertices, vcolors, normals)), weldDistance, posColumns=3)
+    mesh3do.vertices.extend(Vector3f(*v) for v in vertices[vert_first].tolist())
+    if exportVertexColors:
+        mesh3do.vertexColors.extend(Vector4f(*c) for c in vcolors[vert_first].tolist())
+    else:
+        mesh3do.vertexColors.extend([kDefaultVertexColor] * len(vert_first))
+    mesh3do.normals.extend(Vector3f(*n) for n in normals[vert_first].tolist())
+
+    # Resolve model material index of each mesh material slot
+    model_mat_idxs = {name: idx for idx, name in reversed(list(enumerate(model.materials)))}
+    slot_mat_idxs  = np.array([model_mat_idxs.get(_get_mat_name(mat), -1) for mat in mesh.materials] + [-1], dtype=np.int32)
+    face_slots[(face_slots < 0) | (face_slots >= len(mesh.materials))] = len(mesh.materials) # last entry of slot_mat_idxs is no material
+    face_mat_idxs = slot_mat_idxs[face_slots]
+    for fidx in np.flatnonzero((face_mat_idxs < 0) & (face_slots < len(mesh.materials))).tolist():
+        print(f"\nWarning: Couldn't find material index for mesh:'{mesh3do.name}' face:{fidx}!")
+
+    # Convert UV coords to absolute coords by multiplying them with the image size of face material
+    if uvAbsolute:
+        slot_img_sizes = np.ones((len(slot_mat_idxs), 2), dtype=np.float32)
+        slot_has_img   = np.zeros(len(slot_mat_idxs), dtype=bool)
+        slot_no_tex    = np.zeros(len(slot_mat_idxs), dtype=bool)
+        for slot, mat in enumerate(mesh.materials):
+            if slot_mat_idxs[slot] < 0:
+                continue
+            if len(mat.texture_slots) == 0:
+                slot_no_tex[slot] = True
+                continue
+            size = _get_mat_image_size(mat)
+            if size is not None:
+                slot_img_sizes[slot] = size
+                slot_has_img[slot]   = True
+
+        loop_slots = face_slots[loop_faces]
+        abs_uvs    = (loop_uvs.astype(np.float64) * slot_img_sizes[loop_slots]).astype(np.float32)
+        uv_with_mat = (slot_mat_idxs[loop_slots] > -1) & ~slot_no_tex[loop_slots]
+        uv_not_abs  = uv_with_mat & (abs_uvs != 0).any(axis=1) & (abs_uvs == loop_uvs).all(axis=1)
+        loop_uvs    = np.where(uv_with_mat[:, None], abs_uvs, loop_uvs)
+
+        for fidx in np.flatnonzero(slot_no_tex[face_slots]).tolist():
+            print(f"\nWarning: Using absolute UV coords for mesh:'{mesh3do.name}' face:{fidx} due to face hasn't any texture set!")
+            face_mat_idxs[fidx] = -1
+        for fidx in np.unique(loop_faces[uv_not_abs]).tolist():
+            print(f"\nWarning: Using absolute UV coords due to no face texture with UV coords and set image was found! mesh:'{mesh3do.name}' face:{fidx}")
+            face_mat_idxs[fidx] = -1
+
+    loop_uvs = loop_uvs * np.array((1.0, -1.0), dtype=np.float32) # Note: Flipped v
+    uv_first, loop_uv_idxs = _index_unique_rows(loop_uvs, uvWeldDistance)
+    mesh3do.uvs.extend(Vector2f(*uv) for uv in loop_uvs[uv_first].tolist())
+
+    # Make faces
+    loop_vert_idxs = loop_vert_idxs.tolist()
+    loop_uv_idxs   = loop_uv_idxs.tolist()
+    face_attrs     = meshGet3doFaceAttributes(mesh)
+    face_props     = zip(face_attrs.types.tolist(), face_attrs.geometryModes.tolist(), face_attrs.lightModes.tolist(), face_attrs.textureModes.tolist(), face_attrs.extraLights.tolist())
+    for start, total, mat_idx, normal, (ftype, geo_mode, light_mode, tex_mode, color) in zip(face_offsets.tolist(), face_totals.tolist(), face_mat_idxs.tolist(), face_norms.reshape(-1, 3).tolist(), face_props):
         face3do = Mesh3doFace()
-        face3do.materialIdx = -1
-        mat = None
-        if face.material_index >= 0 and face.material_index < len(mesh.materials):
-            mat = mesh.materials[face.material_index]
-            mat_name = _get_mat_name(mat)
-            face3do.materialIdx = model.materials.index(mat_name) if mat_name in model.materials else -1
-            if face3do.materialIdx < 0:
-                print(f"\nWarning: Couldn't find material index for mesh:'{mesh3do.name}' face:{len(mesh3do.faces)}!")
-                mat = None
-
-        face3do.type         = bmFaceGetType(face, bm)
-        face3do.geometryMode = bmFaceGetGeometryMode(face, bm)
-        face3do.lightMode    = bmFaceGetLightMode(face, bm)
-        face3do.textureMode  = bmFaceGetTextureMode(face, bm)
-        face3do.color        = bmFaceGetExtraLight(face, bm)
-        face3do.normal       = Vector3f(*face.normal)
-
-        # Set face vertex and texture index
-        for loop in face.loops:
-            vertx  = Vector3f(*vectorMultiply(loop.vert.co, scale))
-            vcolor = Vector4f(*loop[vcolor_layer]) if exportVertexColors else kDefaultVertexColor
-            vidx   = _find_vertex(mesh3do.vertices, vertx, mesh3do.vertexColors, vcolor)
-            if vidx < 0:
-                vidx = len(mesh3do.vertices)
-                mesh3do.vertices.append(vertx)
-                mesh3do.vertexColors.append(vcolor)
-                mesh3do.normals.append(Vector3f(*loop.vert.normal))
-            face3do.vertexIdxs.append(vidx)
-
-            # Set UV coordinates
-            uv = loop[uv_layer].uv
-            if uvAbsolute and mat is not None:
-                if len(mat.texture_slots) == 0:
-                    print(f"\nWarning: Using absolute UV coords for mesh:'{mesh3do.name}' face:{len(mesh3do.faces)} due to face hasn't any texture set!")
-                    face3do.materialIdx = -1
-                else:
-                    uv = _uv_add_image_size(uv, mat)
-                    if uv != mathutils.Vector.Fill(2) and uv == loop[uv_layer].uv:
-                        print(f"\nWarning: Using absolute UV coords due to no face texture with UV coords and set image was found! mesh:'{mesh3do.name}' face:{len(mesh3do.faces)}")
-                        face3do.materialIdx = -1
-
-            uv = Vector2f(uv.x, -uv.y) # Note: Flipped v
-            if not mesh3do.uvs.count(uv):
-                mesh3do.uvs.append(uv)
-
-            uv_idx = mesh3do.uvs.index(uv)
-            face3do.uvIdxs.append(uv_idx)
+        face3do.materialIdx  = mat_idx
+        face3do.type         = FaceType(ftype)
+        face3do.geometryMode = GeometryMode(geo_mode)
+        face3do.lightMode    = LightMode(light_mode)
+        face3do.textureMode  = TextureMode(tex_mode)
+        face3do.color        = Vector4f(*color)
+        face3do.normal       = Vector3f(*normal)
+        face3do.vertexIdxs   = loop_vert_idxs[start:start + total]
+        face3do.uvIdxs       = loop_uv_idxs[start:start + total]
         mesh3do.faces.append(face3do)
-    bm.free()
 
     assert len(mesh3do.vertices) == len(mesh3do.vertexColors) == len(mesh3do.normals)
-    model.geosets[0].meshes.append(mesh3do)
-    return mesh_idx
 
 def _set_mesh_properties(mesh: Mesh3do, obj: bpy.types.Object, scale: mathutils.Vector):
     mesh.geometryMode = objGeometryMode(obj)
@@ -254,16 +388,20 @@ def _model3do_add_hnode(model: Model3do, mesh_idx: int, obj: bpy.types.Object, p
     _set_hnode_pose(node, scale)
     model.meshHierarchy.append(node)
 
-def _model3do_add_obj(model: Model3do, obj: bpy.types.Object, parent: bpy.types.Object = None, scale: mathutils.Vector = mathutils.Vector((1.0,) * 3), uvAbsolute: bool = False, exportVertexColors: bool = False):
+def _model3do_add_obj(model: Model3do, obj: bpy.types.Object, parent: bpy.types.Object = None, scale: mathutils.Vector = mathutils.Vector((1.0,) * 3), uvAbsolute: bool = False, exportVertexColors: bool = False, columnar: bool = False, weldDistance: float = 0.0, uvWeldDistance: float = 0.0, sources: Optional[Dict[int, Tuple[bpy.types.Mesh, mathutils.Vector]]] = None):
     if 'EMPTY' != obj.type != 'MESH' or _is_aux_obj(obj):
         return
 
     # Add object's mesh
     objScale = vectorMultiply(scale, obj.scale)
-    mesh_idx = _model3do_add_mesh(model, obj.data, objScale, uvAbsolute, exportVertexColors)
+    mesh_idx = _model3do_add_mesh(model, obj.data, objScale, uvAbsolute, exportVertexColors, geometry=(sources is None), weldDistance=weldDistance, uvWeldDistance=uvWeldDistance)
     if mesh_idx > -1:
         mesh = model.geosets[0].meshes[mesh_idx]
         _set_mesh_properties(mesh, obj, objScale)
+        if sources is not None: # mesh geometry is added later from source mesh
+            sources[id(mesh)] = (obj.data, objScale)
+        elif columnar:
+            model.geosets[0].meshes[mesh_idx] = Mesh3doArrays.fromMesh3do(mesh)
 
     # Add object to hierarchy
     # Note, must use passed scale, since the object's location is already changed when object has set scale
@@ -271,7 +409,7 @@ def _model3do_add_obj(model: Model3do, obj: bpy.types.Object, parent: bpy.types.
 
     # Add children
     for child in obj.children:
-        _model3do_add_obj(model, child, parent=obj, scale=objScale, uvAbsolute=uvAbsolute, exportVertexColors=exportVertexColors)
+        _model3do_add_obj(model, child, parent=obj, scale=objScale, uvAbsolute=uvAbsolute, exportVertexColors=exportVertexColors, columnar=columnar, weldDistance=weldDistance, uvWeldDistance=uvWeldDistance, sources=sources)
 
 def _get_model_radius(obj: bpy.types.Object, scale: mathutils.Vector = mathutils.Vector((1.0,)*3)):
     min = mathutils.Vector((999999.0,)*3)
@@ -346,7 +484,15 @@ def _sync_model_meshes(model: Model3do):
 
         geoset.meshes = new_meshes
 
-def makeModel3doFromObj(name: str, obj: bpy.types.Object, uvAbsolute: bool = False, exportVertexColors: bool = False, sync_mesh_list: bool = True):
+def makeModel3doFromObj(name: str, obj: bpy.types.Object, uvAbsolute: bool = False, exportVertexColors: bool = False, sync_mesh_list: bool = True, columnar: bool = False, weldDistance: float = 0.0, uvWeldDistance: float = 0.0):
+    return _make_model3do(name, obj, uvAbsolute, exportVertexColors, sync_mesh_list, columnar, weldDistance, uvWeldDistance)
+
+def _make_model3do(name: str, obj: bpy.types.Object, uvAbsolute: bool, exportVertexColors: bool, sync_mesh_list: bool, columnar: bool, weldDistance: float = 0.0, uvWeldDistance: float = 0.0, sources: Optional[Dict[int, Tuple[bpy.types.Mesh, mathutils.Vector]]] = None) -> Model3do:
+    """
+    Makes model from `obj`.
+    If `sources` is set, model meshes are added without geometry and the source mesh and scale
+    of each model mesh is stored to `sources` by the id of the mesh.
+    """
     model = Model3do(name)
     model.geosets.append(Model3doGeoSet())
 
@@ -357,11 +503,11 @@ def makeModel3doFromObj(name: str, obj: bpy.types.Object, uvAbsolute: bool = Fal
         model.radius = radius_obj.dimensions[0] / 2
 
     if obj.type == 'MESH' or len(obj.children) == 0:
-        _model3do_add_obj(model, obj, uvAbsolute=uvAbsolute, exportVertexColors=exportVertexColors)
+        _model3do_add_obj(model, obj, uvAbsolute=uvAbsolute, exportVertexColors=exportVertexColors, columnar=columnar, weldDistance=weldDistance, uvWeldDistance=uvWeldDistance, sources=sources)
     else:
         model.insertOffset = Vector3f(*obj.location)
         for child in obj.children:
-            _model3do_add_obj(model, child, parent=obj, scale=obj.scale, uvAbsolute=uvAbsolute, exportVertexColors=exportVertexColors)
+            _model3do_add_obj(model, child, parent=obj, scale=obj.scale, uvAbsolute=uvAbsolute, exportVertexColors=exportVertexColors, columnar=columnar, weldDistance=weldDistance, uvWeldDistance=uvWeldDistance, sources=sources)
 
     model.reorderNodes()
     if sync_mesh_list:
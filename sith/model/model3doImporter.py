@@ -19,24 +19,40 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import bpy, bmesh, mathutils, os
+import bpy, bmesh, hashlib, mathutils, os
+import numpy as np
 from sith.types import BenchmarkMeter
 from sith.utils import *
-from typing import List
+from typing import Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
 
 from . import model3doLoader
 from .utils import *
 from .model3do import (
     Model3do,
-    Mesh3do
+    Mesh3do,
+    Mesh3doArrays
 )
 
-def import3do(file_path: Union[Path, str], mat_dirs: List[Union[Path, str]] = [], cmp_file: str = '', uvAbsolute_2_1: bool = True, importVertexColors: bool = True, importRadiusObj: bool = False, preserveOrder: bool = True, clearScene: bool = True) -> bpy.types.Object:
+if TYPE_CHECKING:
+    from sith.cache import AssetCache, DiskCache
+
+def import3do(file_path: Union[Path, str], mat_dirs: List[Union[Path, str]] = [], cmp_file: str = '', uvAbsolute_2_1: bool = True, importVertexColors: bool = True, importRadiusObj: bool = False, preserveOrder: bool = True, clearScene: bool = True, columnar: bool = False, cache: Optional[Union['AssetCache', 'DiskCache']] = None, instanceMeshes: bool = True, maxTexSize: int = 0) -> bpy.types.Object:
+    """
+    Imports 3DO model to the scene.
+    If `cache` is set the model, ColorMap and MAT files are loaded through the `AssetCache` or `DiskCache`.
+    If `instanceMeshes` is True, mesh nodes with identical geometry share one mesh data-block,
+    also with the meshes of previously imported models.
+    Only the 1st geoset is built, other geosets can be switched to with `setModel3doGeoset`.
+    Material textures are imported from the largest mip level not greater than `maxTexSize` (0 = no limit).
+    """
     with BenchmarkMeter(' done in {:.4f} sec.'):
         print("importing 3DO: %r..." % (file_path), end="")
 
         with BenchmarkMeter('Info: \nLoaded model from file in {:.4f} sec.', enabled=False):
-            model, fileVersion = model3doLoader.load3do(file_path)
+            if cache:
+                model, fileVersion = cache.load3do(file_path, columnar=columnar)
+            else:
+                model, fileVersion = model3doLoader.load3do(file_path, columnar=columnar, geosets=[0]) # other geosets are loaded on demand
         isJkdf2 = (fileVersion == model3doLoader.Model3doFileVersion.Version2_1)
         if len(model.geosets) == 0:
             print("Info: Nothing to load because 3DO model doesn't contain any geoset.")
@@ -46,7 +62,7 @@ def import3do(file_path: Union[Path, str], mat_dirs: List[Union[Path, str]] = []
         if isJkdf2:
             # Load ColorMap
             try:
-                cmp = getCmpFileOrDefault(cmp_file, file_path)
+                cmp = getCmpFileOrDefault(cmp_file, file_path, cache)
             except Exception as e:
                 print(f"Warning: Failed to load ColorMap '{cmp_file}': {e}")
             if not cmp:
@@ -58,21 +74,30 @@ def import3do(file_path: Union[Path, str], mat_dirs: List[Union[Path, str]] = []
         # Load model's textures
         mat_dirs = _convert_to_absolute_paths(mat_dirs, os.path.dirname(file_path)) # convert relative paths to file_path base folder
         with BenchmarkMeter('Info: \nLoaded materials from files in {:.4f} sec.', enabled=False):
-            importMaterials(model.materials, getDefaultMatFolders(file_path) + mat_dirs, cmp)
+            importMaterials(model.materials, getDefaultMatFolders(file_path) + mat_dirs, cmp, cache, maxTexSize)
 
         # Create objects from model
-        _create_objects_from_model(model, uvAbsolute=(isJkdf2 and uvAbsolute_2_1), geosetNum=0, vertexColors=importVertexColors, importRadiusObj=importRadiusObj, preserveOrder=preserveOrder)
+        uvAbsolute = isJkdf2 and uvAbsolute_2_1
+        node_objs = _create_objects_from_model(model, uvAbsolute=uvAbsolute, geosetNum=0, vertexColors=importVertexColors, importRadiusObj=importRadiusObj, preserveOrder=preserveOrder, instanceMeshes=instanceMeshes)
 
         # Set model's insert offset and radius
         baseObj = bpy.data.objects.new(model.name, None)
         baseObj.empty_draw_size = (0.0)
         bpy.context.scene.objects.link(baseObj)
 
-        baseObj.location = model.insert_offset
+        baseObj.location = model.insertOffset
+
+        # Store source file and import options for switching geosets
+        baseObj[kModelFilePath]     = os.path.abspath(file_path)
+        baseObj[kModelGeoset]       = 0
+        baseObj[kModelNumGeosets]   = len(model.geosets)
+        baseObj[kModelUvAbsolute]   = int(uvAbsolute)
+        baseObj[kModelVertexColors] = int(importVertexColors)
+
         if importRadiusObj:
             _set_model_radius(baseObj, model.radius)
 
-        firstChild             = model.meshHierarchy[0].obj
+        firstChild             = node_objs[0]
         firstChild.parent_type = 'OBJECT'
         firstChild.parent      = baseObj
 
@@ -84,6 +109,76 @@ def import3do(file_path: Union[Path, str], mat_dirs: List[Union[Path, str]] = []
         group.objects.link(baseObj)
         return baseObj
 
+def _get_child_objs(obj: bpy.types.Object) -> List[bpy.types.Object]:
+    objs  = []
+    stack = list(obj.children)
+    while stack:
+        child = stack.pop()
+        objs.append(child)
+        stack.extend(child.children)
+    return objs
+
+def setModel3doGeoset(baseObj: bpy.types.Object, geosetNum: int, cache: Optional[Union['AssetCache', 'DiskCache']] = None):
+    """
+    Swaps the meshes of all hierarchy node objects of imported 3DO model `baseObj` to meshes of geoset `geosetNum`.
+    Geoset is loaded from the model file and its meshes are built on first use, and reused afterwards.
+    If `cache` is set the model is loaded through the `AssetCache` or `DiskCache`,
+    otherwise only geoset `geosetNum` is parsed from the model file.
+    """
+    if kModelFilePath not in baseObj:
+        raise ValueError(f"Object '{baseObj.name}' is not an imported 3DO model")
+    curGeoset = baseObj.get(kModelGeoset, 0)
+    if geosetNum == curGeoset:
+        return
+
+    with BenchmarkMeter(' done in {:.4f} sec.'):
+        print(f"switching 3DO model '{baseObj.name}' to geoset {geosetNum}...", end="")
+        filePath = baseObj[kModelFilePath]
+        if cache:
+            model, _ = cache.load3do(filePath)
+        else:
+            model, _ = model3doLoader.load3do(filePath, geosets=[geosetNum])
+        if not 0 <= geosetNum < len(model.geosets):
+            raise IndexError(f"Geoset {geosetNum} out of range ({len(model.geosets)})!")
+
+        meshes       = model.geosets[geosetNum].meshes
+        uvAbsolute   = bool(baseObj.get(kModelUvAbsolute, False))
+        vertexColors = bool(baseObj.get(kModelVertexColors, False))
+        materials: Optional[List[_ModelMaterial]] = None
+        instances: Optional[_MeshInstances] = None
+        for obj in _get_child_objs(baseObj):
+            nodeIdx = obj.sith_model3do_hnode_idx
+            if obj.type != 'MESH' or not 0 <= nodeIdx < len(model.meshHierarchy):
+                continue
+            node = model.meshHierarchy[nodeIdx]
+            if not 0 <= node.meshIdx < len(meshes):
+                continue
+
+            # Remember current mesh and get mesh of geoset
+            geosetMeshes = dict(obj.get(kNodeGeosetMeshes, {}))
+            geosetMeshes[str(curGeoset)] = obj.data.name
+            mesh = bpy.data.meshes.get(geosetMeshes.get(str(geosetNum), ''))
+            if mesh is None:
+                if materials is None:
+                    materials = _resolve_model_materials(model.materials)
+                    instances = _MeshInstances()
+                mesh3do = meshes[node.meshIdx]
+                if isinstance(mesh3do, Mesh3do):
+                    mesh3do = Mesh3doArrays.fromMesh3do(mesh3do)
+                key     = _mesh_instance_key(mesh3do, node.pivot, materials, uvAbsolute, vertexColors)
+                mesh    = instances.get(key)
+                if mesh is None:
+                    mesh = _make_mesh(mesh3do, uvAbsolute, vertexColors, materials)
+                    _set_mesh_pivot(mesh, node.pivot)
+                    instances.add(key, mesh)
+                geosetMeshes[str(geosetNum)] = mesh.name
+
+            obj[kNodeGeosetMeshes] = geosetMeshes
+            obj.data = mesh
+
+        baseObj[kModelGeoset] = geosetNum
+        bpy.context.scene.update()
+
 def _convert_to_absolute_paths(path_list: List[Union[Path, str]], cwd: Union[Path, str]) -> List[Union[Path, str]]:
     absolute_paths: List[Union[Path, str]] = []
     for path in path_list:
@@ -99,119 +194,244 @@ def _convert_to_absolute_paths(path_list: List[Union[Path, str]], cwd: Union[Pat
 def _set_obj_rotation(obj, rotation):
     objSetRotation(obj, rotation)
 
-def _set_obj_pivot(obj, pivot):
+def _set_mesh_pivot(mesh: bpy.types.Mesh, pivot: Vector3f):
     pvec = mathutils.Vector(pivot)
-    if  obj.type == 'MESH' and obj.data is not None and pvec.length > 0:
-        obj.data.transform(mathutils.Matrix.Translation(pvec))
+    if pvec.length > 0:
+        mesh.transform(mathutils.Matrix.Translation(pvec))
+
+def _get_unit_sphere_mesh() -> bpy.types.Mesh:
+    """ Returns sphere mesh with radius 1 which is shared by all radius objects. """
+    mesh = bpy.data.meshes.get(kRadiusSphereMesh)
+    if mesh is None:
+        mesh = bpy.data.meshes.new(kRadiusSphereMesh)
+        bm = bmesh.new()
+        bmesh.ops.create_uvsphere(bm, u_segments=32, v_segments=16, diameter=1.0) # Note: diameter is actually radius
+        bm.to_mesh(mesh)
+        bm.free()
+    return mesh
 
-def _make_radius_obj(name: str, parent, radius: float):
-    if name in bpy.data.meshes:
-        mesh = bpy.data.meshes[name]
-    else:
-        mesh = bpy.data.meshes.new(name)
-        ro = bpy.data.objects.new(name , mesh)
-        ro.draw_type = 'WIRE'
-        ro.hide = True
+def _make_radius_obj(name: str, parent, radius: float) -> Optional[bpy.types.Object]:
+    """
+    Makes wireframe sphere object of `radius` parented to `parent`, by scaling the shared unit sphere mesh.
+    Returns new object which is not yet linked to the scene or None if object with `name` already exists.
+    """
+    ro  = bpy.data.objects.get(name)
+    new = ro is None
+    if new:
+        ro = bpy.data.objects.new(name, _get_unit_sphere_mesh())
+        ro.draw_type   = 'WIRE'
+        ro.hide        = True
         ro.parent_type = 'OBJECT'
-        ro.parent = parent
-        bpy.context.scene.objects.link(ro)
-
-    bm = bmesh.new()
-    bmesh.ops.create_uvsphere(bm, u_segments=32, v_segments=16, diameter=radius)
-    bm.to_mesh(mesh)
-    bm.free()
+        ro.parent      = parent
+    else:
+        ro.data = _get_unit_sphere_mesh()
+    ro.scale = (radius,) * 3
+    return ro if new else None
 
 def _set_model_radius(obj: bpy.types.Object, radius: float):
-    _make_radius_obj(kModelRadius + obj.name, obj, radius)
+    ro = _make_radius_obj(kModelRadius + obj.name, obj, radius)
+    if ro:
+        bpy.context.scene.objects.link(ro)
 
-def _set_mesh_radius(obj: bpy.types.Object, radius: float):
-    _make_radius_obj(kMeshRadius + obj.name, obj, radius)
+def _set_mesh_radius(obj: bpy.types.Object, radius: float) -> Optional[bpy.types.Object]:
+    return _make_radius_obj(kMeshRadius + obj.name, obj, radius)
+
+class _ModelMaterial(NamedTuple):
+    material: bpy.types.Material
+    image: Optional[bpy.types.Image]
+    imageSize: Tuple[float, float] # (1.0, 1.0) if material has no image
+
+def _resolve_model_materials(mat_names: List[str]) -> List[_ModelMaterial]:
+    """
+    Resolves model material names to global materials and their texture images.
+    Material names are matched case-insensitive, missing materials are made new.
+    """
+    lower_names: Dict[str, bpy.types.Material] = {}
+    for mat in bpy.data.materials:
+        lower_names.setdefault(mat.name.lower(), mat)
+
+    materials: List[_ModelMaterial] = []
+    for mat_name in mat_names:
+        mat = bpy.data.materials.get(mat_name) or bpy.data.materials.get(mat_name.lower()) or lower_names.get(mat_name.lower())
+        if mat is None:
+            print(f"\nWarning: Could not find or load material file '{mat_name}'")
+            mat = makeNewGlobalMaterial(mat_name)
+            lower_names.setdefault(mat_name.lower(), mat)
 
-def _make_mesh(mesh3do: Mesh3do, uvAbsolute: bool, vertexColors: bool, mat_list: List):
-    mesh = bpy.data.meshes.new(mesh3do.name)
-
-    faces: List[List[int]] = []
-    for face in mesh3do.faces:
-        faces += [face.vertexIdxs]
+        img = None
+        if mat.texture_slots[0].texture:
+            img = mat.texture_slots[0].texture.image
+        size = tuple(float(np.float32(c)) for c in getImageTextureSize(img)) if img is not None else (1.0, 1.0)
+        materials.append(_ModelMaterial(mat, img, size))
+    return materials
+
+def _make_mesh(mesh3do: Mesh3doArrays, uvAbsolute: bool, vertexColors: bool, materials: List[_ModelMaterial]):
+    """
+    Makes Blender mesh from `mesh3do`.
+    Mesh vertices, loops, polygons, UV and color layers are filled in bulk with `foreach_set`.
+    """
+    num_verts  = len(mesh3do.vertices)
+    num_faces  = mesh3do.numFaces
+    offsets    = np.asarray(mesh3do.faceOffsets, dtype=np.int64)
+    totals     = np.diff(offsets).astype(np.int32)
+    loop_vidxs = np.asarray(mesh3do.faceVertexIdxs, dtype=np.int32)
+    loop_faces = np.repeat(np.arange(num_faces), totals)
+    num_loops  = len(loop_vidxs)
 
     # Construct mesh
-    mesh.from_pydata(mesh3do.vertices, [], faces)
+    mesh = bpy.data.meshes.new(mesh3do.name)
+    mesh.vertices.add(num_verts)
+    mesh.vertices.foreach_set('co', np.ascontiguousarray(mesh3do.vertices, dtype=np.float32).ravel())
+    mesh.loops.add(num_loops)
+    mesh.loops.foreach_set('vertex_index', loop_vidxs)
+    mesh.polygons.add(num_faces)
+    mesh.polygons.foreach_set('loop_start', offsets[:-1].astype(np.int32))
+    mesh.polygons.foreach_set('loop_total', totals)
+    mesh.update(calc_edges=True)
+    mesh.vertices.foreach_set('normal', np.ascontiguousarray(mesh3do.normals, dtype=np.float32).ravel())
     mesh.show_double_sided = True
 
-    bm = bmesh.new()
-    bm.from_mesh(mesh)
-    bm.faces.ensure_lookup_table()
-
-    vert_color = bm.loops.layers.color.verify()
-    uv_layer   = bm.loops.layers.uv.verify()
-    bm.faces.layers.tex.verify()
-    bmMeshInit3doLayers(bm)
-
-    # Set mesh materials and UV map
-    for face in bm.faces:
-        face3do = mesh3do.faces[face.index]
-
-        # Set custom property for face type, geometry, light, texture mode
-        bmFaceSetType(face, bm, face3do.type)
-        bmFaceSetGeometryMode(face, bm, face3do.geometryMode)
-        bmFaceSetLightMode(face, bm, face3do.lightMode)
-        bmFaceSetTextureMode(face, bm, face3do.textureMode)
-        bmFaceSetExtraLight(face, bm, face3do.color)
-
-        # Set face normal
-        face.normal = mesh3do.faces[face.index].normal
-
-        # Set face material index
-        mat = None
-        if face3do.materialIdx > -1:
-            mat_name = mat_list[face3do.materialIdx]
-            mat = getGlobalMaterial(mat_name)
-            if mat is None:
-                print(f"\nWarning: Could not find or load material file '{mat_name}'")
-                mat = makeNewGlobalMaterial(mat_name)
-
-        if mat:
-            if mat.name not in mesh.materials:
-                mesh.materials.append(mat)
-            face.material_index = mesh.materials.find(mat.name)
-
-        # Set face texture
-        img = None
-        if mat and mat.texture_slots[0].texture:
-            tex = mat.texture_slots[0].texture
-            img = tex.image
-            tex_layer = bm.faces.layers.tex[uv_layer.name]
-            face[tex_layer].image = img
-
-        # Set vertices color and face uv map
-        for idx, loop in enumerate(face.loops): # update vertices
-            vidx             = loop.vert.index
-            loop.vert.normal = mesh3do.normals[vidx]
-            if vertexColors:
-                loop[vert_color] = mesh3do.vertexColors[vidx]
-
-            # Set UV coordinates
-            luv    = loop[uv_layer]
-            uvIdx  = face3do.uvIdxs[idx]
-            if uvIdx < len(mesh3do.uvs):
-                uv = mesh3do.uvs[uvIdx]
-                if uvAbsolute: # Remove image size from uv
-                    if img is not None:
-                        uv = vectorDivide(mathutils.Vector(uv), mathutils.Vector(img.size))
-                    elif face3do.materialIdx > -1:
-                        print(f"\nWarning: Could not remove image size from UV coord due to missing image! mesh:'{mesh3do.name}' face:{face.index} uvIdx:{uvIdx}")
-                luv.uv = (uv.x, -uv.y) # Note: Flipped v
-            elif uvIdx > -1:
-                print(f"Warning: UV index out of range {uvIdx} >= {len(mesh3do.uvs)}! mesh:'{mesh3do.name}' face:{face.index}")
-
-    bm.to_mesh(mesh)
-    bm.free()
+    uv_tex     = mesh.uv_textures.new()
+    uv_layer   = mesh.uv_layers[uv_tex.name]
+    vert_color = mesh.vertex_colors.new()
+
+    # Set mesh materials. Model material idx -1 maps to the last entry of per model material arrays
+    face_mats = np.asarray(mesh3do.faceMaterialIdxs, dtype=np.int32)
+    mat_slots = np.zeros(len(materials) + 1, dtype=np.int32)
+    mesh_mats: Dict[str, int] = {}
+    mat_idxs, first_faces = np.unique(face_mats, return_index=True)
+    for mat_idx in mat_idxs[np.argsort(first_faces)].tolist(): # in order of first use
+        if mat_idx < 0:
+            continue
+        mat = materials[mat_idx].material
+        if mat.name not in mesh_mats:
+            mesh_mats[mat.name] = len(mesh.materials)
+            mesh.materials.append(mat)
+        mat_slots[mat_idx] = mesh_mats[mat.name]
+    mesh.polygons.foreach_set('material_index', mat_slots[face_mats])
+
+    # Set face texture
+    mat_has_img   = np.array([m.image is not None for m in materials] + [False])
+    face_has_img  = mat_has_img[face_mats]
+    for fidx, mat_idx in zip(np.flatnonzero(face_has_img).tolist(), face_mats[face_has_img].tolist()):
+        uv_tex.data[fidx].image = materials[mat_idx].image
+
+    # Set face uv map
+    loop_uv_idxs = np.asarray(mesh3do.faceUvIdxs, dtype=np.int32)
+    uvs          = np.asarray(mesh3do.uvs, dtype=np.float32).reshape(-1, 2)
+    uv_valid     = (loop_uv_idxs > -1) & (loop_uv_idxs < len(uvs))
+    loop_uvs     = np.zeros((num_loops, 2), dtype=np.float32)
+    loop_uvs[uv_valid] = uvs[loop_uv_idxs[uv_valid]]
+    for lidx in np.flatnonzero(loop_uv_idxs >= len(uvs)).tolist():
+        print(f"Warning: UV index out of range {loop_uv_idxs[lidx]} >= {len(uvs)}! mesh:'{mesh3do.name}' face:{loop_faces[lidx]}")
+
+    if uvAbsolute: # Remove image size from uv
+        img_sizes  = np.array([m.imageSize for m in materials] + [(1.0, 1.0)], dtype=np.float64)
+        loop_mats  = face_mats[loop_faces]
+        uv_abs     = uv_valid & mat_has_img[loop_mats]
+        loop_uvs[uv_abs] = loop_uvs[uv_abs] / img_sizes[loop_mats[uv_abs]]
+        for fidx in np.unique(loop_faces[uv_valid & ~mat_has_img[loop_mats] & (loop_mats > -1)]).tolist():
+            print(f"\nWarning: Could not remove image size from UV coord due to missing image! mesh:'{mesh3do.name}' face:{fidx}")
+
+    loop_uvs[uv_valid, 1] *= -1 # Note: Flipped v
+    uv_layer.data.foreach_set('uv', loop_uvs.ravel())
+
+    # Set vertices color
+    if vertexColors:
+        colors = np.asarray(mesh3do.vertexColors, dtype=np.float32).reshape(-1, 4)
+        vert_color.data.foreach_set('color', colors[loop_vidxs].ravel())
+
+    # Set custom properties for face type, geometry, light, texture mode and extra light
+    meshSet3doFaceAttributes(mesh, Mesh3doFaceAttributes(
+        types         = mesh3do.faceTypes,
+        geometryModes = mesh3do.faceGeometryModes,
+        lightModes    = mesh3do.faceLightModes,
+        textureModes  = mesh3do.faceTextureModes,
+        extraLights   = mesh3do.faceColors
+    ))
 
     mesh.update()
     return mesh
 
-def _create_objects_from_model(model: Model3do, uvAbsolute: bool, geosetNum: int, vertexColors: bool, importRadiusObj:bool, preserveOrder: bool):
-    meshes = model.geosets[geosetNum].meshes
+def _mesh_instance_key(mesh3do: Mesh3doArrays, pivot: Vector3f, materials: List[_ModelMaterial], uvAbsolute: bool, vertexColors: bool) -> str:
+    """ Returns key of mesh data-block made from `mesh3do` which identifies mesh geometry, materials and import options. """
+    h = hashlib.blake2b(mesh3do.contentHash(vertexColors), digest_size=16)
+    h.update(repr((tuple(pivot), uvAbsolute, vertexColors)).encode())
+    for mat_idx in np.unique(mesh3do.faceMaterialIdxs).tolist():
+        if mat_idx > -1:
+            h.update(materials[mat_idx].material.name.encode() + b'\0')
+    return h.hexdigest()
+
+def _mesh_content_hash(mesh: bpy.types.Mesh) -> str:
+    """
+    Returns hash of the content of mesh data-block which is identified by instance key,
+    i.e.: geometry, UVs, vertex colors, material slots and 3DO face attributes.
+    """
+    num_loops = len(mesh.loops)
+    num_faces = len(mesh.polygons)
+    arrays = [
+        (mesh.vertices, 'co', np.float32, len(mesh.vertices) * 3),
+        (mesh.loops, 'vertex_index', np.int32, num_loops),
+        (mesh.polygons, 'loop_start', np.int32, num_faces),
+        (mesh.polygons, 'loop_total', np.int32, num_faces),
+        (mesh.polygons, 'material_index', np.int32, num_faces),
+    ]
+    if mesh.uv_layers.active:
+        arrays.append((mesh.uv_layers.active.data, 'uv', np.float32, num_loops * 2))
+    if mesh.vertex_colors.active:
+        arrays.append((mesh.vertex_colors.active.data, 'color', np.float32, num_loops * 4))
+
+    h = hashlib.blake2b(digest_size=16)
+    for seq, attr, dtype, size in arrays:
+        values = np.empty(size, dtype=dtype)
+        seq.foreach_get(attr, values)
+        h.update(values.tobytes())
+    for values in meshGet3doFaceAttributes(mesh):
+        h.update(np.ascontiguousarray(values).tobytes())
+    for mat in mesh.materials:
+        h.update((mat.name if mat else '').encode() + b'\0')
+    return h.hexdigest()
+
+class _MeshInstances:
+    """
+    Imported mesh data-blocks by instance key.
+    Mesh is reused only if its content wasn't edited since import. This is verified
+    only for the meshes of looked up keys, once per instance.
+    """
+    def __init__(self):
+        self._candidates: Dict[str, List[bpy.types.Mesh]] = {}
+        self._meshes: Dict[str, bpy.types.Mesh] = {}
+        for mesh in bpy.data.meshes:
+            key = mesh.get(kMeshInstanceKey)
+            if key and mesh.library is None:
+                self._candidates.setdefault(key, []).append(mesh)
+
+    def get(self, key: str) -> Optional[bpy.types.Mesh]:
+        mesh = self._meshes.get(key)
+        if mesh is None:
+            for m in self._candidates.pop(key, []):
+                if m.get(kMeshInstanceHash) == _mesh_content_hash(m):
+                    mesh = self._meshes[key] = m
+                    break
+        return mesh
+
+    def add(self, key: str, mesh: bpy.types.Mesh):
+        """ Tags newly imported `mesh` with instance `key` and content hash. """
+        mesh[kMeshInstanceKey]  = key
+        mesh[kMeshInstanceHash] = _mesh_content_hash(mesh)
+        self._meshes[key] = mesh
+
+def _create_objects_from_model(model: Model3do, uvAbsolute: bool, geosetNum: int, vertexColors: bool, importRadiusObj:bool, preserveOrder: bool, instanceMeshes: bool = True) -> List[bpy.types.Object]:
+    """
+    Creates objects of model hierarchy nodes and returns them in the order of nodes.
+    All objects are created and parented first and then linked to the scene at once with single scene update.
+    Note, `model` is not modified as it can be shared by the asset cache.
+    """
+    meshes    = model.geosets[geosetNum].meshes
+    materials = _resolve_model_materials(model.materials)
+    instances = _MeshInstances() if instanceMeshes else None
+    objs: List[bpy.types.Object] = []
+    node_objs: List[bpy.types.Object] = []
     for node in model.meshHierarchy:
         meshIdx = node.meshIdx
 
@@ -221,22 +441,33 @@ def _create_objects_from_model(model: Model3do, uvAbsolute: bool, geosetNum: int
                 raise IndexError(f"Mesh index {meshIdx} out of range ({len(meshes)})!")
 
             mesh3do = meshes[meshIdx]
-            mesh    = _make_mesh(mesh3do, uvAbsolute, vertexColors, model.materials)
-            obj     = bpy.data.objects.new(mesh3do.name, mesh)
+            if isinstance(mesh3do, Mesh3do):
+                mesh3do = Mesh3doArrays.fromMesh3do(mesh3do)
+
+            mesh = None
+            if instances is not None:
+                key  = _mesh_instance_key(mesh3do, node.pivot, materials, uvAbsolute, vertexColors)
+                mesh = instances.get(key)
+            if mesh is None:
+                mesh = _make_mesh(mesh3do, uvAbsolute, vertexColors, materials)
+                _set_mesh_pivot(mesh, node.pivot)
+                if instances is not None:
+                    instances.add(key, mesh)
+            obj = bpy.data.objects.new(mesh3do.name, mesh)
 
             # Set mesh radius object, draw type, custom property for lighting and texture mode
             if importRadiusObj:
-                _set_mesh_radius(obj, mesh3do.radius)
+                ro = _set_mesh_radius(obj, mesh3do.radius)
+                if ro:
+                    objs.append(ro)
 
             obj.draw_type                  = getDrawType(mesh3do.geometryMode)
             obj.sith_model3do_light_mode   = mesh3do.lightMode.name
             obj.sith_model3do_texture_mode = mesh3do.textureMode.name
             obj.draw_bounds_type      = 'SPHERE'
-            bpy.context.scene.objects.link(obj)
         else:
             obj = bpy.data.objects.new(node.name, None)
             obj.empty_draw_size = (0.0)
-            bpy.context.scene.objects.link(obj)
 
         # Make obj name prefixed by idx num.
         # This will make the hierarchy of model 3do ordered by index instead by name in Blender.
@@ -248,18 +479,22 @@ def _create_objects_from_model(model: Model3do, uvAbsolute: bool, geosetNum: int
         obj.sith_model3do_hnode_flags = node.flags.hex()
         obj.sith_model3do_hnode_type  = node.type.hex()
 
-        # Set node position, rotation and pivot
-        _set_obj_pivot(obj, node.pivot)
+        # Set node local transform, pivot is already applied to mesh
         obj.location = node.position
         _set_obj_rotation(obj, node.rotation)
 
-        node.obj = obj
-
-    bpy.context.scene.update()
+        node_objs.append(obj)
+        objs.append(obj)
 
     # Set parent hierarchy
-    for node in model.meshHierarchy:
+    for node, obj in zip(model.meshHierarchy, node_objs):
         if node.parentIdx != -1:
-            node.obj.parent_type = 'OBJECT'
-            node.obj.parent      = model.meshHierarchy[node.parentIdx].obj
-    bpy.context.scene.update()
+            obj.parent_type = 'OBJECT'
+            obj.parent      = node_objs[node.parentIdx]
+
+    # Link all objects to the scene
+    scene = bpy.context.scene
+    for obj in objs:
+        scene.objects.link(obj)
+    scene.update()
+    return node_objs
@@ -19,12 +19,16 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import numpy as np
 import os
+
+from concurrent.futures import Executor
 from enum import Enum
 from pathlib import Path
-from sith.text.tokenizer import TokenType, Tokenizer
-from sith.types import Vector4f
-from typing import Tuple, Union
+from sith.text.sections import LazySections, lazySectionProperty
+from sith.text.tokenizer import BufferTokenizer, makeTokenizer, TokenType, Tokenizer
+from sith.types import LazyProcessPool, Vector2f, Vector3f, Vector4f
+from typing import Container, List, Optional, Tuple, Union
 
 from .model3do import *
 
@@ -37,12 +41,111 @@ class Model3doFileVersion(float, Enum):
     def contains(cls, value):
         return value in cls._value2member_map_
 
-def load3do(filePath: Union[str, Path] ) -> Tuple[Model3do, Model3doFileVersion]:
-    f = open(filePath, 'r', encoding='utf-8')
-    tok = Tokenizer(f)
-
+# Number of color components in vertex and face table rows by file version
+_num_color_components = {
+    Model3doFileVersion.Version2_1: 1, # intensity
+    Model3doFileVersion.Version2_2: 3, # RGB
+    Model3doFileVersion.Version2_3: 4, # RGBA
+}
+
+class LazyModel3doGeoSet(Model3doGeoSet):
+    """
+    Geoset which was skipped while loading 3DO model.
+    Geoset's meshes are parsed from the file on first access.
+    """
+    def __init__(self, filePath: Union[str, Path], pos: int, geosetNum: int, fileVersion: Model3doFileVersion, columnar: bool = False):
+        super().__init__()
+        self._path     = filePath
+        self._pos      = pos # file position of geoset
+        self._num      = geosetNum
+        self._version  = fileVersion
+        self._columnar = columnar
+        self._loaded   = False
+
+    @property
+    def isLoaded(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        """ Parses geoset from file if it wasn't parsed yet """
+        if self._loaded:
+            return
+        self._loaded = True
+        with open(self._path, 'rb') as f, makeTokenizer(f) as tok:
+            tok.seek(self._pos)
+            _parse_geoset(tok, self, self._num, self._version, self._columnar)
+
+    @property
+    def meshes(self) -> List[Union[Mesh3do, Mesh3doArrays]]:
+        self.load()
+        return self.mesh_list
+
+    @meshes.setter
+    def meshes(self, meshes: List[Union[Mesh3do, Mesh3doArrays]]):
+        self._loaded   = True
+        self.mesh_list = meshes
+
+class LazyModel3do(LazySections, Model3do):
+    """
+    Model3do which parses 3DO file sections on first access of the section's data.
+    e.g.: accessing `materials` parses only MODELRESOURCE section, `meshHierarchy` only HIERARCHYDEF section.
+    """
+    def __init__(self, filePath: Union[str, Path], columnar: bool = False, geosets: Optional[Container[int]] = None):
+        Model3do.__init__(self, os.path.basename(filePath))
+        self._init_lazy_sections(filePath)
+        self._columnar = columnar
+        self._geosets  = geosets
+        self._version  = Model3doFileVersion.Version2_1
+
+    @property
+    def fileVersion(self) -> Model3doFileVersion:
+        self.loadSection("HEADER")
+        return self._version
+
+    materials     = lazySectionProperty(Model3do.materials, "MODELRESOURCE")
+    radius        = lazySectionProperty(Model3do.radius, "GEOMETRYDEF")
+    insertOffset  = lazySectionProperty(Model3do.insertOffset, "GEOMETRYDEF")
+    geosets       = lazySectionProperty(Model3do.geosets, "GEOMETRYDEF")
+    meshHierarchy = lazySectionProperty(Model3do.meshHierarchy, "HIERARCHYDEF")
+
+    def _parse_lazy_section(self, tok: Tokenizer, section: str):
+        if section == "HEADER":
+            self._version = _parse_model_header_section(tok)
+
+        elif section == "MODELRESOURCE":
+            _parse_model_resource_section(tok, self)
+
+        elif section == "GEOMETRYDEF":
+            _parse_model_geometry_section(tok, self, self.fileVersion, self._columnar, self._geosets, self._lazy_path)
+
+        elif section == "HIERARCHYDEF":
+            _parse_hierarchy_section(tok, self)
+
+def load3do(filePath: Union[str, Path], columnar: bool = False, lazy: bool = False, geosets: Optional[Container[int]] = None, workers: int = 1) -> Tuple[Model3do, Model3doFileVersion]:
+    """
+    Loads 3DO model from file.
+    If `columnar` is True the geoset meshes are loaded as `Mesh3doArrays` instead of `Mesh3do`.
+    If `lazy` is True returned model is `LazyModel3do` which parses file sections on first access.
+    If `geosets` is set only geosets with the listed indices are parsed. The text of other geosets is skipped
+    without tokenizing and they're added to the model as `LazyModel3doGeoSet` which is parsed on first access.
+    If `workers` > 1 the meshes of geoset are parsed in parallel by the pool of `workers` processes.
+    Note, `workers` is ignored when `lazy` is True.
+    """
+    if lazy:
+        model = LazyModel3do(filePath, columnar, geosets)
+        return (model, model.fileVersion)
+
+    pool = LazyProcessPool(workers) if workers > 1 else None # processes are started only for geoset with multiple meshes
+    try:
+        with open(filePath, 'rb') as f, makeTokenizer(f) as tok:
+            return _parse_model(tok, os.path.basename(filePath), columnar, geosets, filePath, pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+def _parse_model(tok: Tokenizer, name: str, columnar: bool = False, geosets: Optional[Container[int]] = None, filePath: Optional[Union[str, Path]] = None, pool: Optional[Executor] = None) -> Tuple[Model3do, Model3doFileVersion]:
     file_version = Model3doFileVersion.Version2_1
-    model = Model3do(os.path.basename(filePath))
+    model = Model3do(name)
 
     while True:
         _skip_to_next_model_section(tok)
@@ -57,7 +160,7 @@ def load3do(filePath: Union[str, Path] ) -> Tuple[Model3do, Model3doFileVersion]
             _parse_model_resource_section(tok, model)
 
         elif t.value.upper() == "GEOMETRYDEF":
-            _parse_model_geometry_section(tok, model, file_version)
+            _parse_model_geometry_section(tok, model, file_version, columnar, geosets, filePath, pool)
 
         elif t.value.upper() == "HIERARCHYDEF":
             _parse_hierarchy_section(tok, model)
@@ -93,7 +196,7 @@ def _parse_model_resource_section(tok: Tokenizer, model: Model3do):
         tok.assertPunctuator(':')
         model.materials.append(tok.getSpaceDelimitedString())
 
-def _parse_model_geometry_section(tok: Tokenizer, model: Model3do, fileVersion: Model3doFileVersion):
+def _parse_model_geometry_section(tok: Tokenizer, model: Model3do, fileVersion: Model3doFileVersion, columnar: bool, geosets: Optional[Container[int]] = None, filePath: Optional[Union[str, Path]] = None, pool: Optional[Executor] = None):
     tok.assertIdentifier("RADIUS")
     model.radius = tok.getFloatNumber()
 
@@ -104,126 +207,209 @@ def _parse_model_geometry_section(tok: Tokenizer, model: Model3do, fileVersion:
     tok.assertIdentifier("GEOSETS")
     numGeoSets = tok.getIntNumber()
     for i in range(0, numGeoSets):
-        geoset = Model3doGeoSet()
+        if geosets is not None and i not in geosets and filePath is not None and isinstance(tok, BufferTokenizer):
+            # Skip the text of unselected geoset and record it for later loading
+            geoset = LazyModel3doGeoSet(filePath, tok.pos, i, fileVersion, columnar)
+            tok.assertIdentifier("GEOSET")
+            tok.getIntNumber()
+            tok.skipToLine(r'GEOSET\b|SECTION\b')
+        else:
+            geoset = Model3doGeoSet()
+            _parse_geoset(tok, geoset, i, fileVersion, columnar, pool, filePath)
+        model.geosets.append(geoset)
 
-        tok.assertIdentifier("GEOSET")
-        geosetIdx = tok.getIntNumber()
-        if geosetIdx != i:
-            print(f"Warning: Index mismatch while loading 3DO geosets. {geosetIdx} != {i}")
+def _parse_geoset(tok: Tokenizer, geoset: Model3doGeoSet, geosetNum: int, fileVersion: Model3doFileVersion, columnar: bool, pool: Optional[Executor] = None, filePath: Optional[Union[str, Path]] = None):
+    tok.assertIdentifier("GEOSET")
+    geosetIdx = tok.getIntNumber()
+    if geosetIdx != geosetNum:
+        print(f"Warning: Index mismatch while loading 3DO geosets. {geosetIdx} != {geosetNum}")
+
+    tok.assertIdentifier("MESHES")
+    numMeshes = tok.getIntNumber()
+    if pool is not None and filePath is not None and isinstance(tok, BufferTokenizer) and numMeshes > 1:
+        # Find mesh blocks and parse them in parallel
+        meshPositions = []
+        for _ in range(0, numMeshes):
+            meshPositions.append(tok.pos)
+            tok.assertIdentifier("MESH")
+            tok.skipToLine(r'MESH\b|GEOSET\b|SECTION\b')
 
-        tok.assertIdentifier("MESHES")
-        numMeshes = tok.getIntNumber()
+        # Note, workers return parsed mesh tables, which are much faster to transfer than mesh objects
+        n = len(meshPositions)
+        for tables in pool.map(_parse_mesh_tables_at, [filePath] * n, meshPositions, range(n), [geosetNum] * n, [fileVersion] * n):
+            geoset.meshes.append(_make_mesh(tables, columnar))
+    else:
         for j in range(0, numMeshes):
-            tok.assertIdentifier("MESH")
-            meshIdx = tok.getIntNumber()
-            if meshIdx != j:
-                print(f"Warning: Index mismatch while loading 3DO meshes. {meshIdx} != {i}")
-
-            tok.assertIdentifier("NAME")
-            name = tok.getDelimitedStringToken(lambda c: c == '\n')
-            mesh = Mesh3do(meshIdx, name.value.strip())
-
-
-            tok.assertIdentifier("RADIUS")
-            mesh.radius = tok.getFloatNumber()
-
-            identifier = tok.getIdentifier()
-            if identifier.upper() == 'SHADOW': # Grim Fandango
-                tok.getToken() # Skip SHADOW
-                tok.assertIdentifier("GEOMETRYMODE")
-            elif identifier.upper() != 'GEOMETRYMODE':
-                raise AssertionError(f"Expected identifier 'GEOMETRYMODE', found '{identifier}'! line: {tok.line} column: {tok.column}")
-
-            mesh.geometryMode = GeometryMode(tok.getIntNumber())
-
-            tok.assertIdentifier("LIGHTINGMODE")
-            mesh.lightMode = LightMode(tok.getIntNumber())
-
-            tok.assertIdentifier("TEXTUREMODE")
-            mesh.textureMode = TextureMode(tok.getIntNumber())
-
-
-            tok.assertIdentifier("VERTICES")
-            numVertices = tok.getIntNumber()
-            for k in range(0, numVertices):
-                uvIdx = tok.getIntNumber()
-                if uvIdx != k:
-                    print(f"Warning: Index mismatch while loading 3DO vertices. {uvIdx} != {k}")
-
-                tok.assertPunctuator(':')
-
-                mesh.vertices.append(tok.getVector3f())
-                if fileVersion == Model3doFileVersion.Version2_1:
-                    intensity = tok.getFloatNumber()
-                    mesh.vertexColors.append(Vector4f(*((intensity, )*3), 1.0))
-                elif fileVersion == Model3doFileVersion.Version2_2:
-                    color = Vector4f(*tok.getVector3f(), 1.0) # RGB
-                    mesh.vertexColors.append(color)
-                else: # 2.3
-                    mesh.vertexColors.append(tok.getVector4f()) #RGBA
-
-            tok.assertIdentifier("TEXTURE")
-            tok.assertIdentifier("VERTICES")
-            numUVs = tok.getIntNumber()
-            for k in range(0, numUVs):
-                uvIdx = tok.getIntNumber()
-                if uvIdx != k:
-                    print(f"Warning: Index mismatch while loading 3DO UV list. {uvIdx} != {k}")
-                tok.assertPunctuator(':')
-                mesh.uvs.append(tok.getVector2f())
-
-            tok.assertIdentifier("VERTEX")
-            tok.assertIdentifier("NORMALS")
-            for k in range(0, numVertices):
-                normalIdx = tok.getIntNumber()
-                if normalIdx != k:
-                    print(f"Warning: Index mismatch while loading 3DO vertex normals. {normalIdx} != {k}")
-                tok.assertPunctuator(':')
-                mesh.normals.append(tok.getVector3f())
-
-            tok.assertIdentifier("FACES")
-            numFaces = tok.getIntNumber()
-            for k in range(0, numFaces):
-                faceIdx = tok.getIntNumber()
-                if faceIdx != k:
-                    print(f"Warning: Index mismatch while loading 3DO mesh faces. {faceIdx} != {k}")
-
-                tok.assertPunctuator(':')
-
-                face = Mesh3doFace()
-                face.materialIdx  = tok.getIntNumber()
-                face.type         = FaceType(tok.getIntNumber())
-                face.geometryMode = GeometryMode(tok.getIntNumber())
-                face.lightMode    = LightMode(tok.getIntNumber())
-                face.textureMode  = TextureMode(tok.getIntNumber())
-
-                if fileVersion == Model3doFileVersion.Version2_1:
-                    intensity     = tok.getFloatNumber()
-                    face.color    = Vector4f(*((intensity, )*3), 1.0)
-                elif fileVersion == Model3doFileVersion.Version2_2:
-                    face.color    = Vector4f(*tok.getVector3f(), 1.0)
-                else: # 2.3
-                    face.color    = tok.getVector4f()
-
-                numFaceVerts = tok.getIntNumber()
-                for _ in range(0, numFaceVerts):
-                    idxs = tok.getPairOfInts()
-                    face.vertexIdxs.append(idxs[0])
-                    face.uvIdxs.append(idxs[1])
-
-                mesh.faces.append(face)
-
-            tok.assertIdentifier("FACE")
-            tok.assertIdentifier("NORMALS")
-            for k in range(0, numFaces):
-                faceNormalIdx = tok.getIntNumber()
-                if faceNormalIdx != k:
-                    print(f"Warning: Index mismatch while loading 3DO mesh face normals. {faceNormalIdx} != {k}")
-                tok.assertPunctuator(':')
-                mesh.faces[k].normal = tok.getVector3f()
-
-            geoset.meshes.append(mesh)
-        model.geosets.append(geoset)
+            geoset.meshes.append(_parse_mesh(tok, j, geosetNum, fileVersion, columnar))
+
+def _parse_mesh_tables_at(filePath: Union[str, Path], pos: int, meshNum: int, geosetNum: int, fileVersion: Model3doFileVersion) -> Tuple:
+    """ Parses tables of mesh at file position `pos`. Called by worker process. """
+    with open(filePath, 'rb') as f, makeTokenizer(f) as tok:
+        tok.seek(pos)
+        return _parse_mesh_tables(tok, meshNum, geosetNum, fileVersion)
+
+def _parse_mesh(tok: Tokenizer, meshNum: int, geosetNum: int, fileVersion: Model3doFileVersion, columnar: bool) -> Union[Mesh3do, Mesh3doArrays]:
+    return _make_mesh(_parse_mesh_tables(tok, meshNum, geosetNum, fileVersion), columnar)
+
+def _parse_mesh_tables(tok: Tokenizer, meshNum: int, geosetNum: int, fileVersion: Model3doFileVersion) -> Tuple:
+    """
+    Parses mesh and returns mesh without vertices and faces, and the parsed mesh tables:
+    vertices, vertex colors, uvs, vertex normals, faces (see `_parse_mesh_faces`) and face normals.
+    """
+    tok.assertIdentifier("MESH")
+    meshIdx = tok.getIntNumber()
+    if meshIdx != meshNum:
+        print(f"Warning: Index mismatch while loading 3DO meshes. {meshIdx} != {meshNum}")
+
+    tok.assertIdentifier("NAME")
+    name = tok.getDelimitedStringToken(lambda c: c == '\n')
+    mesh = Mesh3do(meshIdx, name.value.strip())
+
+    tok.assertIdentifier("RADIUS")
+    mesh.radius = tok.getFloatNumber()
+
+    identifier = tok.getIdentifier()
+    if identifier.upper() == 'SHADOW': # Grim Fandango
+        tok.getToken() # Skip SHADOW
+        tok.assertIdentifier("GEOMETRYMODE")
+    elif identifier.upper() != 'GEOMETRYMODE':
+        raise AssertionError(f"Expected identifier 'GEOMETRYMODE', found '{identifier}'! line: {tok.line} column: {tok.column}")
+
+    mesh.geometryMode = GeometryMode(tok.getIntNumber())
+
+    tok.assertIdentifier("LIGHTINGMODE")
+    mesh.lightMode = LightMode(tok.getIntNumber())
+
+    tok.assertIdentifier("TEXTUREMODE")
+    mesh.textureMode = TextureMode(tok.getIntNumber())
+
+
+    numColorComps = _num_color_components[fileVersion]
+
+    tok.assertIdentifier("VERTICES")
+    numVertices = tok.getIntNumber()
+    vertices    = tok.getNumericTable(numVertices, 3 + numColorComps)
+    _check_row_indices(vertices[:, 0], "vertices")
+
+    tok.assertIdentifier("TEXTURE")
+    tok.assertIdentifier("VERTICES")
+    numUVs = tok.getIntNumber()
+    uvs    = tok.getNumericTable(numUVs, 2)
+    _check_row_indices(uvs[:, 0], "UV list")
+
+    tok.assertIdentifier("VERTEX")
+    tok.assertIdentifier("NORMALS")
+    normals = tok.getNumericTable(numVertices, 3)
+    _check_row_indices(normals[:, 0], "vertex normals")
+
+    tok.assertIdentifier("FACES")
+    numFaces = tok.getIntNumber()
+    faces    = _parse_mesh_faces(tok, numFaces, numColorComps)
+
+    tok.assertIdentifier("FACE")
+    tok.assertIdentifier("NORMALS")
+    faceNormals = tok.getNumericTable(numFaces, 3)
+    _check_row_indices(faceNormals[:, 0], "mesh face normals")
+
+    return (mesh, vertices[:, 1:4], _to_rgba(vertices[:, 4:]), uvs[:, 1:], normals[:, 1:], faces, faceNormals[:, 1:])
+
+def _make_mesh(tables: Tuple, columnar: bool) -> Union[Mesh3do, Mesh3doArrays]:
+    """ Makes mesh from the mesh tables returned by `_parse_mesh_tables` """
+    mesh, vertices, vertexColors, uvs, normals, faces, faceNormals = tables
+    if columnar:
+        amesh = Mesh3doArrays(mesh.idx, mesh.name)
+        amesh.radius       = mesh.radius
+        amesh.geometryMode = mesh.geometryMode
+        amesh.lightMode    = mesh.lightMode
+        amesh.textureMode  = mesh.textureMode
+        amesh.vertices     = vertices
+        amesh.vertexColors = vertexColors
+        amesh.uvs          = uvs
+        amesh.normals      = normals
+        amesh.faceNormals  = faceNormals
+        _set_mesh_arrays_faces(amesh, *faces)
+        return amesh
+
+    mesh.vertices     = list(map(Vector3f._make, vertices.tolist()))
+    mesh.vertexColors = list(map(Vector4f._make, vertexColors.tolist()))
+    mesh.uvs          = list(map(Vector2f._make, uvs.tolist()))
+    mesh.normals      = list(map(Vector3f._make, normals.tolist()))
+    mesh.faces        = _make_mesh_faces(*faces)
+    for face, normal in zip(mesh.faces, map(Vector3f._make, faceNormals.tolist())):
+        face.normal = normal
+    return mesh
+
+def _parse_mesh_faces(tok: Tokenizer, numFaces: int, numColorComps: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parses mesh face table and returns face offsets, flat vertex idxs, flat uv idxs,
+    face properties (material, type, geo, light and tex mode) and face RGBA colors.
+    """
+    # Face row: <idx>: <material> <type> <geo> <light> <tex> <color> <num verts> <vert idx>, <uv idx> ...
+    values, offsets = tok.getNumericRows(numFaces)
+    rowStarts = offsets[:-1]
+    _check_row_indices(values[rowStarts], "mesh faces")
+
+    numHeaderCols = 6 + numColorComps
+    numFaceVerts  = values[rowStarts + numHeaderCols].astype(np.int64)
+    rowLengths    = np.diff(offsets)
+    invalidRows   = np.flatnonzero(rowLengths != numHeaderCols + 1 + 2 * numFaceVerts)
+    if len(invalidRows) > 0:
+        k = int(invalidRows[0])
+        raise AssertionError(f"Invalid number of vertices in 3DO mesh face {k}, expected {numFaceVerts[k]} vertex pairs! line: {tok.line} column: {tok.column}")
+
+    headers  = values[rowStarts[:, np.newaxis] + np.arange(numHeaderCols)]
+    colInRow = np.arange(len(values)) - np.repeat(rowStarts, rowLengths)
+    idxPairs = values[colInRow > numHeaderCols].astype(np.int64).reshape((-1, 2))
+    return (
+        np.concatenate(([0], np.cumsum(numFaceVerts))),
+        idxPairs[:, 0],
+        idxPairs[:, 1],
+        headers[:, 1:6].astype(np.int64),
+        _to_rgba(headers[:, 6:])
+    )
+
+def _make_mesh_faces(offsets: np.ndarray, vertIdxs: np.ndarray, uvIdxs: np.ndarray, props: np.ndarray, colors: np.ndarray) -> List[Mesh3doFace]:
+    offsets  = offsets.tolist()
+    vertIdxs = vertIdxs.tolist()
+    uvIdxs   = uvIdxs.tolist()
+    faces    = []
+    for k, (mat, ftype, geo, light, tex), color in zip(range(len(props)), props.tolist(), map(Vector4f._make, colors.tolist())):
+        face = Mesh3doFace()
+        face.materialIdx  = mat
+        face.type         = FaceType(ftype)
+        face.geometryMode = GeometryMode(geo)
+        face.lightMode    = LightMode(light)
+        face.textureMode  = TextureMode(tex)
+        face.color        = color
+        face.vertexIdxs   = vertIdxs[offsets[k]:offsets[k + 1]]
+        face.uvIdxs       = uvIdxs[offsets[k]:offsets[k + 1]]
+        faces.append(face)
+    return faces
+
+def _set_mesh_arrays_faces(mesh: Mesh3doArrays, offsets: np.ndarray, vertIdxs: np.ndarray, uvIdxs: np.ndarray, props: np.ndarray, colors: np.ndarray):
+    mesh.faceOffsets       = offsets
+    mesh.faceVertexIdxs    = vertIdxs
+    mesh.faceUvIdxs        = uvIdxs
+    mesh.faceMaterialIdxs  = props[:, 0]
+    mesh.faceTypes         = props[:, 1]
+    mesh.faceGeometryModes = props[:, 2]
+    mesh.faceLightModes    = props[:, 3]
+    mesh.faceTextureModes  = props[:, 4]
+    mesh.faceColors        = colors
+
+def _check_row_indices(rowIdxs: np.ndarray, tableName: str):
+    for k in np.flatnonzero(rowIdxs != np.arange(len(rowIdxs))).tolist():
+        print(f"Warning: Index mismatch while loading 3DO {tableName}. {int(rowIdxs[k])} != {k}")
+
+def _to_rgba(comps: np.ndarray) -> np.ndarray:
+    """
+    Converts table columns of intensity (2.1), RGB (2.2) or RGBA (2.3) color components to RGBA colors.
+    """
+    if comps.shape[1] == 1: # intensity
+        comps = np.repeat(comps, 3, axis=1)
+    if comps.shape[1] == 3: # RGB
+        comps = np.hstack((comps, np.ones((len(comps), 1))))
+    return comps
 
 def _parse_hierarchy_section(tok: Tokenizer, model: Model3do):
     tok.assertIdentifier("HIERARCHY")
@@ -19,26 +19,46 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import io
+import numpy as np
+
+from collections import deque
+from concurrent.futures import Executor
+from itertools import chain
 from .model3do import *
 from .model3doLoader import Model3doFileVersion
 from pathlib import Path
-from sith.types import Vector4f
 from sith.text.serutils import *
-from typing import List, TextIO, Tuple, Union
+from sith.types import LazyProcessPool
+from typing import Callable, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 
 _file_magic = "3DO"
 
-def save3do(model: Model3do, filePath: Union[Path, str], version: Model3doFileVersion, headerComment: str):
-    """ Saves `model` to 3DO file """
-    f = open(filePath, 'w', encoding='utf-8')
-
-    _write_section_header(f, model, headerComment, version)
-    _write_section_resources(f, model)
-    _write_section_geometry(f, model, version)
-    _write_section_hierarchydef(f, model)
-
-    f.flush()
-    f.close()
+def save3do(model: Model3do, filePath: Union[Path, str], version: Model3doFileVersion, headerComment: str, workers: int = 1, makeMesh: Optional[Callable[[Mesh3do], Union[Mesh3do, Mesh3doArrays]]] = None):
+    """
+    Saves `model` to 3DO file.
+    Each section and mesh is formatted into a buffer and written to file at once.
+    If `workers` > 1 the mesh blocks of geoset are formatted in parallel by the pool of `workers` processes
+    and written to file in mesh order. Worker processes are started only when some geoset has more than one mesh.
+    If `makeMesh` is set, each geoset mesh is passed to `makeMesh` right before its block is formatted
+    and the returned mesh is written instead. The returned mesh is released after it's written,
+    so `makeMesh` can make mesh geometry on demand, e.g. model meshes are empty placeholders.
+    """
+    pool = LazyProcessPool(workers) if workers > 1 else None
+    try:
+        with open(filePath, 'w', encoding='utf-8') as f:
+            f.write(_section_to_str(_write_section_header, model, headerComment, version))
+            f.write(_section_to_str(_write_section_resources, model))
+            _write_section_geometry(f, model, version, pool, workers, makeMesh)
+            f.write(_section_to_str(_write_section_hierarchydef, model))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+def _section_to_str(write_section, *args) -> str:
+    buf = io.StringIO()
+    write_section(buf, *args)
+    return buf.getvalue()
 
 def _vector_to_str(vector: Tuple[float, ...], compact: bool = True, align_width: int = 10) -> str:
     out = "" if compact else '('
@@ -82,117 +102,145 @@ def _write_section_resources(file: TextIO, model: Model3do):
     writeNewLine(file)
     writeNewLine(file)
 
-def _color_to_str(color: Vector4f, version: Model3doFileVersion, compact: bool = True, align_width: int = 0) -> str:
+def _rows_to_str(rowFormat: str, *columns: np.ndarray) -> str:
+    """ Formats each row of `columns` with `rowFormat` and returns rows joined into single string """
+    return ''.join(map(rowFormat.__mod__, zip(*[c.tolist() for c in columns])))
+
+def _color_columns(colors: np.ndarray, version: Model3doFileVersion) -> List[np.ndarray]:
     if version == Model3doFileVersion.Version2_1:
-        color = tuple([(color.x + color.y + color.z) /3])
-        compact = True
+        return [(colors[:, 0] + colors[:, 1] + colors[:, 2]) / 3]
     elif version == Model3doFileVersion.Version2_2:
-        color = color[0:3]
-    return _vector_to_str(color, compact=compact, align_width=align_width)
-
-def _write_vertices(file: TextIO, vertices, vertices_color, version: Model3doFileVersion):
-    writeKeyValue(file, "vertices", len(vertices))
-    writeNewLine(file)
-
-    writeCommentLine(file, "num:     x:         y:         z:         i:")
-    for idx, vert in enumerate(vertices):
-        row = '{:>5}:'.format(idx)
-        row += _vector_to_str(vert)
-        row += ' ' + _color_to_str(vertices_color[idx], version, compact=True)
-        writeLine(file, row)
-
-    writeNewLine(file)
-    writeNewLine(file)
-
-def _write_tex_vertices(file: TextIO, vertices):
-    writeKeyValue(file, "texture vertices", len(vertices))
-    writeNewLine(file)
-
-    for idx, vert in enumerate(vertices):
-        row = '{:>5}:'.format(idx)
-        row += _vector_to_str(vert)
-        writeLine(file, row)
-
-    writeNewLine(file)
-    writeNewLine(file)
-
-def _write_vert_normals(file: TextIO, normals):
-    writeLine(file, "vertex normals".upper())
-    writeNewLine(file)
-
-    writeCommentLine(file, "num:     x:         y:         z:")
-    for idx, n in enumerate(normals):
-        row = '{:>5}:'.format(idx)
-        row += _vector_to_str(n)
-        writeLine(file, row)
-
-    writeNewLine(file)
-    writeNewLine(file)
-
-
-def _face_vertx_to_str(vert_idxs: List[int], text_vert_idxs: List[int]):
-    out = '{:>8}  '.format(len(vert_idxs))
-    for i in range(0, len(vert_idxs)):
-        out += "{:>3}, {:>2} ".format(vert_idxs[i], text_vert_idxs[i])
+        return list(colors[:, 0:3].T)
+    return list(colors.T)
+
+def _num_color_columns(version: Model3doFileVersion) -> int:
+    return 1 if version == Model3doFileVersion.Version2_1 else 3 if version == Model3doFileVersion.Version2_2 else 4
+
+def _vertices_to_str(vertices: np.ndarray, colors: np.ndarray, version: Model3doFileVersion) -> str:
+    if len(colors) < len(vertices):
+        raise IndexError(f"Missing vertex colors, {len(colors)} colors for {len(vertices)} vertices!")
+    out  = "VERTICES " + str(len(vertices)) + "\n\n"
+    out += makeComment("num:     x:         y:         z:         i:") + "\n"
+    rowFormat = '%5d:' + ' %10.6f' * 3 + ' ' + ' %.6f' * _num_color_columns(version) + '\n'
+    out += _rows_to_str(rowFormat, np.arange(len(vertices)), *vertices.T, *_color_columns(colors[:len(vertices)], version))
+    return out + "\n\n"
+
+def _tex_vertices_to_str(vertices: np.ndarray) -> str:
+    out  = "TEXTURE VERTICES " + str(len(vertices)) + "\n\n"
+    out += _rows_to_str('%5d:' + ' %10.6f' * 2 + '\n', np.arange(len(vertices)), *vertices.T)
+    return out + "\n\n"
+
+def _normals_to_str(title: str, normals: np.ndarray) -> str:
+    out  = title + "\n\n"
+    out += makeComment("num:     x:         y:         z:") + "\n"
+    out += _rows_to_str('%5d:' + ' %10.6f' * 3 + '\n', np.arange(len(normals)), *normals.T)
+    return out + "\n\n"
+
+def _faces_to_str(offsets: np.ndarray, vertIdxs: np.ndarray, uvIdxs: np.ndarray, props: np.ndarray, colors: np.ndarray, version: Model3doFileVersion) -> str:
+    numFaces = len(props)
+    out  = "FACES " + str(numFaces) + "\n\n"
+    out += makeComment(" num:  material:   type:  geo:  light:   tex:  extralight:  verts:") + "\n"
+
+    numColors = _num_color_columns(version)
+    if numColors == 1:
+        colorFormat = ' %.6f'
+    else:
+        colorFormat = '(' + '/'.join(['%.6f'] * numColors) + ')'
+    headFormat = '%6d:%10d  0x%04x%6d%8d%7d ' + colorFormat + '%8d  '
+
+    # Faces are formatted in groups of faces with the same number of vertices
+    rows   = np.empty(numFaces, dtype=object)
+    counts = np.diff(offsets)
+    colors = _color_columns(colors, version)
+    for n in np.unique(counts).tolist():
+        fidxs = np.flatnonzero(counts == n)
+        vidxs = offsets[fidxs, np.newaxis] + np.arange(n) # face vertex positions in vertIdxs and uvIdxs
+        vi = vertIdxs[vidxs]
+        ti = uvIdxs[vidxs]
+        rowFormat = headFormat + '%3d, %2d ' * n + '\n'
+        columns   = [fidxs, *props[fidxs].T, *[c[fidxs] for c in colors], np.full(len(fidxs), n)]
+        for i in range(n):
+            columns += [vi[:, i], ti[:, i]]
+        rows[fidxs] = list(map(rowFormat.__mod__, zip(*[c.tolist() for c in columns])))
+
+    return out + ''.join(rows.tolist()) + "\n\n"
+
+def _mesh_to_arrays(mesh: Union[Mesh3do, Mesh3doArrays]) -> Tuple[np.ndarray, ...]:
+    """
+    Returns mesh's vertices, vertex colors, uvs, normals, face offsets, face vertex idxs, face uv idxs,
+    face props (material idx, type, geometry, light and texture mode), face colors and face normals as arrays.
+    Float arrays are float64 so the values are formatted the same as from `Mesh3do`.
+    """
+    if isinstance(mesh, Mesh3doArrays):
+        props = np.column_stack((mesh.faceMaterialIdxs, mesh.faceTypes, mesh.faceGeometryModes, mesh.faceLightModes, mesh.faceTextureModes)).astype(np.int64)
+        return (mesh.vertices.astype(np.float64), mesh.vertexColors.astype(np.float64), mesh.uvs.astype(np.float64), mesh.normals.astype(np.float64),
+            mesh.faceOffsets, mesh.faceVertexIdxs, mesh.faceUvIdxs, props.reshape(-1, 5), mesh.faceColors.astype(np.float64), mesh.faceNormals.astype(np.float64))
+
+    def to_array(vectors, n: int) -> np.ndarray:
+        return np.fromiter(chain.from_iterable(vectors), dtype=np.float64, count=len(vectors) * n).reshape(-1, n)
+
+    faces    = mesh.faces
+    counts   = [len(f.vertexIdxs) for f in faces]
+    offsets  = np.zeros(len(faces) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    vertIdxs = np.fromiter(chain.from_iterable(f.vertexIdxs for f in faces), dtype=np.int64, count=offsets[-1])
+    uvIdxs   = np.fromiter(chain.from_iterable(f.uvIdxs[:n] for f, n in zip(faces, counts)), dtype=np.int64, count=offsets[-1])
+    props    = np.fromiter(chain.from_iterable((f.materialIdx, f.type, f.geometryMode, f.lightMode, f.textureMode) for f in faces), dtype=np.int64, count=len(faces) * 5).reshape(-1, 5)
+    return (to_array(mesh.vertices, 3), to_array(mesh.vertexColors, 4), to_array(mesh.uvs, 2), to_array(mesh.normals, 3),
+        offsets, vertIdxs, uvIdxs, props, to_array([f.color for f in faces], 4), to_array([f.normal for f in faces], 3))
+
+def _mesh_header(mesh: Union[Mesh3do, Mesh3doArrays]) -> Tuple[int, str, float, int, int, int]:
+    return (mesh.idx, mesh.name, mesh.radius, int(mesh.geometryMode), int(mesh.lightMode), int(mesh.textureMode))
+
+def _mesh_to_str(mesh: Union[Mesh3do, Mesh3doArrays], version: Model3doFileVersion) -> str:
+    """ Returns text block of `mesh` """
+    return _mesh_block_to_str(_mesh_header(mesh), _mesh_to_arrays(mesh), version)
+
+def _mesh_block_to_str(header: Tuple[int, str, float, int, int, int], arrays: Tuple[np.ndarray, ...], version: Model3doFileVersion) -> str:
+    """ Returns mesh text block from mesh `header` and `arrays` returned by `_mesh_to_arrays` """
+    idx, name, radius, geometryMode, lightMode, textureMode = header
+    vertices, vertexColors, uvs, normals, offsets, vertIdxs, uvIdxs, props, faceColors, faceNormals = arrays
+
+    out  = makeComment("Mesh definition") + "\n"
+    out += "MESH " + str(idx) + "\n\n"
+    out += "NAME " + str(name) + "\n\n"
+    out += "RADIUS " + _radius_to_str(radius) + "\n\n"
+    out += "GEOMETRYMODE " + str(geometryMode) + "\n"
+    out += "LIGHTINGMODE " + str(lightMode) + "\n"
+    out += "TEXTUREMODE " + str(textureMode) + "\n\n\n"
+
+    out += _vertices_to_str(vertices, vertexColors, version)
+    out += _tex_vertices_to_str(uvs)
+    out += _normals_to_str("VERTEX NORMALS", normals)
+    out += _faces_to_str(offsets, vertIdxs, uvIdxs, props, faceColors, version)
+    out += _normals_to_str("FACE NORMALS", faceNormals)
     return out
 
-def _write_faces(file: TextIO, faces: List[Mesh3doFace], version: Model3doFileVersion):
-    writeKeyValue(file, "faces", len(faces))
-    writeNewLine(file)
-
-    writeCommentLine(file, " num:  material:   type:  geo:  light:   tex:  extralight:  verts:")
-    face_normals: List[Vector3f] = []
-    for idx, face in enumerate(faces):
-        row  = '{:>6}:'.format(idx)
-        row += '{:>10}'.format(face.materialIdx)
-        row += '  0x{:04x}'.format(face.type)
-        row += '{:>6}'.format(face.geometryMode)
-        row += '{:>8}'.format(face.lightMode)
-        row += '{:>7}'.format(face.textureMode)
-        row += ' ' + _color_to_str(face.color, version, compact=False)
-        row += _face_vertx_to_str(face.vertexIdxs, face.uvIdxs)
-        writeLine(file, row)
-
-        face_normals.append(face.normal)
-    writeNewLine(file)
-    writeNewLine(file)
-
-    # write face normals
-    writeLine(file, "face normals".upper())
-    writeNewLine(file)
-
-    writeCommentLine(file, "num:     x:         y:         z:")
-    for idx, n in enumerate(face_normals):
-        row = '{:>5}:'.format(idx)
-        row += _vector_to_str(n)
-        writeLine(file, row)
-
-    writeNewLine(file)
-    writeNewLine(file)
-
-def _write_mesh(file: TextIO, mesh: Mesh3do, version: Model3doFileVersion):
-    writeCommentLine(file, "Mesh definition")
-    writeKeyValue(file, "mesh", mesh.idx)
-    writeNewLine(file)
-
-    writeKeyValue(file, "name", mesh.name)
-    writeNewLine(file)
-
-    writeKeyValue(file, "radius", _radius_to_str(mesh.radius))
-    writeNewLine(file)
-
-    writeKeyValue(file, "geometrymode", int(mesh.geometryMode))
-    writeKeyValue(file, "lightingmode", int(mesh.lightMode))
-    writeKeyValue(file, "texturemode", int(mesh.textureMode))
-    writeNewLine(file)
-    writeNewLine(file)
-
-    _write_vertices(file, mesh.vertices, mesh.vertexColors, version)
-    _write_tex_vertices(file, mesh.uvs)
-    _write_vert_normals(file, mesh.normals)
-    _write_faces(file, mesh.faces, version)
-
-def _write_section_geometry(file: TextIO, model: Model3do, version: Model3doFileVersion):
+def _map_ordered(pool: Executor, maxPending: int, fn: Callable, args: Iterable[Tuple]) -> Iterator:
+    """ Like `Executor.map` but submits next call only when there is less than `maxPending` calls pending """
+    pending = deque()
+    for a in args:
+        pending.append(pool.submit(fn, *a))
+        if len(pending) >= maxPending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def _write_section_geometry(file: TextIO, model: Model3do, version: Model3doFileVersion, pool: Optional[Executor] = None, workers: int = 1, makeMesh: Optional[Callable] = None):
+    file.write(_section_to_str(_write_section_geometry_header, model))
+    for num, geoset in enumerate(model.geosets):
+        file.write(_section_to_str(_write_geoset_header, num, geoset))
+        meshes = geoset.meshes if makeMesh is None else map(makeMesh, geoset.meshes)
+        if pool is not None and len(geoset.meshes) > 1:
+            # Mesh arrays are made in this process, so workers receive arrays instead of mesh objects.
+            # The number of pending meshes is bounded, so only a few mesh arrays are in memory at once.
+            blocks = _map_ordered(pool, 2 * workers, _mesh_block_to_str, ((_mesh_header(m), _mesh_to_arrays(m), version) for m in meshes))
+        else:
+            blocks = (_mesh_to_str(m, version) for m in meshes)
+        for block in blocks:
+            file.write(block)
+
+def _write_section_geometry_header(file: TextIO, model: Model3do):
     writeSectionTitle(file, "geometrydef")
 
     writeCommentLine(file, "Object radius")
@@ -207,18 +255,15 @@ def _write_section_geometry(file: TextIO, model: Model3do, version: Model3doFile
     writeKeyValue(file, "geosets", len(model.geosets))
     writeNewLine(file)
 
-    for num, geoset in enumerate(model.geosets):
-        writeCommentLine(file, "Geometry Set definition")
-        writeKeyValue(file, "geoset", num)
-        writeNewLine(file)
-
-        writeCommentLine(file, "Number of Meshes")
-        writeKeyValue(file, "meshes", len(geoset.meshes))
-        writeNewLine(file)
-        writeNewLine(file)
+def _write_geoset_header(file: TextIO, num: int, geoset: Model3doGeoSet):
+    writeCommentLine(file, "Geometry Set definition")
+    writeKeyValue(file, "geoset", num)
+    writeNewLine(file)
 
-        for mesh in geoset.meshes:
-            _write_mesh(file, mesh, version)
+    writeCommentLine(file, "Number of Meshes")
+    writeKeyValue(file, "meshes", len(geoset.meshes))
+    writeNewLine(file)
+    writeNewLine(file)
 
 def _write_section_hierarchydef(file: TextIO, model: Model3do):
     writeSectionTitle(file, "hierarchydef")
@@ -20,12 +20,13 @@
 # SOFTWARE.
 
 import bpy, bmesh, mathutils, math, re
+import numpy as np
 
 from pathlib import Path
-from sith.material import ColorMap, importMat
+from sith.material import ColorMap, getImageTextureSize, importMat
 from sith.types import Vector3f, Vector4f
 from sith.utils import *
-from typing import List, Optional, Union
+from typing import List, NamedTuple, Optional, Tuple, Union, TYPE_CHECKING
 
 from .model3do import (
     FaceType,
@@ -34,57 +35,215 @@ from .model3do import (
     TextureMode
 )
 
-k3doFaceExtraLight = "3do_face_extra_light"
-k3doFaceType       = "3do_face_type"
-k3doGeometryMode   = "3do_geometry_mode"
-k3doLightingMode   = "3do_lighting_mode"
-k3doTextureMode    = "3do_texture_mode"
-kDefaultFaceColor  = Vector4f(0.0, 0.0, 0.0, 1.0)  # Black color
-kGModel3do         = "Model3do"
-kImEulerOrder      = "YXZ"                         # Infernal machine euler orientation order Y - roll, X - pitch, Z - yaw
-kMeshRadius        = "MESH_RADIUS_"
-kModelRadius       = "MODEL_RADIUS_"
-kNameOrderPrefix   = "no"
-
+if TYPE_CHECKING:
+    from sith.cache import AssetCache, DiskCache
+
+k3doFaceExtraLight     = "3do_face_extra_light"
+k3doFaceType           = "3do_face_type"
+k3doGeometryMode       = "3do_geometry_mode"
+k3doLightingMode       = "3do_lighting_mode"
+k3doTextureMode        = "3do_texture_mode"
+kDefaultFaceColor      = Vector4f(0.0, 0.0, 0.0, 1.0)  # Black color
+kGModel3do             = "Model3do"
+kImEulerOrder          = "YXZ"                         # Infernal machine euler orientation order Y - roll, X - pitch, Z - yaw
+kMeshInstanceKey       = "sith_mesh3do_instance_key"
+kMeshInstanceHash      = "sith_mesh3do_instance_hash"
+kMeshRadius            = "MESH_RADIUS_"
+kModelFilePath         = "sith_model3do_file"
+kModelGeoset           = "sith_model3do_geoset"
+kModelNumGeosets       = "sith_model3do_num_geosets"
+kModelRadius           = "MODEL_RADIUS_"
+kModelUvAbsolute       = "sith_model3do_uv_absolute"
+kModelVertexColors     = "sith_model3do_vertex_colors"
+kNameOrderPrefix       = "no"
+kNodeGeosetMeshes      = "sith_model3do_geoset_meshes"
+kRadiusSphereMesh      = "SITH_RADIUS_SPHERE"
+
+
+# 3DO face attributes are stored in typed BMesh face layers. Int layers store the attribute
+# value biased by 1 and float layers store the extra light color channel minus its default value,
+# so the value 0 of faces which were added after the layer was made maps to the default value.
+# Files made by older versions of addon stored the attributes in string layers, these are migrated on first access.
+k3doFaceIntLayers       = (k3doFaceType, k3doGeometryMode, k3doLightingMode, k3doTextureMode)
+k3doFaceExtraLightRGBA  = tuple(k3doFaceExtraLight + c for c in ('_r', '_g', '_b', '_a'))
+k3doFaceIntDefaults     = (FaceType.Normal.value, GeometryMode.Texture.value, LightMode.Gouraud.value, TextureMode.PerspectiveCorrected.value)
+
+class Mesh3doFaceAttributes(NamedTuple):
+    """ 3DO attributes of mesh faces as arrays """
+    types: np.ndarray         # int32 array of FaceType values
+    geometryModes: np.ndarray # int32 array of GeometryMode values
+    lightModes: np.ndarray    # int32 array of LightMode values
+    textureModes: np.ndarray  # int32 array of TextureMode values
+    extraLights: np.ndarray   # float32 array of shape (n, 4) of extra light colors
 
 def bmFaceSeqGetLayerString(faces: bmesh.types.BMFaceSeq, name: str, makeLayer: bool = True) -> Optional[bmesh.types.BMLayerItem]:
     return faces.layers.string.get(name) or (faces.layers.string.new(name) if makeLayer else None)
 
-def __bmface_get_int_property(face: bmesh.types.BMFace, tag: bmesh.types.BMLayerItem, default: int) -> int:
-    if tag:
-        v = face[tag]
-        if len(v) > 0:
-            return int(v)
+def _parse_string_layer_value(v: bytes, default):
+    if len(v) == 0:
+        return default
+    if isinstance(default, tuple):
+        return tuple(float(c) for c in v.decode('utf8').split(','))
+    return int(v)
+
+def _bm_migrate_3do_string_layers(bm: bmesh.types.BMesh) -> bool:
+    """ Converts 3DO face attribute string layers of `bm` to typed layers. Returns True if any layer was converted. """
+    migrated = False
+    for name, default in zip(k3doFaceIntLayers + (k3doFaceExtraLight,), k3doFaceIntDefaults + (tuple(kDefaultFaceColor),)):
+        slayer = bm.faces.layers.string.get(name)
+        if slayer is None:
+            continue
+        values = [_parse_string_layer_value(face[slayer], default) for face in bm.faces]
+        bm.faces.layers.string.remove(slayer)
+        if name == k3doFaceExtraLight:
+            for i, lname in enumerate(k3doFaceExtraLightRGBA):
+                layer = bm.faces.layers.float.get(lname) or bm.faces.layers.float.new(lname)
+                for face, v in zip(bm.faces, values):
+                    face[layer] = v[i] - kDefaultFaceColor[i]
+        else:
+            layer = bm.faces.layers.int.get(name) or bm.faces.layers.int.new(name)
+            for face, v in zip(bm.faces, values):
+                face[layer] = v + 1
+        migrated = True
+    return migrated
+
+def meshMigrate3doFaceLayers(mesh: bpy.types.Mesh) -> bool:
+    """
+    Converts 3DO face attributes of `mesh` stored in string layers by older versions of addon to typed layers.
+    Returns True if `mesh` was migrated.
+    """
+    if not any(name in mesh.polygon_layers_string for name in k3doFaceIntLayers + (k3doFaceExtraLight,)):
+        return False
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    _bm_migrate_3do_string_layers(bm)
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.update()
+    return True
+
+def meshGet3doFaceAttributes(mesh: bpy.types.Mesh) -> Mesh3doFaceAttributes:
+    """
+    Returns 3DO attributes of all `mesh` faces.
+    Faces without set attribute get the default attribute value.
+    """
+    meshMigrate3doFaceLayers(mesh)
+    num_faces = len(mesh.polygons)
+    int_attrs = []
+    for name, default in zip(k3doFaceIntLayers, k3doFaceIntDefaults):
+        values = np.zeros(num_faces, dtype=np.int32)
+        layer  = mesh.polygon_layers_int.get(name)
+        if layer:
+            layer.data.foreach_get('value', values)
+        values -= 1
+        values[values < 0] = default
+        int_attrs.append(values)
+
+    extra_lights = np.empty((num_faces, 4), dtype=np.float32)
+    for i, name in enumerate(k3doFaceExtraLightRGBA):
+        layer = mesh.polygon_layers_float.get(name)
+        if layer:
+            values = np.empty(num_faces, dtype=np.float32)
+            layer.data.foreach_get('value', values)
+            extra_lights[:, i] = values + kDefaultFaceColor[i]
+        else:
+            extra_lights[:, i] = kDefaultFaceColor[i]
+    return Mesh3doFaceAttributes(*int_attrs, extra_lights)
+
+def meshSet3doFaceAttributes(mesh: bpy.types.Mesh, attrs: Mesh3doFaceAttributes):
+    """ Stores 3DO attributes `attrs` of all `mesh` faces in typed face layers. """
+    for name, values in zip(k3doFaceIntLayers, attrs[:4]):
+        layer = mesh.polygon_layers_int.get(name) or mesh.polygon_layers_int.new(name=name)
+        layer.data.foreach_set('value', np.asarray(values, dtype=np.int32) + 1)
+
+    extra_lights = np.asarray(attrs.extraLights, dtype=np.float32).reshape(-1, 4)
+    for i, name in enumerate(k3doFaceExtraLightRGBA):
+        layer = mesh.polygon_layers_float.get(name) or mesh.polygon_layers_float.new(name=name)
+        layer.data.foreach_set('value', np.ascontiguousarray(extra_lights[:, i] - kDefaultFaceColor[i]))
+
+def _bm_face_get_int(face: bmesh.types.BMFace, layer: Optional[bmesh.types.BMLayerItem], default: int) -> int:
+    if layer:
+        v = face[layer]
+        if v > 0:
+            return v - 1
     return default
 
-def __bmface_set_int_property(face: bmesh.types.BMFace, tag: bmesh.types.BMLayerItem, value: int):
-    face[tag] = str(int(value)).encode('utf-8')
+def _bm_get_extra_light_layers(bm: bmesh.types.BMesh, makeLayers: bool = False) -> Tuple[Optional[bmesh.types.BMLayerItem], ...]:
+    layers = bm.faces.layers.float
+    return tuple(layers.get(name) or (layers.new(name) if makeLayers else None) for name in k3doFaceExtraLightRGBA)
 
-def __bmface_get_vector4_property(face: bmesh.types.BMFace, tag: bmesh.types.BMLayerItem, default: Vector4f) -> Vector4f:
-    if tag:
-        v = face[tag]
-        if len(v) > 0:
-            return Vector4f(*[float(c) for c in v.decode('utf8').split(',')])
-    return default
+def _bm_face_get_extra_light(face: bmesh.types.BMFace, layers: Tuple[Optional[bmesh.types.BMLayerItem], ...]) -> Vector4f:
+    if not all(layers):
+        return kDefaultFaceColor
+    return Vector4f(*(face[layer] + default for layer, default in zip(layers, kDefaultFaceColor)))
+
+def _bm_face_set_extra_light(face: bmesh.types.BMFace, layers: Tuple[bmesh.types.BMLayerItem, ...], color: Vector4f):
+    for layer, c, default in zip(layers, color, kDefaultFaceColor):
+        face[layer] = c - default
+
+class BMFace3doLayers:
+    """
+    Handles of 3DO face attribute layers of `BMesh`.
+    Layers are looked up once, use one instance to get or set attributes of many faces of the same `BMesh`.
+    If `makeLayers` is True missing layers are made.
+    Note, string layers made by older versions of addon are not migrated, see `bmMeshInit3doLayers`.
+    """
+    __slots__ = ('type', 'geo_mode', 'light_mode', 'tex_mode', 'extra_light')
+
+    def __init__(self, bm: bmesh.types.BMesh, makeLayers: bool = False):
+        layers = bm.faces.layers.int
+        self.type, self.geo_mode, self.light_mode, self.tex_mode = \
+            (layers.get(name) or (layers.new(name) if makeLayers else None) for name in k3doFaceIntLayers)
+        self.extra_light = _bm_get_extra_light_layers(bm, makeLayers)
+
+    _get_int = staticmethod(_bm_face_get_int)
 
-def __bmface_set_vector4_property(face: bmesh.types.BMFace, tag: bmesh.types.BMLayerItem, vector: Vector4f):
-    face[tag] = str(','.join(str(c) for c in vector)).encode('utf-8')
+    def getType(self, face: bmesh.types.BMFace) -> FaceType:
+        return FaceType(self._get_int(face, self.type, k3doFaceIntDefaults[0]))
 
-def bmMeshInit3doLayers(bm: bmesh.types.BMesh):
-    bmFaceSeqGetLayerString(bm.faces, k3doFaceType,       makeLayer=True)
-    bmFaceSeqGetLayerString(bm.faces, k3doGeometryMode,   makeLayer=True)
-    bmFaceSeqGetLayerString(bm.faces, k3doLightingMode,   makeLayer=True)
-    bmFaceSeqGetLayerString(bm.faces, k3doTextureMode,    makeLayer=True)
-    bmFaceSeqGetLayerString(bm.faces, k3doFaceExtraLight, makeLayer=True)
+    def setType(self, face: bmesh.types.BMFace, t: FaceType):
+        face[self.type] = int(t.value) + 1
+
+    def getGeometryMode(self, face: bmesh.types.BMFace) -> GeometryMode:
+        return GeometryMode(self._get_int(face, self.geo_mode, k3doFaceIntDefaults[1]))
+
+    def setGeometryMode(self, face: bmesh.types.BMFace, geo: GeometryMode):
+        face[self.geo_mode] = int(geo) + 1
+
+    def getLightMode(self, face: bmesh.types.BMFace) -> LightMode:
+        return LightMode(self._get_int(face, self.light_mode, k3doFaceIntDefaults[2]))
+
+    def setLightMode(self, face: bmesh.types.BMFace, lm: LightMode):
+        face[self.light_mode] = int(lm) + 1
+
+    def getTextureMode(self, face: bmesh.types.BMFace) -> TextureMode:
+        return TextureMode(self._get_int(face, self.tex_mode, k3doFaceIntDefaults[3]))
+
+    def setTextureMode(self, face: bmesh.types.BMFace, tex: TextureMode):
+        face[self.tex_mode] = int(tex) + 1
+
+    def getExtraLight(self, face: bmesh.types.BMFace) -> Vector4f:
+        return _bm_face_get_extra_light(face, self.extra_light)
+
+    def setExtraLight(self, face: bmesh.types.BMFace, color: Vector4f):
+        _bm_face_set_extra_light(face, self.extra_light, color)
+
+def bmMeshInit3doLayers(bm: bmesh.types.BMesh) -> BMFace3doLayers:
+    """
+    Makes missing 3DO face attribute layers of `bm` and migrates string layers made by older versions of addon.
+    Returns the handles of layers.
+    """
+    _bm_migrate_3do_string_layers(bm)
+    layers = BMFace3doLayers(bm, makeLayers=True)
     bm.faces.layers.int.verify()
+    return layers
 
 def bmFaceGetType(face: bmesh.types.BMFace, bm: bmesh.types.BMesh) -> FaceType:
     """
     Returns the value of 3DO polygon face type stored in layer of `BMFace`.
     If type layer doesn't exists it returns 0.
     """
-    tag = bmFaceSeqGetLayerString(bm.faces, k3doFaceType, makeLayer=False)
-    return FaceType(__bmface_get_int_property(face, tag, 0))
+    return FaceType(_bm_face_get_int(face, bm.faces.layers.int.get(k3doFaceType), k3doFaceIntDefaults[0]))
 
 def bmFaceSetType(face: bmesh.types.BMFace, bm: bmesh.types.BMesh, t: FaceType):
     """
@@ -92,16 +251,14 @@ def bmFaceSetType(face: bmesh.types.BMFace, bm: bmesh.types.BMesh, t: FaceType):
     Note: Layer must be already initialized at this point.
           Invoke `bmMeshInit3doLayers` to initialize layer prior to modify any face of `bm`
     """
-    tag = bmFaceSeqGetLayerString(bm.faces, k3doFaceType, makeLayer=False)
-    __bmface_set_int_property(face, tag, t)
+    face[bm.faces.layers.int[k3doFaceType]] = int(t.value) + 1
 
 def bmFaceGetGeometryMode(face: bmesh.types.BMFace, bmesh: bmesh.types.BMesh) -> GeometryMode:
     """
     Returns the geometry mode of 3DO polygon face stored in layer of `BMFace`.
     If type layer doesn't exists it returns `GeometryMode.Texture`.
     """
-    tag = bmFaceSeqGetLayerString(bmesh.faces, k3doGeometryMode, makeLayer=False)
-    return GeometryMode(__bmface_get_int_property(face, tag, GeometryMode.Texture))
+    return GeometryMode(_bm_face_get_int(face, bmesh.faces.layers.int.get(k3doGeometryMode), k3doFaceIntDefaults[1]))
 
 def bmFaceSetGeometryMode(face: bmesh.types.BMFace, bmesh: bmesh.types.BMesh, geo: GeometryMode):
     """
@@ -109,16 +266,14 @@ def bmFaceSetGeometryMode(face: bmesh.types.BMFace, bmesh: bmesh.types.BMesh, ge
     Note: Layer must be already initialized at this point.
           Invoke `bmMeshInit3doLayers` to initialize layer prior to modify any face of `bm`.
     """
-    tag = bmFaceSeqGetLayerString(bmesh.faces, k3doGeometryMode, makeLayer=False)
-    __bmface_set_int_property(face, tag, geo)
+    face[bmesh.faces.layers.int[k3doGeometryMode]] = int(geo) + 1
 
 def bmFaceGetLightMode(face: bmesh.types.BMFace, bmesh: bmesh.types.BMesh) -> LightMode:
     """
     Returns the light mode of 3DO polygon face stored in layer of `BMFace`.
     If type layer doesn't exists it returns `LightMode.Gouraud`.
     """
-    tag = bmFaceSeqGetLayerString(bmesh.faces, k3doLightingMode, makeLayer=False)
-    return LightMode(__bmface_get_int_property(face, tag, LightMode.Gouraud))
+    return LightMode(_bm_face_get_int(face, bmesh.faces.layers.int.get(k3doLightingMode), k3doFaceIntDefaults[2]))
 
 def bmFaceSetLightMode(face: bmesh.types.BMFace, bmesh: bmesh.types.BMesh, lm: LightMode):
     """
@@ -126,16 +281,14 @@ def bmFaceSetLightMode(face: bmesh.types.BMFace, bmesh: bmesh.types.BMesh, lm: L
     Note: Layer must be already initialized at this point.
           Invoke `bmMeshInit3doLayers` to initialize layer prior to modify any face of `bm`.
     """
-    tag = bmFaceSeqGetLayerString(bmesh.faces, k3doLightingMode, makeLayer=False)
-    __bmface_set_int_property(face, tag, lm)
+    face[bmesh.faces.layers.int[k3doLightingMode]] = int(lm) + 1
 
 def bmFaceGetTextureMode(face: bmesh.types.BMFace, bmesh: bmesh.types.BMesh) -> TextureMode:
     """
     Returns the texture mode of 3DO polygon face stored in layer of `BMFace`.
     If type layer doesn't exists it returns `TextureMode.PerspectiveCorrected`.
     """
-    tag = bmFaceSeqGetLayerString(bmesh.faces, k3doTextureMode, makeLayer=False)
-    return TextureMode(__bmface_get_int_property(face, tag, TextureMode.PerspectiveCorrected))
+    return TextureMode(_bm_face_get_int(face, bmesh.faces.layers.int.get(k3doTextureMode), k3doFaceIntDefaults[3]))
 
 def bmFaceSetTextureMode(face: bmesh.types.BMFace, bmesh: bmesh.types.BMesh, tex: TextureMode):
     """
@@ -143,16 +296,14 @@ def bmFaceSetTextureMode(face: bmesh.types.BMFace, bmesh: bmesh.types.BMesh, tex
     Note: Layer must be already initialized at this point.
           Invoke `bmMeshInit3doLayers` to initialize layer prior to modify any face of `bm`.
     """
-    tag = bmFaceSeqGetLayerString(bmesh.faces, k3doTextureMode, makeLayer=False)
-    __bmface_set_int_property(face, tag, tex)
+    face[bmesh.faces.layers.int[k3doTextureMode]] = int(tex) + 1
 
 def bmFaceGetExtraLight(face: bmesh.types.BMFace, bmesh: bmesh.types.BMesh) -> Vector4f:
     """
     Returns the extra light color of 3DO polygon face stored in layer of `BMFace`.
     If type layer doesn't exists it returns `kDefaultFaceColor`.
     """
-    tag = bmFaceSeqGetLayerString(bmesh.faces, k3doFaceExtraLight, makeLayer=False)
-    return __bmface_get_vector4_property(face, tag, kDefaultFaceColor)
+    return _bm_face_get_extra_light(face, _bm_get_extra_light_layers(bmesh))
 
 def bmFaceSetExtraLight(face: bmesh.types.BMFace, bmesh: bmesh.types.BMesh, color: Vector4f):
     """
@@ -160,8 +311,8 @@ def bmFaceSetExtraLight(face: bmesh.types.BMFace, bmesh: bmesh.types.BMesh, colo
     Note: Layer must be already initialized at this point.
           Invoke `bmMeshInit3doLayers` to initialize layer prior to modify any face of `bm`.
     """
-    tag = bmFaceSeqGetLayerString(bmesh.faces, k3doFaceExtraLight, makeLayer=False)
-    __bmface_set_vector4_property(face, tag, color)
+    _bm_face_set_extra_light(face, _bm_get_extra_light_layers(bmesh), color)
+
 
 def makeOrderedName(name: str, order: int, maxOrder: int) -> str:
     padding = len(str(maxOrder))
@@ -184,6 +335,12 @@ def _get_scene_obj(name: str) -> Optional[bpy.types.Object]:
     except:
         return None
 
+def getModel3doBaseObj(obj: Optional[bpy.types.Object]) -> Optional[bpy.types.Object]:
+    """ Returns the base object of imported 3DO model `obj` belongs to or None if `obj` is not part of imported model. """
+    while obj is not None and kModelFilePath not in obj:
+        obj = obj.parent
+    return obj
+
 def getModelRadiusObj(obj: bpy.types.Object) -> Optional[bpy.types.Object]:
     return _get_scene_obj(kModelRadius + stripOrderPrefix(obj.name))
 
@@ -314,7 +471,7 @@ def objGeometryMode(obj: bpy.types.Object) -> GeometryMode:
         return GeometryMode.Texture
     raise ValueError(f'Unknown draw type {dt}')
 
-def importMaterials(mat_names: List[Union[Path, str]], search_paths: List[Union[Path, str]], cmp: ColorMap):
+def importMaterials(mat_names: List[Union[Path, str]], search_paths: List[Union[Path, str]], cmp: ColorMap, cache: Optional[Union['AssetCache', 'DiskCache']] = None, maxTexSize: int = 0):
     def skip_loading_mat(mat):
         for s in mat.texture_slots:
             if s is not None and s.texture is not None:
@@ -329,7 +486,7 @@ def importMaterials(mat_names: List[Union[Path, str]], search_paths: List[Union[
             mat_path = getFilePathInDir(name, path)
             if mat_path is not None:
                 try:
-                    importMat(mat_path, cmp)
+                    importMat(mat_path, cmp, cache, maxTexSize)
                     break
                 except Exception as e:
                     print("Warning: Couldn't load material: ", mat_path)
@@ -0,0 +1,78 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from pathlib import Path
+from typing import Dict, Set, Union
+from .tokenizer import makeTokenizer, Tokenizer
+
+class LazySections:
+    """
+    Mixin for objects loaded from sectioned text file (3DO, KEY),
+    which parses file section only when section's data is first accessed.
+    File is pre-scanned for section positions, and when section is requested
+    the file is reopened and only the requested section is parsed by `_parse_lazy_section`.
+    """
+    def _init_lazy_sections(self, filePath: Union[Path, str]):
+        self._lazy_path: Union[Path, str] = filePath
+        self._lazy_parsed: Set[str]       = set()
+        with open(filePath, 'rb') as f, makeTokenizer(f) as tok:
+            self._lazy_sections: Dict[str, int] = tok.findSections()
+
+    @property
+    def sections(self) -> Dict[str, int]:
+        """ Returns file sections and their positions in file """
+        return self._lazy_sections
+
+    def isSectionLoaded(self, section: str) -> bool:
+        return section.upper() in self._lazy_parsed
+
+    def loadSection(self, section: str):
+        """ Parses `section` if it wasn't parsed yet """
+        section = section.upper()
+        if section in self._lazy_parsed:
+            return
+
+        self._lazy_parsed.add(section)
+        pos = self._lazy_sections.get(section)
+        if pos is None:
+            return # file doesn't have section
+
+        with open(self._lazy_path, 'rb') as f, makeTokenizer(f) as tok:
+            tok.seek(pos)
+            self._parse_lazy_section(tok, section)
+
+    def _parse_lazy_section(self, tok: Tokenizer, section: str):
+        raise NotImplementedError
+
+def lazySectionProperty(prop: property, section: str) -> property:
+    """
+    Makes property of `LazySections` subclass, which loads `section` before
+    getting or setting the value of base class property `prop`.
+    """
+    def fget(self):
+        self.loadSection(section)
+        return prop.fget(self)
+
+    def fset(self, value):
+        self.loadSection(section)
+        prop.fset(self, value)
+
+    return property(fget, fset, doc=prop.__doc__)
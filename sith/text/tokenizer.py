@@ -19,8 +19,11 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import bisect, io, mmap, re, time, warnings
+import numpy as np
+
 from enum import Enum
-from typing import Callable, Tuple, TextIO
+from typing import BinaryIO, Callable, Dict, Optional, Tuple, TextIO, Union
 from ..types.vector import *
 
 class TokenType(Enum):
@@ -35,6 +38,8 @@ class TokenType(Enum):
     Punctuator = 9
 
 class Token:
+    __slots__ = ('t', 'v', 'file_name', 'begin_line', 'begin_column', 'end_line', 'end_column')
+
     def __init__(self, t: TokenType = TokenType.Invalid):
         self.t = t
         self.v = ""
@@ -134,6 +139,9 @@ class Token:
             raise TypeError("Token type is not float number")
         return float(self.value)
 
+# Punctuators separating numbers in a numeric table row
+_row_separators = (',', '/', '(', ')')
+
 def _ctoi(c: str) -> int:
     if type(c) == type(""):
         return ord(c)
@@ -160,6 +168,14 @@ class Tokenizer:
         self.current_ch = self._read_ch()
         self.next_ch    = self._read_ch()
 
+    def __enter__(self) -> 'Tokenizer':
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        pass
 
     def getToken(self) -> Token:
         self._skip_whitespace()
@@ -286,6 +302,49 @@ class Tokenizer:
 
         return Vector4f(x,y,z,w)
 
+    def getNumericRows(self, numRows: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Reads `numRows` lines of numeric table rows in format: `<idx>: <num> <num> ...`.
+        Punctuators ',', '/', '(' and ')' between numbers are skipped.
+        Returns flat array of all row numbers including row index and array of `numRows + 1` offsets to the start of each row.
+        """
+        values  = []
+        offsets = [0]
+        report_eol = self.report_eol
+        try:
+            for _ in range(numRows):
+                self.report_eol = False
+                values.append(self.getIntNumber())
+                self.assertPunctuator(':')
+
+                self.report_eol = True
+                t = self.getToken()
+                while t.type != TokenType.EOL and t.type != TokenType.EOF:
+                    if t.type == TokenType.HexInteger:
+                        values.append(t.toIntNumber())
+                    elif t.type == TokenType.Integer or t.type == TokenType.Float:
+                        values.append(t.toFloatNumber())
+                    elif t.type != TokenType.Punctuator or t.value not in _row_separators:
+                        raise AssertionError(f"Expected number, found '{t.value}'! line: {self.line} column: {self.column}")
+                    t = self.getToken()
+                offsets.append(len(values))
+        finally:
+            self.report_eol = report_eol
+        return (np.array(values, dtype=np.float64), np.array(offsets, dtype=np.int64))
+
+    def getNumericTable(self, numRows: int, numColumns: int) -> np.ndarray:
+        """
+        Reads `numRows` lines of numeric table rows in format: `<idx>: <num> <num> ...`
+        where each row has exactly `numColumns` numbers after the row index.
+        Returns 2D array of shape (numRows, numColumns + 1), the first column is row index.
+        """
+        values, offsets = self.getNumericRows(numRows)
+        widths = np.diff(offsets)
+        if numRows > 0 and np.any(widths != numColumns + 1):
+            row = int(np.argmax(widths != numColumns + 1))
+            raise AssertionError(f"Expected {numColumns} numbers in table row {row}, found {widths[row] - 1}! line: {self.line} column: {self.column}")
+        return values.reshape((numRows, numColumns + 1))
+
     def assertIdentifier(self, id: str):
         t = self.getToken()
         if t.type != TokenType.Identifier or t.value.lower() != id.lower():
@@ -451,3 +510,482 @@ class Tokenizer:
                     return token
             else:
                 token.value += self.current_ch
+
+
+
+
+# Whitespace and comments are skipped in front of every token.
+# Note, comment must span to the end of line so backtracking can't match anything inside the comment.
+_ws_pattern     = r'\s*(?:#[^\n]*(?![^\n])\s*)*'
+_ws_eol_pattern = r'[^\S\n]*(?:#[^\n]*(?![^\n])[^\S\n]*)*'
+
+# Number literal without hex prefix. Note, the `.#` case fixes problems with '.#QNAN0'
+_num_pattern   = r'-?(?:(?!0[xX])[0-9]+(?:\.(?=[0-9#])[0-9]*)?|\.[0-9]+)(?:[eE][-+]?[0-9]*)?'
+_int_pattern   = r'-?(?!0[xX])[0-9]+(?![0-9eE]|\.[0-9#])'
+
+# Identifier pattern. Bytes regex matches only ASCII word characters,
+# so in binary mode any non-ASCII byte is treated as part of identifier to not split multi-byte UTF-8 characters.
+_ident_patterns = {
+    # binary
+    False : r'[^\W\d]\w*',
+    True  : r'(?:[^\W\d]|[\x80-\xff])(?:\w|[\x80-\xff])*',
+}
+
+def _token_pattern(ident: str) -> str:
+    return r'(?:(' + ident + r')|(-?0[xX][0-9A-Fa-f]*)|(' + _int_pattern + ')|(' + _num_pattern + r')|([!#-/:-@\[-`{-~]))?'
+
+def _compile_token_patterns(ws: str, binary: bool):
+    def compile(pattern: str):
+        return re.compile(pattern.encode('ascii') if binary else pattern)
+    num  = '(' + _num_pattern + ')'
+    inum = '(' + _int_pattern + ')'
+    return (
+        compile(ws + _token_pattern(_ident_patterns[binary])),
+        compile(ws + num),
+        compile(ws + inum),
+        compile(ws + inum + ws + ',' + ws + inum),
+        compile(ws + num + ws + num),
+        compile(ws + num + ws + num + ws + num),
+        compile(ws + num + ws + num + ws + num + ws + num),
+        compile(ws + r'\(' + ws + num + ws + '/' + ws + num + ws + '/' + ws + num + ws + '/' + ws + num + ws + r'\)'),
+        compile(ws + r'(\S*)'),
+        compile(ws),
+        compile(r'[^"\\\n]*') # string literal chunk
+    )
+
+_token_patterns = {
+    # (binary, report_eol)
+    (False, False) : _compile_token_patterns(_ws_pattern, binary=False),
+    (False, True)  : _compile_token_patterns(_ws_eol_pattern, binary=False),
+    (True, False)  : _compile_token_patterns(_ws_pattern, binary=True),
+    (True, True)   : _compile_token_patterns(_ws_eol_pattern, binary=True),
+}
+
+# Consecutive numeric table rows, each row must be single line in format: `<idx>: <num> <num> ...`
+_rows_pattern    = _ws_pattern + r'(?:-?[0-9]+[^\S\n]*:[^\n#]*' + _ws_pattern + ')*'
+_comment_pattern = r'#[^\n]*'
+_rows_patterns = {
+    # binary
+    False : (re.compile(_rows_pattern), re.compile(_comment_pattern)),
+    True  : (re.compile(_rows_pattern.encode('ascii')), re.compile(_comment_pattern.encode('ascii'))),
+}
+
+# Section header at the beginning of line: `SECTION: <name>`
+_section_pattern = r'^[^\S\n]*SECTION[^\S\n]*:[^\S\n]*([^\n#]*)'
+_section_patterns = {
+    # binary
+    False : re.compile(_section_pattern, re.IGNORECASE | re.MULTILINE),
+    True  : re.compile(_section_pattern.encode('ascii'), re.IGNORECASE | re.MULTILINE),
+}
+
+# Token type by the index of matched group in _token_pattern
+_token_group_types = (None, TokenType.Identifier, TokenType.HexInteger, TokenType.Integer, TokenType.Float, TokenType.Punctuator)
+
+_str_escapes   = { '\n': '', '\'': '\'', '"': '"', '\\': '\\', 'n': '\n', 't': '\t' }
+_bytes_escapes = { k.encode('ascii'): v.encode('ascii') for k, v in _str_escapes.items() }
+
+def _decode_utf8(b: bytes) -> str:
+    return b.decode('utf-8')
+
+class TokenizerCounters:
+    """
+    Counters of `BufferTokenizer` position bookkeeping.
+    Used to measure how many line/column lookups the lazy positions save.
+    """
+    def __init__(self):
+        self.tokens          = 0   # number of made tokens
+        self.positionLookups = 0   # number of line and column lookups
+        self.lineIndexBuilds = 0   # number of built newline indices
+        self.lineIndexTime   = 0.0 # time spent building newline index in seconds
+
+    def __repr__(self):
+        return f'tokens: {self.tokens} position lookups: {self.positionLookups} line index builds: {self.lineIndexBuilds} ({self.lineIndexTime:.3f} sec)'
+
+class _OffsetToken(Token):
+    """
+    Token which stores only the buffer offsets of token.
+    Line and column are resolved by the tokenizer when first accessed.
+    Note, positions can be resolved only while tokenizer's buffer is open.
+    """
+    __slots__ = ('_tok', '_begin', '_end')
+
+    def __init__(self, t: TokenType, v: str, tok: 'BufferTokenizer', begin: int, end: int):
+        self.t = t
+        self.v = v
+        self.file_name = ""
+        self._tok      = tok
+        self._begin    = begin
+        self._end      = end
+
+    def __getattr__(self, name: str):
+        # Called only for the attributes which aren't set yet
+        if name == 'begin_line':
+            v = self._tok._get_line(self._begin)
+        elif name == 'begin_column':
+            v = self._tok._get_column(self._begin)
+        elif name == 'end_line':
+            v = self._tok._get_line(self._end)
+        elif name == 'end_column':
+            v = self._tok._get_column(self._end)
+        else:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        setattr(self, name, v)
+        return v
+
+class BufferTokenizer(Tokenizer):
+    """
+    Tokenizer which scans the whole text buffer at once.
+    Buffer can be decoded `str` or raw ASCII/UTF-8 bytes-like object e.g.: `bytes` or `mmap`.
+    Tokens are matched with precompiled regular expressions and sliced out of the buffer,
+    numbers and vectors are parsed without constructing intermediate `Token` objects.
+    Binary buffer is decoded only for the string values of requested tokens.
+
+    Only buffer positions are tracked while scanning. Line and column are looked up by bisecting
+    the index of newline positions, which is built on the first lookup e.g. when error is raised.
+    If `lazyPositions` is True the returned tokens store only buffer offsets and resolve their
+    line and column on first access, otherwise they are resolved when token is made.
+    """
+    def __init__(self, buffer: Union[str, bytes, mmap.mmap], lazyPositions: bool = True):
+        self.buf           = buffer
+        self.pos           = 0
+        self.lazyPositions = lazyPositions
+        self.counters      = TokenizerCounters()
+        self._binary       = not isinstance(buffer, str)
+        self._line_index   = None # buffer positions of newlines
+        self.report_eol    = False
+
+        if self._binary:
+            self._nl      = b'\n'
+            self._quote   = b'"'
+            self._escapes = _bytes_escapes
+            self._decode  = _decode_utf8
+            self._space   = b' '
+            self._colon   = b':'
+            self._hex_x   = b'x'
+            self._row_seps_table = bytes.maketrans(b',/()', b'    ')
+        else:
+            self._nl      = '\n'
+            self._quote   = '"'
+            self._escapes = _str_escapes
+            self._decode  = str
+            self._space   = ' '
+            self._colon   = ':'
+            self._hex_x   = 'x'
+            self._row_seps_table = str.maketrans(',/()', '    ')
+        self._rows_re, self._comment_re = _rows_patterns[self._binary]
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+    @property
+    def report_eol(self) -> bool:
+        return self._report_eol
+
+    @report_eol.setter
+    def report_eol(self, report: bool):
+        self._report_eol = report
+        self._token_re, self._float_re, self._int_re, self._int_pair_re, self._vec2_re, self._vec3_re, self._vec4_re, self._vec4p_re, self._sds_re, self._ws_re, self._str_chunk_re = \
+            _token_patterns[(self._binary, report)]
+
+    @property
+    def line(self) -> int:
+        return self._get_line(self.pos)
+
+    @property
+    def column(self) -> int:
+        return self._get_column(self.pos)
+
+    def seek(self, pos: int):
+        """ Sets tokenizer position to buffer position `pos` """
+        self.pos = pos
+
+    def skipToLine(self, pattern: str) -> bool:
+        """
+        Skips to the beginning of next line which starts with regular expression `pattern` (case insensitive),
+        without tokenizing the skipped text. Leading whitespace of line is ignored.
+        Returns False and skips to the end of buffer when no line matches.
+        """
+        pattern = r'^[^\S\n]*(?:' + pattern + ')'
+        regex = re.compile(pattern.encode('ascii') if self._binary else pattern, re.IGNORECASE | re.MULTILINE)
+        m = regex.search(self.buf, self.pos)
+        if m is None:
+            self.pos = len(self.buf)
+            return False
+        self.pos = m.start()
+        return True
+
+    def findSections(self) -> Dict[str, int]:
+        """
+        Scans the whole buffer for section headers `SECTION: <name>` at the beginning of line.
+        Returns dict of upper case section names and buffer positions of the section body in file order.
+        Note, if section repeats only the first position is recorded.
+        """
+        sections: Dict[str, int] = {}
+        for m in _section_patterns[self._binary].finditer(self.buf):
+            name = m.group(1).rstrip()
+            sections.setdefault(' '.join(self._decode(name).split()).upper(), m.start(1) + len(name))
+        return sections
+
+    def getToken(self) -> Token:
+        ttype, begin, end = self._scan()
+        value = self._scanned_value(ttype, begin, end)
+        if ttype == TokenType.Float:
+            dp = value.find('.')
+            if dp > -1 and (dp == 0 or not value[dp - 1].isdigit()):
+                value = value[:dp] + '0' + value[dp:] # Prepend 0 to poorly formatted floating point number
+        return self._make_token(ttype, value, begin, end)
+
+    def getDelimitedStringToken(self, isDelim: Callable[[str], bool]) -> Token:
+        buf   = self.buf
+        blen  = len(buf)
+        begin = self._ws_re.match(buf, self.pos).end()
+        end   = begin
+        value = ''
+        while end < blen: # decode and check line by line
+            eol = buf.find(self._nl, end)
+            eol = blen if eol == -1 else eol + 1
+            chunk = self._decode(buf[end:eol])
+            dpos  = next((i for i, c in enumerate(chunk) if isDelim(c)), -1)
+            if dpos > -1:
+                chunk = chunk[:dpos]
+                value += chunk
+                end   += len(chunk.encode('utf-8')) if self._binary else dpos
+                break
+            value += chunk
+            end    = eol
+
+        self.pos = end
+        return self._make_token(TokenType.String, value, begin, end)
+
+    def getSpaceDelimitedString(self) -> str:
+        m = self._sds_re.match(self.buf, self.pos)
+        self.pos = m.end()
+        return self._decode(m.group(1))
+
+    def getIntNumber(self) -> int:
+        m = self._int_re.match(self.buf, self.pos)
+        if m is not None:
+            self.pos = m.end()
+            return int(m.group(1))
+        return super().getIntNumber()
+
+    def getFloatNumber(self) -> float:
+        m = self._float_re.match(self.buf, self.pos)
+        if m is not None:
+            self.pos = m.end()
+            return float(m.group(1))
+        return super().getFloatNumber()
+
+    def getPairOfInts(self) -> Tuple[int, int]:
+        m = self._int_pair_re.match(self.buf, self.pos)
+        if m is not None:
+            self.pos = m.end()
+            return (int(m.group(1)), int(m.group(2)))
+        return super().getPairOfInts()
+
+    def getVector2f(self) -> Vector2f:
+        m = self._vec2_re.match(self.buf, self.pos)
+        if m is not None:
+            self.pos = m.end()
+            return Vector2f(float(m.group(1)), float(m.group(2)))
+        return super().getVector2f()
+
+    def getVector3f(self) -> Vector3f:
+        m = self._vec3_re.match(self.buf, self.pos)
+        if m is not None:
+            self.pos = m.end()
+            return Vector3f(float(m.group(1)), float(m.group(2)), float(m.group(3)))
+        return super().getVector3f()
+
+    def getVector4f(self) -> Vector4f:
+        m = self._vec4_re.match(self.buf, self.pos) or self._vec4p_re.match(self.buf, self.pos)
+        if m is not None:
+            self.pos = m.end()
+            return Vector4f(float(m.group(1)), float(m.group(2)), float(m.group(3)), float(m.group(4)))
+        return super().getVector4f()
+
+    def getNumericRows(self, numRows: int) -> Tuple[np.ndarray, np.ndarray]:
+        if numRows == 0:
+            return (np.empty(0, dtype=np.float64), np.zeros(1, dtype=np.int64))
+
+        rows, end = self._match_rows()
+        tokens = np.array(rows.replace(self._colon, self._space + self._colon + self._space).translate(self._row_seps_table).split())
+        colons = np.flatnonzero(tokens == self._colon)
+        if len(colons) != numRows or colons[0] != 1:
+            return super().getNumericRows(numRows)
+
+        tokens = np.delete(tokens, colons)
+        try:
+            values = self._to_numbers(tokens)
+        except ValueError:
+            return super().getNumericRows(numRows)
+
+        offsets = np.append(colons - 1 - np.arange(numRows), len(tokens))
+        self.pos = end
+        return (values, offsets)
+
+    def getNumericTable(self, numRows: int, numColumns: int) -> np.ndarray:
+        if numRows == 0:
+            return np.empty((0, numColumns + 1), dtype=np.float64)
+
+        rows, end = self._match_rows()
+        if rows.count(self._colon) == numRows:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error') # fromstring warns on partially parsed text e.g. hex number
+                try:
+                    values = np.fromstring(rows.translate(self._row_seps_table).replace(self._colon, self._space), dtype=np.float64, sep=' ')
+                except (ValueError, DeprecationWarning):
+                    values = None
+            if values is not None and values.size == numRows * (numColumns + 1):
+                self.pos = end
+                return values.reshape((numRows, numColumns + 1))
+        return super().getNumericTable(numRows, numColumns)
+
+    def assertIdentifier(self, id: str):
+        ttype, begin, end = self._scan()
+        if ttype != TokenType.Identifier or self._decode(self.buf[begin:end]).lower() != id.lower():
+            raise AssertionError(f"Expected identifier '{id}', found '{self._scanned_value(ttype, begin, end)}'! line: {self.line} column: {self.column}")
+
+    def assertPunctuator(self, punc: str):
+        ttype, begin, end = self._scan()
+        if ttype != TokenType.Punctuator or self._decode(self.buf[begin:end]) != punc:
+            raise AssertionError(f"Expected punctuator '{punc}', found '{self._scanned_value(ttype, begin, end)}'! line: {self.line} column: {self.column}")
+
+    def _scan(self) -> Tuple[TokenType, int, int]:
+        """
+        Scans next token and returns its type, begin and end position in the buffer.
+        """
+        buf = self.buf
+        m   = self._token_re.match(buf, self.pos)
+        gi  = m.lastindex
+        if gi is not None:
+            self.pos = m.end()
+            return (_token_group_types[gi], m.start(gi), self.pos)
+
+        begin = m.end()
+        if begin >= len(buf):
+            self.pos = begin
+            return (TokenType.EOF, begin, begin)
+
+        ch = buf[begin:begin + 1]
+        if ch == self._quote:
+            return self._scan_string(begin)
+
+        self.pos = begin + 1
+        if ch == self._nl:
+            return (TokenType.EOL, begin, self.pos)
+        return (TokenType.Invalid, begin, self.pos)
+
+    def _scan_string(self, begin: int) -> Tuple[TokenType, int, int]:
+        buf   = self.buf
+        pos   = begin + 1
+        parts = []
+        while True:
+            end = self._str_chunk_re.match(buf, pos).end()
+            parts.append(buf[pos:end])
+            pos      = end
+            self.pos = pos
+
+            if pos >= len(buf):
+                raise IOError(f'Unexpected end of a file! line: {self.line} column: {self.column}')
+
+            ch = buf[pos:pos + 1]
+            if ch == self._nl:
+                raise IOError(f'Unexpected newline in string literal! line: {self.line} column: {self.column}')
+
+            if ch == self._quote:
+                self.pos = pos + 1
+                self._string_value = self._decode(ch[:0].join(parts))
+                return (TokenType.String, begin, self.pos)
+
+            # Escape sequence
+            esc = buf[pos + 1:pos + 2]
+            pos += 2
+            if esc not in self._escapes:
+                self.pos = pos - 1
+                self._string_value = self._decode(ch[:0].join(parts))
+                return (TokenType.Invalid, begin, self.pos)
+            parts.append(self._escapes[esc])
+
+    def _scanned_value(self, ttype: TokenType, begin: int, end: int) -> str:
+        if ttype == TokenType.String or (ttype == TokenType.Invalid and self.buf[begin:begin + 1] == self._quote):
+            return self._string_value
+        if ttype == TokenType.EOF or ttype == TokenType.EOL:
+            return ''
+        return self._decode(self.buf[begin:end])
+
+    def _match_rows(self) -> Tuple[Union[str, bytes], int]:
+        """
+        Matches consecutive numeric table rows from current position.
+        Returns matched rows text stripped of comments and end position of the match.
+        """
+        end  = self._rows_re.match(self.buf, self.pos).end()
+        rows = self.buf[self.pos:end]
+        if self._comment_re.search(rows):
+            rows = self._comment_re.sub(rows[:0], rows)
+        return (rows, end)
+
+    def _to_numbers(self, tokens: np.ndarray) -> np.ndarray:
+        hexes = np.char.find(tokens, self._hex_x) > -1
+        if not hexes.any():
+            return tokens.astype(np.float64)
+
+        values = np.empty(len(tokens), dtype=np.float64)
+        values[~hexes] = tokens[~hexes].astype(np.float64)
+        values[hexes]  = [int(t, 16) for t in tokens[hexes]]
+        return values
+
+    def _make_token(self, ttype: TokenType, value: str, begin: int, end: int) -> Token:
+        self.counters.tokens += 1
+        if self.lazyPositions:
+            return _OffsetToken(ttype, value, self, begin, end)
+
+        t = Token(ttype)
+        t.v            = value
+        t.begin_line   = self._get_line(begin)
+        t.begin_column = self._get_column(begin)
+        t.end_line     = self._get_line(end)
+        t.end_column   = self._get_column(end)
+        return t
+
+    def _build_line_index(self):
+        start = time.perf_counter()
+        if self._binary:
+            self._line_index = np.flatnonzero(np.frombuffer(self.buf, dtype=np.uint8) == ord(self._nl)).tolist()
+        else:
+            self._line_index = [m.start() for m in re.finditer(self._nl, self.buf)]
+        self.counters.lineIndexBuilds += 1
+        self.counters.lineIndexTime   += time.perf_counter() - start
+
+    def _get_line(self, pos: int) -> int:
+        if self._line_index is None:
+            self._build_line_index()
+        self.counters.positionLookups += 1
+        return bisect.bisect_left(self._line_index, pos) + 1
+
+    def _get_column(self, pos: int) -> int:
+        if self._line_index is None:
+            self._build_line_index()
+        self.counters.positionLookups += 1
+        n = bisect.bisect_left(self._line_index, pos)
+        return pos - (self._line_index[n - 1] if n > 0 else -1)
+
+def makeTokenizer(file: Union[BinaryIO, TextIO]) -> Tokenizer:
+    """
+    Makes tokenizer for `file`.
+    Regular files are memory mapped and tokenized as raw bytes by `BufferTokenizer`,
+    other seekable streams are read whole into the `BufferTokenizer`.
+    Non-seekable streams are tokenized by the streaming `Tokenizer`.
+    Note: Returned tokenizer should be closed after use to release the memory mapped file.
+    """
+    if not file.seekable():
+        if not isinstance(file, io.TextIOBase):
+            file = io.TextIOWrapper(file, encoding='utf-8')
+        return Tokenizer(file)
+
+    try:
+        return BufferTokenizer(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+    except (OSError, ValueError):
+        pass # not a regular file or file is empty
+    return BufferTokenizer(file.read())
@@ -21,6 +21,7 @@
 
 from .benchmark import BenchmarkMeter
 from .enum import Flag
+from .processPool import LazyProcessPool
 from .props import HexProperty
 
 from .vector import (
@@ -33,6 +34,7 @@ __all__ = [
     'BenchmarkMeter',
     'HexProperty',
     'Flag',
+    'LazyProcessPool',
     'Vector2f',
     'Vector3f',
     'Vector4f'
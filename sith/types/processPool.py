@@ -0,0 +1,57 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import multiprocessing, os, sys
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Callable, Optional
+
+def _set_worker_executable():
+    """
+    Sets the executable of spawned worker processes to the Python interpreter.
+    When running in Blender `sys.executable` is the Blender binary,
+    which would otherwise be started for each worker process on platforms which spawn processes (Windows, macOS).
+    """
+    try:
+        import bpy
+        python = getattr(bpy.app, 'binary_path_python', None) # Blender 2.79
+    except ImportError:
+        return
+    if isinstance(python, str) and os.path.isfile(python) and python != sys.executable:
+        multiprocessing.set_executable(python)
+
+class LazyProcessPool(Executor):
+    """
+    Process pool executor which starts `ProcessPoolExecutor` of `workers` processes on first submitted task.
+    If no task is submitted no process is started.
+    """
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        if self._pool is None:
+            _set_worker_executable()
+            self._pool = ProcessPoolExecutor(self.workers)
+        return self._pool.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, **kwargs):
+        if self._pool is not None:
+            self._pool.shutdown(wait, **kwargs)
@@ -21,11 +21,14 @@
 
 import bpy, os.path
 from pathlib import Path
-from typing import Optional, Union, Tuple
+from typing import Optional, Union, Tuple, TYPE_CHECKING
 
 from sith.material import ColorMap
 from sith import bl_info
 
+if TYPE_CHECKING:
+    from sith.cache import AssetCache, DiskCache
+
 kMaxNameLen = 64
 kDefaultCmp = 'dflt.cmp'
 
@@ -75,7 +78,7 @@ def findCmpFileInPath(cmpFile: Union[Path, str], path: Union[Path, str]) -> Opti
 
     return None
 
-def getCmpFileOrDefault(filepath: Union[Path, str], searchPath: Union[Path, str]) -> Optional[ColorMap]:
+def getCmpFileOrDefault(filepath: Union[Path, str], searchPath: Union[Path, str], cache: Optional[Union['AssetCache', 'DiskCache']] = None) -> Optional[ColorMap]:
     cmp_file = Path(filepath)
     if len(filepath) == 0:
         cmp_file = Path(kDefaultCmp)
@@ -83,7 +86,7 @@ def getCmpFileOrDefault(filepath: Union[Path, str], searchPath: Union[Path, str]
         cmp_file = findCmpFileInPath(cmp_file, searchPath)
     cmp = None
     if cmp_file is not None and cmp_file.is_file():
-        cmp = ColorMap.load(cmp_file)
+        cmp = cache.loadCmp(cmp_file) if cache else ColorMap.load(cmp_file)
     return cmp
 
 def getDefaultMatFolders(model3doPath: Union[Path, str]):
@@ -0,0 +1,259 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Tests run without Blender. If `bpy` can't be imported, minimal stand-in modules of
+`bpy`, `bmesh`, `mathutils` and `bpy_extras` are installed, which are enough to import the `sith` package.
+"""
+
+import os, random, sys, types
+import numpy as np
+import pytest
+
+from pathlib import Path
+from typing import List, Optional
+
+kRootDir = Path(__file__).resolve().parent.parent
+kDataDir = Path(__file__).resolve().parent / 'data'
+sys.path.insert(0, str(kRootDir))
+
+class _Any:
+    """ Stand-in object which returns itself for any attribute access or call. """
+    def __getattr__(self, name: str):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+class _Types(types.ModuleType):
+    """ `bpy.types` stand-in which makes empty class for any type name. """
+    def __getattr__(self, name: str):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        cls = type(name, (), {})
+        setattr(self, name, cls)
+        return cls
+
+def _install_blender_stubs():
+    try:
+        import bpy # noqa: F401
+        return
+    except ImportError:
+        pass
+
+    bpy = types.ModuleType('bpy')
+    for name in ('app', 'context', 'data', 'ops', 'path', 'props', 'utils'):
+        setattr(bpy, name, _Any())
+    bpy.types = _Types('bpy.types')
+
+    bmesh = types.ModuleType('bmesh')
+    bmesh.ops   = _Any()
+    bmesh.types = _Any()
+
+    mathutils = types.ModuleType('mathutils')
+    for name in ('Euler', 'Matrix', 'Quaternion', 'Vector'):
+        setattr(mathutils, name, type(name, (tuple,), {}))
+
+    bpy_extras = types.ModuleType('bpy_extras')
+    io_utils   = types.ModuleType('bpy_extras.io_utils')
+    io_utils.ImportHelper = type('ImportHelper', (), {})
+    io_utils.ExportHelper = type('ExportHelper', (), {})
+    bpy_extras.io_utils   = io_utils
+
+    sys.modules.update({
+        'bpy'                : bpy,
+        'bpy.types'          : bpy.types,
+        'bmesh'              : bmesh,
+        'mathutils'          : mathutils,
+        'bpy_extras'         : bpy_extras,
+        'bpy_extras.io_utils': io_utils,
+    })
+
+_install_blender_stubs()
+
+from sith.model.model3do import *
+from sith.model.model3doLoader import Model3doFileVersion
+from sith.types import Vector2f, Vector3f, Vector4f
+
+def makeModel3do(numGeosets: int = 2, numMeshes: int = 3, numVertices: int = 12, numFaces: int = 16, seed: int = 1) -> Model3do:
+    """
+    Makes deterministic random 3DO model.
+    All float values have at most 6 decimals, so the model is written to and read from file without loss.
+    UV coordinates span [-64, 64] to cover values which can't be exactly represented as float32.
+    """
+    r = random.Random(seed)
+    rnd = lambda lo, hi: round(r.uniform(lo, hi), 6)
+
+    model = Model3do('test.3do')
+    model.materials    = [f'mat{i}.mat' for i in range(4)]
+    model.radius       = 1.5
+    model.insertOffset = Vector3f(0.1, -0.2, 0.3)
+    for _ in range(numGeosets):
+        geoset = Model3doGeoSet()
+        for i in range(numMeshes):
+            mesh = Mesh3do(i, f'mesh_{i}')
+            mesh.radius       = rnd(0, 2)
+            mesh.geometryMode = GeometryMode.Texture
+            mesh.lightMode    = LightMode.Gouraud
+            mesh.textureMode  = TextureMode.PerspectiveCorrected
+            for _ in range(numVertices):
+                mesh.vertices.append(Vector3f(rnd(-5, 5), rnd(-5, 5), rnd(-5, 5)))
+                mesh.vertexColors.append(Vector4f(rnd(0, 1), rnd(0, 1), rnd(0, 1), rnd(0, 1)))
+                mesh.normals.append(Vector3f(rnd(-1, 1), rnd(-1, 1), rnd(-1, 1)))
+                mesh.uvs.append(Vector2f(rnd(-64, 64), rnd(-64, 64)))
+            for _ in range(numFaces):
+                face = Mesh3doFace()
+                face.materialIdx  = r.randint(-1, len(model.materials) - 1)
+                face.type         = FaceType(r.choice([0, 1, 2, 3]))
+                face.geometryMode = GeometryMode.Texture
+                face.lightMode    = LightMode.Gouraud
+                face.textureMode  = TextureMode.PerspectiveCorrected
+                face.color        = Vector4f(rnd(0, 1), rnd(0, 1), rnd(0, 1), rnd(0, 1))
+                numVerts          = r.choice([3, 4, 5])
+                face.vertexIdxs   = [r.randrange(numVertices) for _ in range(numVerts)]
+                face.uvIdxs       = [r.randrange(numVertices) for _ in range(numVerts)]
+                face.normal       = Vector3f(rnd(-1, 1), rnd(-1, 1), rnd(-1, 1))
+                mesh.faces.append(face)
+            geoset.meshes.append(mesh)
+        model.geosets.append(geoset)
+
+    for i in range(numMeshes):
+        node = Mesh3doNode(f'node{i}')
+        node.idx           = i
+        node.flags         = Mesh3doNodeFlags(0)
+        node.type          = Mesh3doNodeType(1)
+        node.meshIdx       = i
+        node.parentIdx     = i - 1
+        node.firstChildIdx = i + 1 if i + 1 < numMeshes else -1
+        node.siblingIdx    = -1
+        node.numChildren   = 1 if i + 1 < numMeshes else 0
+        node.position      = Vector3f(1.0, 2.0, 3.0)
+        node.rotation      = Vector3f(0.0, 90.0, 0.0)
+        node.pivot         = Vector3f(0.0, 0.0, 0.5)
+        model.meshHierarchy.append(node)
+    return model
+
+def model3doDataFile(version: Model3doFileVersion) -> Path:
+    """
+    Returns path of 3DO file of `makeModel3do()` model in `version` format.
+    The file was written by the original per-line `save3do` implementation.
+    """
+    return kDataDir / f"model_{version.name.lower()}.3do"
+
+def dumpModel3do(model: Model3do) -> list:
+    """ Returns all values of `model` as nested lists of plain Python values. """
+    out = [model.name, list(model.materials), model.radius, tuple(model.insertOffset)]
+    for geoset in model.geosets:
+        for mesh in geoset.meshes:
+            if isinstance(mesh, Mesh3doArrays):
+                mesh = mesh.toMesh3do()
+            out.append((mesh.idx, mesh.name, mesh.radius, int(mesh.geometryMode), int(mesh.lightMode), int(mesh.textureMode)))
+            out.append([tuple(v) for v in mesh.vertices])
+            out.append([tuple(c) for c in mesh.vertexColors])
+            out.append([tuple(n) for n in mesh.normals])
+            out.append([tuple(uv) for uv in mesh.uvs])
+            out.append([(f.materialIdx, int(f.type), int(f.geometryMode), int(f.lightMode), int(f.textureMode),
+                tuple(f.color), list(f.vertexIdxs), list(f.uvIdxs), tuple(f.normal)) for f in mesh.faces])
+    for n in model.meshHierarchy:
+        out.append((n.idx, int(n.flags), int(n.type), n.meshIdx, n.parentIdx, n.firstChildIdx, n.siblingIdx, n.numChildren,
+            tuple(n.position), tuple(n.rotation), tuple(n.pivot), n.name))
+    return out
+
+class FakeSequence:
+    """ Stand-in of Blender's data collection which supports `foreach_get` and `foreach_set` of its array attributes. """
+    def __init__(self, length: int, **arrays):
+        self._len    = length
+        self._arrays = {k: np.asarray(v) for k, v in arrays.items()}
+
+    def __len__(self) -> int:
+        return self._len
+
+    def foreach_get(self, attr: str, out: np.ndarray):
+        out[:] = self._arrays[attr].ravel()
+
+    def foreach_set(self, attr: str, values):
+        self._arrays[attr] = np.array(values)
+
+class FakeLayer:
+    def __init__(self, name: str, data: FakeSequence):
+        self.name = name
+        self.data = data
+
+class FakeLayers(dict):
+    """ Stand-in of mesh layer collection, new layers are made with `length` zero values. """
+    def __init__(self, length: int, attr: str = 'value'):
+        super().__init__()
+        self._length = length
+        self._attr   = attr
+        self.active: Optional[FakeLayer] = None
+
+    def new(self, name: str) -> FakeLayer:
+        layer = self[name] = FakeLayer(name, FakeSequence(self._length, **{self._attr: np.zeros(self._length)}))
+        return layer
+
+class FakeMaterial:
+    def __init__(self, name: str):
+        self.name          = name
+        self.texture_slots = []
+
+class FakeMesh(dict):
+    """
+    Stand-in of `bpy.types.Mesh` made of polygons `faces`. Custom properties are the dict items.
+    The loops of faces are stored in reverse face order, i.e. polygon `loop_start`s are descending.
+    `uvs` and `colors` are per face corner in face order.
+    """
+    def __init__(self, name: str, vertices, normals, faces: List[List[int]], faceNormals, faceSlots, uvs=None, colors=None, materials=()):
+        super().__init__()
+        self.name      = name
+        self.library   = None
+        self.materials = list(materials)
+
+        totals = np.array([len(f) for f in faces], dtype=np.int32)
+        starts = np.cumsum(totals[::-1])[::-1] - totals # loop block of face i is placed after blocks of faces > i
+        order  = np.concatenate([np.arange(s, s + t) for s, t in zip(starts, totals)]) if faces else np.empty(0, dtype=np.int64)
+        numLoops = int(totals.sum())
+
+        def to_loops(values, n):
+            loops = np.zeros((numLoops, n), dtype=np.float32)
+            loops[order] = np.asarray(values, dtype=np.float32).reshape(-1, n)
+            return loops
+
+        loopVerts = np.zeros(numLoops, dtype=np.int32)
+        loopVerts[order] = [i for f in faces for i in f]
+        self.vertices = FakeSequence(len(vertices), co=np.asarray(vertices, dtype=np.float32), normal=np.asarray(normals, dtype=np.float32))
+        self.loops    = FakeSequence(numLoops, vertex_index=loopVerts)
+        self.polygons = FakeSequence(len(faces), loop_start=starts, loop_total=totals, material_index=np.asarray(faceSlots), normal=np.asarray(faceNormals, dtype=np.float32))
+
+        self.uv_layers     = FakeLayers(numLoops)
+        self.vertex_colors = FakeLayers(numLoops)
+        if uvs is not None:
+            self.uv_layers.active = FakeLayer('UVMap', FakeSequence(numLoops, uv=to_loops(uvs, 2)))
+        if colors is not None:
+            self.vertex_colors.active = FakeLayer('Col', FakeSequence(numLoops, color=to_loops(colors, 4)))
+        self.polygon_layers_int    = FakeLayers(len(faces))
+        self.polygon_layers_float  = FakeLayers(len(faces))
+        self.polygon_layers_string = FakeLayers(len(faces))
+
+@pytest.fixture(params=list(Model3doFileVersion), ids=lambda v: v.name)
+def version(request) -> Model3doFileVersion:
+    return request.param
@@ -0,0 +1,172 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, shutil, stat
+import pytest
+
+from conftest import dumpModel3do, model3doDataFile
+from sith.cache import assetCache, diskCache, AssetCache, DiskCache, getAssetCache
+from sith.model.model3doLoader import load3do, Model3doFileVersion
+
+@pytest.fixture
+def modelFile(tmp_path):
+    path = tmp_path / 'model.3do'
+    shutil.copyfile(model3doDataFile(Model3doFileVersion.Version2_3), path)
+    return path
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskCache(tmp_path / 'cache')
+
+class _Loader:
+    """ Counts loads of 3DO file """
+    def __init__(self, filePath):
+        self.filePath = filePath
+        self.loads    = 0
+
+    def __call__(self):
+        self.loads += 1
+        return load3do(self.filePath, columnar=True)
+
+def _set_mtime(path, delta_ns: int):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + delta_ns))
+
+def test_disk_cache_miss_and_hit(cache, modelFile):
+    loader   = _Loader(modelFile)
+    expected = dumpModel3do(load3do(modelFile)[0])
+    for _ in range(3):
+        model, _ = cache.get('3do', modelFile, loader, columnar=True)
+        assert dumpModel3do(model) == expected
+    assert loader.loads == 1
+    assert (cache.stats.misses, cache.stats.hits, cache.stats.writes) == (1, 2, 1)
+
+    cache.get('3do', modelFile, loader, columnar=False) # different options
+    assert loader.loads == 2
+
+def test_disk_cache_hashes_file_only_when_mtime_changes(cache, modelFile, monkeypatch):
+    hashes = []
+    file_hash = diskCache._file_hash
+    monkeypatch.setattr(diskCache, '_file_hash', lambda p: hashes.append(p) or file_hash(p))
+    loader = _Loader(modelFile)
+
+    cache.get('3do', modelFile, loader) # miss, hashed on write
+    cache.get('3do', modelFile, loader)
+    assert len(hashes) == 1
+
+    _set_mtime(modelFile, 1000000000) # touched, not changed
+    cache.get('3do', modelFile, loader)
+    cache.get('3do', modelFile, loader)
+    assert len(hashes) == 2
+    assert loader.loads == 1
+
+def test_disk_cache_reloads_changed_file(cache, modelFile):
+    loader = _Loader(modelFile)
+    cache.get('3do', modelFile, loader)
+
+    text = modelFile.read_bytes()
+    modelFile.write_bytes(text.replace(b'RADIUS    1.500000', b'RADIUS    2.500000')) # same size
+    _set_mtime(modelFile, 1000000000)
+    model, _ = cache.get('3do', modelFile, loader)
+    assert loader.loads == 2
+    assert model.radius == 2.5
+    assert len(list(cache.dir.glob('*.cache'))) == 1 # entry is replaced
+
+def test_disk_cache_version_stamp(tmp_path, modelFile, monkeypatch):
+    loader = _Loader(modelFile)
+    DiskCache(tmp_path / 'cache').get('3do', modelFile, loader)
+    DiskCache(tmp_path / 'cache').get('3do', modelFile, loader)
+    assert loader.loads == 1
+
+    monkeypatch.setattr(diskCache, 'kCacheVersion', diskCache.kCacheVersion + 1)
+    cache = DiskCache(tmp_path / 'cache')
+    assert cache.size() == 0
+    cache.get('3do', modelFile, loader)
+    assert loader.loads == 2
+
+def test_disk_cache_eviction(cache, tmp_path):
+    files = []
+    for i in range(3):
+        path = tmp_path / f'model{i}.3do'
+        shutil.copyfile(model3doDataFile(Model3doFileVersion.Version2_3), path)
+        cache.get('3do', path, _Loader(path))
+        entry = cache._entry_path('3do', str(path), {})
+        os.utime(entry, ns=(i * 1000000000, i * 1000000000)) # entry of files[0] is the least recently used
+        files.append(path)
+
+    cache.maxSize = cache.size() * 2 // 3
+    assert cache.stats.evictions == 1
+    assert cache.size() <= cache.maxSize
+
+    loader = _Loader(files[0])
+    cache.get('3do', files[0], loader)
+    assert loader.loads == 1
+    loader = _Loader(files[2])
+    cache.get('3do', files[2], loader)
+    assert loader.loads == 0
+
+    cache.clear()
+    assert cache.size() == 0
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX permissions')
+def test_disk_cache_dir_is_private(tmp_path):
+    DiskCache(tmp_path / 'new')
+    assert stat.S_IMODE(os.stat(tmp_path / 'new').st_mode) == 0o700
+
+    (tmp_path / 'shared').mkdir(mode=0o777)
+    os.chmod(tmp_path / 'shared', 0o777)
+    DiskCache(tmp_path / 'shared')
+    assert stat.S_IMODE(os.stat(tmp_path / 'shared').st_mode) == 0o700
+
+def test_disk_cache_rejects_unknown_classes(cache, modelFile):
+    loader = _Loader(modelFile)
+    cache.get('3do', modelFile, loader)
+    entry  = next(cache.dir.glob('*.cache'))
+    cache._write_entry(entry, os.getcwd, os.stat(modelFile), diskCache._file_hash(str(modelFile)))
+
+    model, _ = cache.get('3do', modelFile, loader)
+    assert loader.loads == 2
+    assert cache.stats.errors == 1
+    assert len(model.geosets) == 2
+
+def test_asset_cache_backing(tmp_path, modelFile):
+    backing = DiskCache(tmp_path / 'cache')
+    cache   = AssetCache(backing=backing)
+    a, _ = cache.load3do(modelFile)
+    b, _ = cache.load3do(modelFile)
+    assert a is b
+    assert (cache.stats.misses, cache.stats.hits) == (1, 1)
+    assert backing.stats.writes == 1
+
+    _set_mtime(modelFile, 1000000000)
+    c, _ = cache.load3do(modelFile)
+    assert c is not a
+    assert backing.stats.hits == 1
+
+def test_session_asset_caches(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    monkeypatch.setattr(assetCache, '_asset_caches', {})
+    memCache    = getAssetCache()
+    backedCache = getAssetCache(useDiskCache=True)
+    assert memCache is getAssetCache(False)
+    assert backedCache is getAssetCache(True)
+    assert memCache.backing is None
+    assert backedCache.backing.dir == tmp_path / 'blender-sith'
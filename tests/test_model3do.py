@@ -0,0 +1,60 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+
+from conftest import dumpModel3do, makeModel3do
+from sith.model.model3do import Mesh3doArrays, Model3do
+
+def _to_columnar(model: Model3do) -> Model3do:
+    for geoset in model.geosets:
+        geoset.meshes = [Mesh3doArrays.fromMesh3do(m) for m in geoset.meshes]
+    return model
+
+def test_mesh_arrays_round_trip():
+    model = makeModel3do()
+    columnar = _to_columnar(makeModel3do())
+    for geoset in columnar.geosets:
+        geoset.meshes = [m.toMesh3do() for m in geoset.meshes]
+    assert dumpModel3do(columnar) == dumpModel3do(model)
+
+def test_mesh_arrays_keep_float_values():
+    assert dumpModel3do(_to_columnar(makeModel3do())) == dumpModel3do(makeModel3do())
+
+    mesh = Mesh3doArrays()
+    mesh.uvs = [(51.943799, -33.000001)]
+    mesh.faceColors = [(0.1, 0.2, 0.3, 0.4)]
+    assert mesh.uvs.tolist() == [[51.943799, -33.000001]]
+    assert mesh.faceColors.tolist() == [[0.1, 0.2, 0.3, 0.4]]
+
+def test_mesh_arrays_content_hash():
+    a = Mesh3doArrays.fromMesh3do(makeModel3do().geosets[0].meshes[0])
+    b = Mesh3doArrays.fromMesh3do(makeModel3do().geosets[0].meshes[0])
+    b.name   = 'other'
+    b.radius = 10.0
+    assert a.contentHash() == b.contentHash()
+
+    b.vertexColors = np.zeros_like(b.vertexColors)
+    assert a.contentHash() != b.contentHash()
+    assert a.contentHash(vertexColors=False) == b.contentHash(vertexColors=False)
+
+    b.uvs = b.uvs + 1e-6
+    assert a.contentHash(vertexColors=False) != b.contentHash(vertexColors=False)
@@ -0,0 +1,129 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+import pytest
+
+from conftest import FakeMaterial, FakeMesh, makeModel3do
+from sith.model.model3do import FaceType, Mesh3do, Model3do
+from sith.model.model3doExporter import _index_unique_rows, _mesh3do_add_geometry, kDefaultVertexColor
+from sith.model.utils import k3doFaceType
+
+def test_index_unique_rows_exact():
+    rows = np.array([
+        [0.0, 0.0, 1.0],
+        [1.0, 0.0, 1.0],
+        [-0.0, 0.0, 1.0], # -0.0 == 0.0
+        [1.0, 0.0, 1.0],
+        [0.0, 0.0, 2.0],
+    ], dtype=np.float32)
+    first, index = _index_unique_rows(rows)
+    assert first.tolist() == [0, 1, 4]
+    assert index.tolist() == [0, 1, 0, 1, 2]
+    np.testing.assert_array_equal(rows[first][index], rows + 0.0)
+
+def test_index_unique_rows_weld_by_distance():
+    # position x, y, z + attribute
+    rows = np.array([
+        [0.00, 0.0, 0.0, 1.0],
+        [0.05, 0.0, 0.0, 1.0], # near row 0
+        [0.05, 0.0, 0.0, 2.0], # near row 0, different attribute
+        [0.19, 0.0, 0.0, 1.0], # 0.19 from row 0
+        [0.11, 0.0, 0.0, 1.0], # nearer to row 3 than row 0
+        [0.06, 0.06, 0.06, 1.0], # ~0.104 from row 0, in the neighbouring grid cell
+        [0.0, 0.0, 0.0, 1.0],
+    ], dtype=np.float32)
+    first, index = _index_unique_rows(rows, 0.1, posColumns=3)
+    assert first.tolist() == [0, 2, 3, 5]
+    assert index.tolist() == [0, 0, 1, 2, 2, 3, 0]
+
+def test_index_unique_rows_weld_attributes_are_exact():
+    rows = np.array([
+        [0.0, 0.0, 0.5],
+        [0.0, 0.0, 0.5000001],
+    ], dtype=np.float64)
+    first, _ = _index_unique_rows(rows, 1.0, posColumns=2)
+    assert first.tolist() == [0, 1]
+
+    first, _ = _index_unique_rows(rows, 1.0)
+    assert first.tolist() == [0]
+
+@pytest.mark.parametrize('weldDistance', [0.0, 0.01, 0.1])
+def test_index_unique_rows_random(weldDistance: float):
+    rng  = np.random.default_rng(1)
+    pos  = np.round(rng.random((500, 3)), 2).astype(np.float32)
+    attr = rng.integers(0, 2, (500, 1)).astype(np.float32)
+    rows = np.hstack((pos, attr))
+    first, index = _index_unique_rows(rows, weldDistance, posColumns=3)
+
+    assert np.all(np.diff(first) > 0) # order of first occurrence
+    assert np.all(index[first] == np.arange(len(first)))
+    welded = rows[first][index]
+    np.testing.assert_array_equal(welded[:, 3], rows[:, 3])
+    dist = np.linalg.norm(welded[:, :3].astype(np.float64) - rows[:, :3], axis=1)
+    assert np.all(dist <= weldDistance)
+
+    if weldDistance > 0.0: # unique rows are farther apart than weld distance
+        for a in range(len(first)):
+            ra = rows[first[a]]
+            d  = np.linalg.norm(rows[first[a + 1:], :3].astype(np.float64) - ra[:3], axis=1)
+            same = rows[first[a + 1:], 3] == ra[3]
+            assert np.all(d[same] > weldDistance)
+
+def _fake_mesh(mesh3do, materials):
+    """ Makes `FakeMesh` of `mesh3do` with material slots `materials`, face i uses slot i % len(materials) """
+    faces  = [f.vertexIdxs for f in mesh3do.faces]
+    uvs    = [mesh3do.uvs[i] for f in mesh3do.faces for i in f.uvIdxs]
+    colors = [mesh3do.vertexColors[i] for f in mesh3do.faces for i in f.vertexIdxs]
+    slots  = [i % len(materials) for i in range(len(faces))]
+    return FakeMesh(mesh3do.name, mesh3do.vertices, mesh3do.normals, faces, [f.normal for f in mesh3do.faces], slots,
+        uvs=uvs, colors=colors, materials=[FakeMaterial(m) for m in materials])
+
+@pytest.mark.parametrize('exportVertexColors', [True, False])
+def test_mesh3do_add_geometry(exportVertexColors: bool):
+    source = makeModel3do(numGeosets=1).geosets[0].meshes[0]
+    model  = Model3do('test.3do')
+    model.materials = ['mat1.mat', 'mat0.mat']
+    fake   = _fake_mesh(source, ['mat0.mat', 'mat1.mat'])
+    fake.polygon_layers_int.new(k3doFaceType).data.foreach_set('value', np.arange(len(source.faces)) % 4 + 1)
+
+    mesh3do = Mesh3do(0, source.name)
+    _mesh3do_add_geometry(mesh3do, model, fake, (2.0, 1.0, 1.0), uvAbsolute=False, exportVertexColors=exportVertexColors)
+
+    f32 = lambda v: np.float32(v).tolist()
+    assert len(mesh3do.faces) == len(source.faces)
+    for i, (face, src) in enumerate(zip(mesh3do.faces, source.faces)):
+        assert face.materialIdx == [1, 0][i % 2]
+        assert face.type == FaceType(i % 4)
+        assert tuple(face.normal) == tuple(f32(src.normal))
+        assert len(face.vertexIdxs) == len(src.vertexIdxs) == len(face.uvIdxs)
+        for vi, uvi, svi, suvi in zip(face.vertexIdxs, face.uvIdxs, src.vertexIdxs, src.uvIdxs):
+            sv = source.vertices[svi]
+            assert tuple(mesh3do.vertices[vi]) == tuple(f32([np.float64(np.float32(sv.x)) * 2.0, sv.y, sv.z]))
+            assert tuple(mesh3do.normals[vi]) == tuple(f32(source.normals[svi]))
+            expectedColor = f32(source.vertexColors[svi]) if exportVertexColors else list(kDefaultVertexColor)
+            assert list(mesh3do.vertexColors[vi]) == expectedColor
+            su = source.uvs[suvi]
+            assert tuple(mesh3do.uvs[uvi]) == tuple(f32([su.x, -np.float32(su.y)]))
+
+    # Vertices and uvs are unique
+    assert len(set(zip(map(tuple, mesh3do.vertices), map(tuple, mesh3do.vertexColors), map(tuple, mesh3do.normals)))) == len(mesh3do.vertices)
+    assert len(set(map(tuple, mesh3do.uvs))) == len(mesh3do.uvs)
@@ -0,0 +1,117 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+import pytest
+
+from types import SimpleNamespace
+
+from conftest import FakeMaterial, FakeMesh, makeModel3do
+from sith.model import model3doImporter
+from sith.model.model3do import Mesh3doArrays
+from sith.model.model3doImporter import _mesh_content_hash, _mesh_instance_key, _MeshInstances, _ModelMaterial
+from sith.model.utils import k3doFaceType, kMeshInstanceHash, kMeshInstanceKey
+from sith.types import Vector3f
+
+def _fake_mesh(name: str = 'mesh') -> FakeMesh:
+    mesh3do = makeModel3do(numGeosets=1).geosets[0].meshes[0]
+    faces   = [f.vertexIdxs for f in mesh3do.faces]
+    uvs     = [mesh3do.uvs[i] for f in mesh3do.faces for i in f.uvIdxs]
+    colors  = [mesh3do.vertexColors[i] for f in mesh3do.faces for i in f.vertexIdxs]
+    return FakeMesh(name, mesh3do.vertices, mesh3do.normals, faces, [f.normal for f in mesh3do.faces], [0] * len(faces),
+        uvs=uvs, colors=colors, materials=[FakeMaterial('mat0.mat')])
+
+def _edit_co(mesh: FakeMesh):
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    co[0] += 0.5
+    mesh.vertices.foreach_set('co', co)
+
+def test_mesh_content_hash():
+    expected = _mesh_content_hash(_fake_mesh())
+    assert _mesh_content_hash(_fake_mesh('other')) == expected
+
+    mesh = _fake_mesh()
+    _edit_co(mesh)
+    assert _mesh_content_hash(mesh) != expected
+
+    mesh = _fake_mesh()
+    uvs  = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+    mesh.uv_layers.active.data.foreach_get('uv', uvs)
+    mesh.uv_layers.active.data.foreach_set('uv', uvs[::-1].copy())
+    assert _mesh_content_hash(mesh) != expected
+
+    mesh = _fake_mesh()
+    mesh.polygon_layers_int.new(k3doFaceType).data.foreach_set('value', np.full(len(mesh.polygons), 2))
+    assert _mesh_content_hash(mesh) != expected
+
+    mesh = _fake_mesh()
+    mesh.materials = [FakeMaterial('mat1.mat')]
+    assert _mesh_content_hash(mesh) != expected
+
+@pytest.fixture
+def blendMeshes(monkeypatch) -> list:
+    meshes = []
+    monkeypatch.setattr(model3doImporter.bpy, 'data', SimpleNamespace(meshes=meshes), raising=False)
+    return meshes
+
+def test_mesh_instances(blendMeshes):
+    instances = _MeshInstances()
+    assert instances.get('key') is None
+
+    mesh = _fake_mesh()
+    blendMeshes.append(mesh)
+    instances.add('key', mesh)
+    assert mesh[kMeshInstanceKey] == 'key'
+    assert mesh[kMeshInstanceHash] == _mesh_content_hash(mesh)
+    assert instances.get('key') is mesh
+
+    # Mesh of previous import is reused
+    assert _MeshInstances().get('key') is mesh
+
+    # Edited mesh is not reused, but the unedited mesh with the same key is
+    other = _fake_mesh('other')
+    blendMeshes.append(other)
+    instances.add('key', other)
+    _edit_co(mesh)
+    assert _MeshInstances().get('key') is other
+
+    # Linked meshes are not reused
+    other.library = object()
+    assert _MeshInstances().get('key') is None
+
+def test_mesh_instance_key():
+    mesh3do   = Mesh3doArrays.fromMesh3do(makeModel3do(numGeosets=1).geosets[0].meshes[0])
+    materials = [_ModelMaterial(FakeMaterial(f'mat{i}.mat'), None, (1.0, 1.0)) for i in range(4)]
+    pivot     = Vector3f(0.0, 0.0, 0.5)
+    key       = _mesh_instance_key(mesh3do, pivot, materials, True, True)
+
+    other = Mesh3doArrays.fromMesh3do(makeModel3do(numGeosets=1).geosets[0].meshes[0])
+    other.name = 'other'
+    assert _mesh_instance_key(other, pivot, materials, True, True) == key
+
+    assert _mesh_instance_key(mesh3do, Vector3f(0.0, 0.0, 0.0), materials, True, True) != key
+    assert _mesh_instance_key(mesh3do, pivot, materials, False, True) != key
+    assert _mesh_instance_key(mesh3do, pivot, materials, True, False) != key
+
+    renamed = list(materials)
+    renamed[int(mesh3do.faceMaterialIdxs.max())] = _ModelMaterial(FakeMaterial('renamed.mat'), None, (1.0, 1.0))
+    assert _mesh_instance_key(mesh3do, pivot, renamed, True, True) != key
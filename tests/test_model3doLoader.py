@@ -0,0 +1,62 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io, os
+import pytest
+
+from conftest import dumpModel3do, model3doDataFile
+from sith.model import model3doLoader
+from sith.text.tokenizer import Tokenizer
+
+def loadWithTokenizer(filePath) -> tuple:
+    """ Loads 3DO file with the streaming `Tokenizer`, i.e. the reference parser. """
+    with open(filePath, 'r', encoding='utf-8') as f:
+        text = f.read()
+    return model3doLoader._parse_model(Tokenizer(io.StringIO(text)), os.path.basename(filePath))
+
+@pytest.fixture
+def reference(version):
+    filePath = model3doDataFile(version)
+    model, fileVersion = loadWithTokenizer(filePath)
+    assert fileVersion == version
+    return version, filePath, dumpModel3do(model)
+
+@pytest.mark.parametrize('columnar', [False, True], ids=['objects', 'columnar'])
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'lazy': True},
+    {'geosets': [0]},
+    {'geosets': []},
+    {'lazy': True, 'geosets': [1]},
+    {'workers': 2},
+], ids=['default', 'lazy', 'geoset0', 'nogeosets', 'lazy-geoset1', 'workers2'])
+def test_load3do_matches_tokenizer(reference, kwargs: dict, columnar: bool):
+    version, filePath, expected = reference
+    model, fileVersion = model3doLoader.load3do(filePath, columnar=columnar, **kwargs)
+    assert fileVersion == version
+    assert dumpModel3do(model) == expected
+
+def test_load3do_empty_file(tmp_path):
+    path = tmp_path / 'empty.3do'
+    path.write_bytes(b'')
+    model, _ = model3doLoader.load3do(path)
+    assert dumpModel3do(model) == dumpModel3do(loadWithTokenizer(path)[0])
+    assert len(model.geosets) == 0
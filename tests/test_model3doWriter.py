@@ -0,0 +1,59 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import pytest
+
+from conftest import makeModel3do, model3doDataFile
+from sith.model import model3doWriter
+from sith.model.model3do import Mesh3doArrays
+
+kHeaderComment = 'sith test model'
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('columnar', [False, True], ids=['objects', 'columnar'])
+def test_save3do_matches_baseline(tmp_path, version, columnar: bool, workers: int):
+    model = makeModel3do()
+    if columnar:
+        for geoset in model.geosets:
+            geoset.meshes = [Mesh3doArrays.fromMesh3do(m) for m in geoset.meshes]
+
+    path = tmp_path / 'out.3do'
+    model3doWriter.save3do(model, path, version, kHeaderComment, workers=workers)
+    assert path.read_bytes() == model3doDataFile(version).read_bytes()
+
+def test_save3do_make_mesh(tmp_path, version):
+    fullMeshes = [m for g in makeModel3do().geosets for m in g.meshes]
+    model      = makeModel3do(numVertices=0, numFaces=0)
+    made       = []
+    def makeMesh(mesh):
+        made.append(mesh.idx)
+        return Mesh3doArrays.fromMesh3do(fullMeshes[len(made) - 1])
+
+    path = tmp_path / 'out.3do'
+    model3doWriter.save3do(model, path, version, kHeaderComment, makeMesh=makeMesh)
+    assert made == [m.idx for g in model.geosets for m in g.meshes]
+    assert path.read_bytes() == model3doDataFile(version).read_bytes()
+
+def test_save3do_missing_vertex_colors(tmp_path, version):
+    model = makeModel3do()
+    model.geosets[0].meshes[0].vertexColors.pop()
+    with pytest.raises(IndexError):
+        model3doWriter.save3do(model, tmp_path / 'out.3do', version, kHeaderComment)
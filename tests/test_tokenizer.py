@@ -0,0 +1,80 @@
+# Sith Blender Addon
+# Copyright (c) 2019-2024 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import numpy as np
+import pytest
+
+from sith.text.tokenizer import BufferTokenizer, makeTokenizer, Tokenizer, TokenType
+
+kText = '''# comment line
+SECTION: HEADER
+3DO 2.3   # trailing comment
+"quoted string" ident_1 _ident2
+0 -1 +7 0x1F 0XaB 1.5 -0.25 .5 -.75 1e3 2.5E-2 -1.#QNAN0
+, : ( ) / { } = -
+  last
+'''
+
+def _tokens(tok: Tokenizer, reportEol: bool = False):
+    tok.report_eol = reportEol
+    out = []
+    while True:
+        t = tok.getToken()
+        out.append((t.type, t.value, t.beginLine, t.beginColumn, t.endLine, t.endColumn))
+        if t.type == TokenType.EOF:
+            return out
+
+@pytest.mark.parametrize('reportEol', [False, True])
+@pytest.mark.parametrize('binary', [False, True], ids=['str', 'bytes'])
+def test_buffer_tokenizer_matches_tokenizer(binary: bool, reportEol: bool):
+    expected = _tokens(Tokenizer(io.StringIO(kText)), reportEol)
+    buf      = kText.encode() if binary else kText
+    assert _tokens(BufferTokenizer(buf, lazyPositions=False), reportEol) == expected
+    assert _tokens(BufferTokenizer(buf, lazyPositions=True), reportEol) == expected
+
+def test_make_tokenizer_memory_maps_file(tmp_path):
+    path = tmp_path / 'text.txt'
+    path.write_text(kText)
+    expected = _tokens(Tokenizer(io.StringIO(kText)))
+    with open(path, 'rb') as f, makeTokenizer(f) as tok:
+        assert isinstance(tok, BufferTokenizer)
+        assert _tokens(tok) == expected
+
+def test_make_tokenizer_empty_file(tmp_path):
+    path = tmp_path / 'empty.txt'
+    path.write_bytes(b'')
+    with open(path, 'rb') as f, makeTokenizer(f) as tok:
+        assert tok.getToken().type == TokenType.EOF
+
+def test_utf8_identifier_and_string():
+    tok = BufferTokenizer('šipka "Čas" x'.encode())
+    assert tok.getIdentifier() == 'šipka'
+    assert tok.getString() == 'Čas'
+    assert tok.getIdentifier() == 'x'
+
+@pytest.mark.parametrize('binary', [False, True], ids=['str', 'bytes'])
+def test_numeric_table(binary: bool):
+    text = '0: 1.0 -2.5 3\n1: 4 5.25 -6e1\n'
+    tok  = BufferTokenizer(text.encode() if binary else text)
+    table = tok.getNumericTable(2, 3)
+    np.testing.assert_array_equal(table, [[0, 1.0, -2.5, 3], [1, 4, 5.25, -60]])
+    assert tok.getToken().type == TokenType.EOF